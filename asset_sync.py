@@ -0,0 +1,296 @@
+import fnmatch
+import hashlib
+import json
+import os
+import shutil
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+MANIFEST_DIR = '.cache/sync'
+SYNC_JOBS = min(8, (os.cpu_count() or 1) * 2)
+
+# Linux FICLONE ioctl: copy-on-write clone (btrfs, XFS with reflink, bcachefs)
+FICLONE = 0x40049409
+
+
+def _scan(src_dir, exclude, rel=''):
+    """Yields (rel_path, size, mtime_ns) for every file under src_dir, one scandir per directory."""
+    with os.scandir(os.path.join(src_dir, rel) if rel else src_dir) as it:
+        entries = sorted(it, key=lambda e: e.name)
+    for entry in entries:
+        rel_path = f"{rel}/{entry.name}" if rel else entry.name
+        if entry.is_dir(follow_symlinks=True):
+            if rel_path not in exclude:
+                yield from _scan(src_dir, exclude, rel_path)
+        elif entry.is_file(follow_symlinks=True):
+            st = entry.stat()
+            yield rel_path, st.st_size, st.st_mtime_ns
+
+
+def _file_hash(path):
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _clone(src_fd, dst_fd):
+    """Reflink (no data copied) where the filesystem supports it."""
+    if not sys.platform.startswith('linux'):
+        return False
+    try:
+        import fcntl
+        fcntl.ioctl(dst_fd, FICLONE, src_fd)
+        return True
+    except (ImportError, OSError):
+        return False
+
+
+def copy_file(src, dst, mtime=None):
+    """
+    Copies src to dst atomically (temp file + rename), preserving mtime
+    (or stamping the given mtime, for reproducible builds).
+    Tries a reflink, then copy_file_range (in-kernel, may be offloaded by the
+    filesystem), then a regular buffered copy.
+    """
+    tmp = f"{dst}.sync-tmp"
+    with open(src, 'rb') as fsrc, open(tmp, 'wb') as fdst:
+        if not _clone(fsrc.fileno(), fdst.fileno()):
+            copied = False
+            if hasattr(os, 'copy_file_range'):
+                try:
+                    size = os.fstat(fsrc.fileno()).st_size
+                    offset = 0
+                    while offset < size:
+                        sent = os.copy_file_range(fsrc.fileno(), fdst.fileno(), size - offset)
+                        if sent == 0:
+                            break
+                        offset += sent
+                    copied = offset == size
+                except OSError:
+                    # EXDEV/ENOSYS/EINVAL: fall back below
+                    fsrc.seek(0)
+                    fdst.seek(0)
+                    fdst.truncate()
+            if not copied:
+                shutil.copyfileobj(fsrc, fdst, 1 << 20)
+    if mtime is None:
+        shutil.copystat(src, tmp)
+    else:
+        shutil.copymode(src, tmp)
+        os.utime(tmp, (mtime, mtime))
+    os.replace(tmp, dst)
+
+
+class AssetSync:
+    """
+    One-way src -> dst mirror with a persisted manifest (rsync-style).
+
+    The manifest records, per synced file, the source size/mtime and content
+    hash. Unchanged files cost one stat (from the source scan) and no dst I/O;
+    touched-but-identical files are re-hashed, not re-copied; files that left
+    the source are removed from dst. Files in dst that this sync never wrote
+    (generated coupon, CSS, JS bundle, fonts) are left alone.
+
+    Without a manifest (first sync into an existing output) dst itself is
+    diffed against the source: files with no source are removed unless they
+    match one of the `generated` patterns (fnmatch, '/'-separated rel paths).
+
+    mtime: stamp every synced file with this time instead of the source's
+    (reproducible builds); unchanged files are re-stamped too.
+    """
+
+    def __init__(self, src_dir, dst_dir, exclude=(), manifest_dir=MANIFEST_DIR, jobs=SYNC_JOBS, mtime=None,
+                 generated=()):
+        self.src_dir = src_dir
+        self.dst_dir = dst_dir
+        self.exclude = set(exclude)
+        self.generated = list(generated)
+        self.jobs = max(1, jobs)
+        self.mtime = mtime
+        key = hashlib.sha1('\0'.join([os.path.abspath(src_dir), os.path.abspath(dst_dir)] + sorted(self.exclude))
+                           .encode('utf-8')).hexdigest()[:16]
+        self.manifest_path = os.path.join(manifest_dir, f"{key}.json")
+
+    def _load_manifest(self):
+        if not os.path.exists(self.manifest_path):
+            return {}
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f).get('files', {})
+        except (OSError, json.JSONDecodeError):
+            print(f"Warning: Ignoring unreadable sync manifest {self.manifest_path}.")
+            return {}
+
+    def _save_manifest(self, files):
+        manifest_dir = os.path.dirname(self.manifest_path)
+        if manifest_dir and not os.path.exists(manifest_dir):
+            os.makedirs(manifest_dir)
+        tmp = f"{self.manifest_path}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'src': self.src_dir, 'dst': self.dst_dir, 'files': files}, f)
+        os.replace(tmp, self.manifest_path)
+
+    def _dst_names(self, rel_dir, cache):
+        """File names present in a dst directory (listed once, no stat)."""
+        if rel_dir not in cache:
+            path = os.path.join(self.dst_dir, rel_dir) if rel_dir else self.dst_dir
+            try:
+                with os.scandir(path) as it:
+                    cache[rel_dir] = {e.name for e in it}
+            except FileNotFoundError:
+                cache[rel_dir] = set()
+        return cache[rel_dir]
+
+    def _dst_matches(self, rel, known):
+        """
+        Reproducible builds do not trust the manifest alone: a dst file replaced
+        behind the sync's back (checkout, manual edit) no longer carries the
+        stamped mtime and is re-hashed. Files stamped by the build (synced, or
+        overwritten by a generated file such as style.css) are trusted.
+        """
+        st = os.stat(os.path.join(self.dst_dir, rel))
+        if st.st_mtime_ns == self.mtime * 1_000_000_000:
+            return True
+        return _file_hash(os.path.join(self.dst_dir, rel)) == known[2]
+
+    def plan(self):
+        """
+        Compares the source tree with the manifest and dst.
+        Returns (actions, files): actions maps 'add'/'update'/'remove'/'unchanged'
+        to rel paths; files is the manifest to persist once the copies succeed.
+        """
+        manifest = self._load_manifest()
+        actions = {'add': [], 'update': [], 'remove': [], 'unchanged': []}
+        files = {}
+        listings = {}
+
+        for rel, size, mtime_ns in _scan(self.src_dir, self.exclude):
+            rel_dir, name = os.path.split(rel)
+            exists = name in self._dst_names(rel_dir, listings)
+            known = manifest.get(rel)
+
+            if exists and known and known[0] == size and known[1] == mtime_ns:
+                if self.mtime is None or self._dst_matches(rel, known):
+                    files[rel] = known
+                    actions['unchanged'].append(rel)
+                    continue
+
+            digest = _file_hash(os.path.join(self.src_dir, rel))
+            if exists and known and known[2] == digest and (self.mtime is None or self._dst_matches(rel, known)):
+                # Touched but identical: refresh the stamp only
+                files[rel] = [size, mtime_ns, digest]
+                actions['unchanged'].append(rel)
+                continue
+
+            if exists and not known:
+                # No manifest yet (first run / older output): adopt files that already match
+                dst_path = os.path.join(self.dst_dir, rel)
+                st = os.stat(dst_path)
+                if st.st_size == size and (st.st_mtime_ns == mtime_ns or _file_hash(dst_path) == digest):
+                    files[rel] = [size, mtime_ns, digest]
+                    actions['unchanged'].append(rel)
+                    continue
+
+            files[rel] = [size, mtime_ns, digest]
+            actions['update' if exists else 'add'].append(rel)
+
+        if manifest:
+            actions['remove'] = sorted(rel for rel in manifest if rel not in files)
+        elif os.path.isdir(self.dst_dir):
+            # Leftovers of syncs before the manifest existed are only known from dst itself
+            actions['remove'] = sorted(rel for rel, _, _ in _scan(self.dst_dir, ())
+                                       if rel not in files and not self._is_generated(rel))
+        return actions, files
+
+    def _is_generated(self, rel):
+        return any(fnmatch.fnmatchcase(rel, pattern) for pattern in self.generated)
+
+    def _remove(self, rel):
+        path = os.path.join(self.dst_dir, rel)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        # Prune directories the removal left empty (never the dst root)
+        parent = os.path.dirname(path)
+        while os.path.abspath(parent) != os.path.abspath(self.dst_dir):
+            try:
+                os.rmdir(parent)
+            except OSError:
+                break
+            parent = os.path.dirname(parent)
+
+    def run(self, dry_run=False, delete=True):
+        """
+        Syncs the tree (or only reports with dry_run). Returns the actions dict.
+        delete: remove dst files whose source disappeared since the last sync.
+        """
+        actions, files = self.plan()
+        if not delete:
+            actions['remove'] = []
+        if dry_run:
+            return actions
+
+        copies = actions['add'] + actions['update']
+        for rel_dir in sorted({os.path.dirname(rel) for rel in copies}):
+            os.makedirs(os.path.join(self.dst_dir, rel_dir), exist_ok=True)
+
+        def copy(rel):
+            copy_file(os.path.join(self.src_dir, rel), os.path.join(self.dst_dir, rel), self.mtime)
+
+        if copies:
+            if self.jobs > 1 and len(copies) > 1:
+                with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+                    # list() re-raises the first copy error
+                    list(pool.map(copy, copies))
+            else:
+                for rel in copies:
+                    copy(rel)
+
+        for rel in actions['remove']:
+            self._remove(rel)
+
+        if self.mtime is not None:
+            # Files synced by an earlier, non-reproducible build still carry source mtimes
+            for rel in actions['unchanged']:
+                os.utime(os.path.join(self.dst_dir, rel), (self.mtime, self.mtime))
+
+        if not delete:
+            # Keep tracking removed sources so a later deleting sync still cleans them up
+            manifest = self._load_manifest()
+            files.update({rel: entry for rel, entry in manifest.items() if rel not in files})
+        self._save_manifest(files)
+        return actions
+
+
+def format_report(actions, limit=50):
+    """Human-readable diff: '+' added, '~' updated, '-' removed."""
+    lines = []
+    for mark, key in (('+', 'add'), ('~', 'update'), ('-', 'remove')):
+        for rel in actions[key][:limit]:
+            lines.append(f"  {mark} {rel}")
+        if len(actions[key]) > limit:
+            lines.append(f"  {mark} ... {len(actions[key]) - limit} more")
+    lines.append(f"  {len(actions['add'])} to add, {len(actions['update'])} to update, "
+                 f"{len(actions['remove'])} to remove, {len(actions['unchanged'])} unchanged")
+    return '\n'.join(lines)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description='Mirror a static asset tree (rsync-style)')
+    parser.add_argument('src')
+    parser.add_argument('dst')
+    parser.add_argument('--exclude', nargs='*', default=[], help="Source subdirectories to skip ('/'-separated)")
+    parser.add_argument('--dry-run', action='store_true', help='Only print what would change')
+    parser.add_argument('--no-delete', action='store_true', help='Keep files whose source was removed')
+    parser.add_argument('--jobs', type=int, default=SYNC_JOBS, help='Parallel copies')
+    parser.add_argument('--generated', nargs='*', default=[],
+                        help="dst paths (fnmatch patterns) a first sync must not remove as leftovers")
+    args = parser.parse_args()
+
+    result = AssetSync(args.src, args.dst, exclude=args.exclude, jobs=args.jobs, generated=args.generated).run(
+        dry_run=args.dry_run, delete=not args.no_delete)
+    print(("Dry run:\n" if args.dry_run else "Synced:\n") + format_report(result))
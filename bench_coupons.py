@@ -0,0 +1,232 @@
+"""
+Coupon rendering benchmark.
+
+Renders coupons through CouponRenderer.generate() for every template x shape
+x overlay combination, plus a batch-size series (1/100/1000 by default), and
+reports per-coupon latency percentiles, peak RSS and output bytes. Each case
+runs in a fresh process so peak RSS and font/background caches are per case.
+
+    python bench_coupons.py                    # run and compare with the baseline
+    python bench_coupons.py --save-baseline    # record the current numbers
+    python bench_coupons.py --quick            # small batches for a fast check
+"""
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import resource
+except ImportError:  # Windows: no peak RSS
+    resource = None
+
+TEMPLATES = ['gold', 'pink', 'blue']
+SHAPES = ['rounded', 'ticket', None]
+BATCH_SIZES = [1, 100, 1000]
+MATRIX_BATCH = 20
+BASELINE_PATH = '.cache/bench/coupons.json'
+THRESHOLD_PERCENT = 10.0
+
+# Metrics checked against the baseline (all "lower is better")
+GATED_METRICS = ['p50_ms', 'p95_ms', 'peak_rss_kb', 'bytes_mean']
+
+AMOUNTS = ['¥500', '¥1,000', '¥3,000', '¥5,000', '¥10,000', '20%']
+
+
+def coupon_data(template, shape, overlay_path, index):
+    """A representative coupon; the amount varies so batches are not all identical."""
+    elements = {
+        'target': {'text': '初回限定', 'y': 0.15},
+        'title': {'text': 'OFF Coupon', 'y': 0.3},
+        'amount': {'text': AMOUNTS[index % len(AMOUNTS)], 'y': 0.45},
+        'unit': {'text': 'OFF', 'y': 0.47, 'size': 60},
+        'condition': {'text': 'Valid until 12/31', 'y': 0.75, 'size': 30}
+    }
+    if overlay_path:
+        elements['logo'] = {'type': 'image', 'path': overlay_path, 'x': 0.85, 'y': 0.05, 'scale': 1.0}
+    data = {'template': template, 'elements': elements}
+    if shape:
+        data['shape'] = shape
+    return data
+
+
+def make_overlay(path):
+    """Writes a small RGBA logo used by the image-overlay cases."""
+    from PIL import Image, ImageDraw
+    img = Image.new('RGBA', (240, 120), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(img)
+    draw.rounded_rectangle((0, 0, 239, 119), radius=24, fill=(255, 255, 255, 220))
+    draw.ellipse((20, 20, 100, 100), fill=(200, 30, 60, 255))
+    img.save(path)
+    return path
+
+
+def _percentile(sorted_values, q):
+    """Linear-interpolated percentile (q in 0..100) of a sorted list."""
+    if len(sorted_values) == 1:
+        return sorted_values[0]
+    pos = (len(sorted_values) - 1) * q / 100
+    lo = int(pos)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (pos - lo)
+
+
+def _peak_rss_kb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def run_case(case, overlay_path, work_dir):
+    """Renders one case in the current (fresh) process and returns its metrics."""
+    from coupon_generator import CouponRenderer
+
+    renderer = CouponRenderer()
+    rss_start = _peak_rss_kb()
+    out_path = os.path.join(work_dir, f"{case['name'].replace('/', '_')}.png")
+    latencies = []
+    sizes = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(case['batch']):
+            data = coupon_data(case['template'], case['shape'], overlay_path if case['overlay'] else None, i)
+            start = time.perf_counter()
+            ok = renderer.generate(data, out_path)
+            latencies.append((time.perf_counter() - start) * 1000)
+            if not ok:
+                raise RuntimeError(f"Coupon generation failed for {case['name']}")
+            sizes.append(os.path.getsize(out_path))
+    os.remove(out_path)
+
+    latencies.sort()
+    return {
+        'batch': case['batch'],
+        'total_ms': round(sum(latencies), 2),
+        'mean_ms': round(sum(latencies) / len(latencies), 2),
+        'p50_ms': round(_percentile(latencies, 50), 2),
+        'p90_ms': round(_percentile(latencies, 90), 2),
+        'p95_ms': round(_percentile(latencies, 95), 2),
+        'p99_ms': round(_percentile(latencies, 99), 2),
+        'max_ms': round(latencies[-1], 2),
+        'peak_rss_kb': _peak_rss_kb(),
+        'rss_start_kb': rss_start,
+        'bytes_total': sum(sizes),
+        'bytes_mean': round(sum(sizes) / len(sizes))
+    }
+
+
+def build_cases(templates, shapes, batches, matrix_batch):
+    """Full template x shape x overlay matrix at matrix_batch, plus the batch-size series."""
+    cases = []
+    for template in templates:
+        for shape in shapes:
+            for overlay in (False, True):
+                name = f"matrix/{template}/{shape or 'none'}/{'overlay' if overlay else 'text'}"
+                cases.append({'name': name, 'template': template, 'shape': shape,
+                              'overlay': overlay, 'batch': matrix_batch})
+    for batch in batches:
+        cases.append({'name': f"batch/{templates[0]}/rounded/overlay/{batch}", 'template': templates[0],
+                      'shape': 'rounded', 'overlay': True, 'batch': batch})
+    return cases
+
+
+def compare(results, baseline, threshold):
+    """Returns a list of regression messages (metric worse than baseline by more than threshold %)."""
+    regressions = []
+    for name, metrics in results['cases'].items():
+        base = baseline.get('cases', {}).get(name)
+        if not base:
+            continue
+        for metric in GATED_METRICS:
+            old, new = base.get(metric), metrics.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old * 100
+            if change > threshold:
+                regressions.append(f"{name} {metric}: {old} -> {new} (+{change:.1f}%)")
+    return regressions
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description='Coupon rendering benchmark')
+    parser.add_argument('--templates', nargs='+', default=TEMPLATES, help='Coupon templates to render')
+    parser.add_argument('--shapes', nargs='+', default=['rounded', 'ticket', 'none'],
+                        choices=['rounded', 'ticket', 'none'], help='Mask shapes to render')
+    parser.add_argument('--batches', nargs='+', type=int, default=BATCH_SIZES,
+                        help='Batch sizes for the scaling series')
+    parser.add_argument('--matrix-batch', type=int, default=MATRIX_BATCH,
+                        help='Coupons per template/shape/overlay case')
+    parser.add_argument('--quick', action='store_true', help='Batches 1/10 and 3 coupons per matrix case')
+    parser.add_argument('--output', help='Also write the results JSON here')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='Baseline JSON to compare against')
+    parser.add_argument('--save-baseline', action='store_true', help='Store these results as the baseline')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD_PERCENT,
+                        help='Allowed regression in percent before failing')
+    args = parser.parse_args()
+
+    if args.quick:
+        args.batches, args.matrix_batch = [1, 10], 3
+    shapes = [None if s == 'none' else s for s in args.shapes]
+    cases = build_cases(args.templates, shapes, args.batches, args.matrix_batch)
+
+    results = {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'pillow': __import__('PIL').__version__,
+            'timestamp': int(time.time())
+        },
+        'cases': {}
+    }
+
+    ctx = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory() as work_dir:
+        overlay_path = make_overlay(os.path.join(work_dir, 'overlay_logo.png'))
+        print(f"{'case':<40} {'n':>5} {'p50':>9} {'p90':>9} {'p99':>9} {'rss(KiB)':>9} {'bytes':>9}")
+        for case in cases:
+            # Fresh process per case: peak RSS and caches are not shared between cases
+            with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+                metrics = pool.submit(run_case, case, overlay_path, work_dir).result()
+            results['cases'][case['name']] = metrics
+            print(f"{case['name']:<40} {metrics['batch']:>5} {metrics['p50_ms']:>8.1f}ms {metrics['p90_ms']:>7.1f}ms "
+                  f"{metrics['p99_ms']:>7.1f}ms {metrics['peak_rss_kb'] or '-':>9} {metrics['bytes_mean']:>9}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        baseline_dir = os.path.dirname(args.baseline)
+        if baseline_dir and not os.path.exists(baseline_dir):
+            os.makedirs(baseline_dir)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to record one.")
+        return 0
+
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"FAILED: {len(regressions)} regression(s) over {args.threshold}%:")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+    print(f"OK: no regression over {args.threshold}% against {args.baseline}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,307 @@
+"""
+End-to-end generator benchmark on a synthetic plan corpus.
+
+Plans are synthesized from the section shapes of the bundled input plans,
+scaled by section count, comic frames, slider reviews and coupon presence,
+then built with a generator.Build for every style. Each (plan, style) run is a
+fresh process with its own output and cache directories (the repository's
+.cache/ is neither read nor written) and reports wall time per stage,
+templates compiled, bytes written, files copied and peak RSS as JSON.
+
+    python bench_generator.py --sections 10 50 200 --output bench.json
+    python bench_generator.py --compare old.json --output new.json
+"""
+import contextlib
+import copy
+import io
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import resource
+except ImportError:  # Windows: no peak RSS
+    resource = None
+
+STYLES = ['standard', 'manga', 'cyber', 'natural', 'premium']
+
+# Bundled plans whose sections serve as prototypes for the synthetic ones
+PROTOTYPE_PLANS = ['input/busy_mom_plan.json', 'input/tokyo_bihadado_plan.json']
+
+# Body section types cycled after the hero until the requested count is reached
+BODY_SECTIONS = ['trouble', 'concept', 'solution', 'features', 'flow', 'message', 'pricing', 'faq']
+
+# generator.py functions timed as stages (looked up as module globals at call time)
+STAGE_FUNCTIONS = {
+    'load': 'load_plans',
+    'coupon': 'generate_coupon',
+    'videos': 'prepare_videos',
+    'comics': 'bake_comics',
+    'loading_policy': 'apply_loading_policy',
+    'static_sync': 'sync_directories',
+    'campaign_fonts': 'apply_campaign_fonts'
+}
+
+
+def _load_prototypes():
+    prototypes = {}
+    base = coupon = None
+    for path in PROTOTYPE_PLANS:
+        with open(path, 'r', encoding='utf-8') as f:
+            plan = json.load(f)
+        base = base or plan
+        coupon = coupon or plan.get('coupon')
+        for section in plan.get('sections', []):
+            prototypes.setdefault(section['type'], section)
+    return base, prototypes, coupon
+
+
+def synth_plan(sections=12, frames=3, reviews=3, coupon=True):
+    """Builds a plan dict with the requested shape from the prototype sections."""
+    base, prototypes, coupon_data = _load_prototypes()
+    plan = {k: copy.deepcopy(base[k]) for k in ('theme', 'meta', 'footer', 'floating_cta') if k in base}
+
+    body = [prototypes['hero']]
+    if frames:
+        comic = copy.deepcopy(prototypes['comic_strip'])
+        sample = comic['data']['frames']
+        comic['data']['frames'] = [copy.deepcopy(sample[i % len(sample)]) for i in range(frames)]
+        body.append(comic)
+    if reviews:
+        slider = copy.deepcopy(prototypes['slider'])
+        sample = slider['data']['reviews']
+        slider['data']['reviews'] = [dict(sample[i % len(sample)], comment=f"{sample[i % len(sample)]['comment']} #{i + 1}")
+                                     for i in range(reviews)]
+        body.append(slider)
+    if coupon and coupon_data:
+        plan['coupon'] = copy.deepcopy(coupon_data)
+        body.append(prototypes['campaign_box'])
+
+    index = 0
+    while len(body) < sections - 1:
+        section = copy.deepcopy(prototypes[BODY_SECTIONS[index % len(BODY_SECTIONS)]])
+        data = section.get('data')
+        if isinstance(data, dict) and isinstance(data.get('title'), str):
+            data['title'] = f"{data['title']} ({index + 1})"
+        body.append(section)
+        index += 1
+    body.append(prototypes['cta'])
+
+    plan['sections'] = [copy.deepcopy(s) for s in body]
+    return plan
+
+
+def _peak_rss_kb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def _tree_stats(path):
+    files = 0
+    size = 0
+    for root, _, names in os.walk(path):
+        for name in names:
+            files += 1
+            size += os.path.getsize(os.path.join(root, name))
+    return files, size
+
+
+class _Probe:
+    """Wraps functions to accumulate wall time and call counts per stage."""
+
+    def __init__(self):
+        self.seconds = defaultdict(float)
+        self.calls = defaultdict(int)
+
+    def wrap(self, stage, func):
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.seconds[stage] += time.perf_counter() - start
+                self.calls[stage] += 1
+        return timed
+
+
+def run_case(plan_path, style, output_dir, cache_dir, font_scope, jobs=1):
+    """
+    Builds one plan in one style in the current (fresh) process and returns its metrics.
+    Every cache the build keeps (sync/output manifests, placeholders, font subsets)
+    lives under cache_dir; no dependency index is recorded.
+    """
+    import jinja2
+    import generator
+    import asset_sync
+    import font_subsetter
+    from image_placeholders import PlaceholderCache
+    from output_writer import OutputWriter
+
+    probe = _Probe()
+    generator.OUTPUT_DIR = output_dir
+    generator._PLACEHOLDERS = PlaceholderCache(cache_path=os.path.join(cache_dir, 'placeholders.json'))
+
+    class CaseSync(asset_sync.AssetSync):
+        def __init__(self, *args, **kwargs):
+            kwargs['manifest_dir'] = os.path.join(cache_dir, 'sync')
+            super().__init__(*args, **kwargs)
+
+    asset_sync.AssetSync = CaseSync
+    for stage, name in STAGE_FUNCTIONS.items():
+        setattr(generator, name, probe.wrap(stage, getattr(generator, name)))
+
+    # Template rendering (HTML + CSS) and compilation happen inside Jinja
+    jinja2.Template.render = probe.wrap('render', jinja2.Template.render)
+    jinja2.Environment.compile = probe.wrap('compile', jinja2.Environment.compile)
+
+    # Bundling and font subsetting are reached through lazily created helpers
+    bundler = generator.get_js_bundler()
+    bundler.bundle = probe.wrap('js_bundle', bundler.bundle)
+    font_subsetter.FontSubsetter.build = probe.wrap('fonts', font_subsetter.FontSubsetter.build)
+    placeholders = generator.get_placeholder_cache()
+    placeholders.get = probe.wrap('placeholders', placeholders.get)
+
+    copied = {'files': 0, 'bytes': 0}
+    lock = threading.Lock()
+    local = threading.local()
+
+    def counting(func):
+        def copy_file(src, dst, *args, **kwargs):
+            # Copy helpers call each other (copy2 -> copyfile); count the outermost call only
+            local.depth = getattr(local, 'depth', 0) + 1
+            try:
+                result = func(src, dst, *args, **kwargs)
+            finally:
+                local.depth -= 1
+            if local.depth == 0:
+                with lock:
+                    copied['files'] += 1
+                    copied['bytes'] += os.path.getsize(src)
+            return result
+        return copy_file
+
+    asset_sync.copy_file = counting(asset_sync.copy_file)
+    shutil.copy2 = counting(shutil.copy2)
+    shutil.copyfile = counting(shutil.copyfile)
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        with generator.Build([plan_path], font_scope=font_scope, jobs=jobs, deps_path=None) as build:
+            build.writer = OutputWriter(os.path.join(cache_dir, 'outputs.json'))
+            if build.font_subsetter is not None:
+                build.font_subsetter = font_subsetter.FontSubsetter(cache_dir=os.path.join(cache_dir, 'fonts'))
+            for plan_id in build.plans:
+                build.render(plan_id, style)
+    wall = time.perf_counter() - start
+
+    files, size = _tree_stats(output_dir)
+    stages = {stage: round(seconds * 1000, 2) for stage, seconds in sorted(probe.seconds.items())
+              if stage != 'compile'}
+    return {
+        'wall_ms': round(wall * 1000, 2),
+        'stages_ms': stages,
+        'templates_compiled': probe.calls['compile'],
+        'compile_ms': round(probe.seconds['compile'] * 1000, 2),
+        'files_written': files,
+        'bytes_written': size,
+        'files_copied': copied['files'],
+        'bytes_copied': copied['bytes'],
+        'peak_rss_kb': _peak_rss_kb()
+    }
+
+
+def compare(results, previous):
+    """Prints the wall-time and stage deltas against an earlier results file."""
+    print(f"\nComparison with {previous['meta'].get('label') or 'previous run'}:")
+    for name, metrics in results['cases'].items():
+        old = previous.get('cases', {}).get(name)
+        if not old:
+            continue
+        change = (metrics['wall_ms'] - old['wall_ms']) / old['wall_ms'] * 100 if old['wall_ms'] else 0
+        print(f"  {name:<44} {old['wall_ms']:>9.1f}ms -> {metrics['wall_ms']:>9.1f}ms ({change:+.1f}%)")
+        for stage, ms in metrics['stages_ms'].items():
+            before = old.get('stages_ms', {}).get(stage)
+            if before:
+                print(f"      {stage:<40} {before:>9.1f}ms -> {ms:>9.1f}ms ({(ms - before) / before * 100:+.1f}%)")
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description='Generator end-to-end benchmark')
+    parser.add_argument('--sections', nargs='+', type=int, default=[12, 48],
+                        help='Section counts of the synthetic plans')
+    parser.add_argument('--frames', type=int, default=3, help='Comic frames per plan (0 = no comic strip)')
+    parser.add_argument('--reviews', type=int, default=6, help='Slider reviews per plan (0 = no slider)')
+    parser.add_argument('--no-coupon', action='store_true', help='Omit the coupon and campaign box')
+    parser.add_argument('--styles', nargs='+', default=STYLES, help='Styles to build')
+    parser.add_argument('--font-scope', default='page', choices=['page', 'campaign', 'off'],
+                        help='Passed through to generate_site')
+    parser.add_argument('--jobs', type=int, default=1, help='Passed through to generate_site')
+    parser.add_argument('--label', help='Name stored with the results (e.g. a commit id)')
+    parser.add_argument('--output', help='Write the results JSON here')
+    parser.add_argument('--compare', help='Earlier results JSON to print deltas against')
+    args = parser.parse_args()
+
+    results = {
+        'meta': {
+            'label': args.label,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'timestamp': int(time.time()),
+            'frames': args.frames,
+            'reviews': args.reviews,
+            'coupon': not args.no_coupon,
+            'font_scope': args.font_scope,
+            'jobs': args.jobs
+        },
+        'cases': {}
+    }
+
+    ctx = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory() as work_dir:
+        print(f"{'case':<32} {'wall':>10} {'compiled':>9} {'written':>12} {'copied':>7} {'rss(KiB)':>9}")
+        for count in args.sections:
+            plan = synth_plan(count, args.frames, args.reviews, coupon=not args.no_coupon)
+            plan_name = f"bench_{count}"
+            plan_path = os.path.join(work_dir, f"{plan_name}.json")
+            with open(plan_path, 'w', encoding='utf-8') as f:
+                json.dump(plan, f, ensure_ascii=False)
+
+            for style in args.styles:
+                output_dir = os.path.join(work_dir, 'output', f"{plan_name}_{style}")
+                cache_dir = os.path.join(work_dir, 'cache', f"{plan_name}_{style}")
+                # Fresh process per case: no warm Jinja/coupon caches, per-case peak RSS
+                with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+                    metrics = pool.submit(run_case, plan_path, style, output_dir, cache_dir,
+                                          args.font_scope, args.jobs).result()
+                metrics['sections'] = len(plan['sections'])
+                name = f"{plan_name}/{style}"
+                results['cases'][name] = metrics
+                print(f"{name:<32} {metrics['wall_ms']:>8.1f}ms {metrics['templates_compiled']:>9} "
+                      f"{metrics['bytes_written']:>12} {metrics['files_copied']:>7} {metrics['peak_rss_kb'] or '-':>9}")
+                shutil.rmtree(output_dir, ignore_errors=True)
+                shutil.rmtree(cache_dir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
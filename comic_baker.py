@@ -0,0 +1,301 @@
+"""
+Pre-composited comic strips: speech bubbles (and captions) baked into the frame images.
+
+Mirrors the manga comic_strip CSS (vertical bubble text, ellipse with a 3px
+border and tail, caption box at the bottom) at the 800px desktop layout, so
+the page ships right-sized frames (or one vertical strip) instead of
+full-size PNGs with absolutely positioned overlay boxes. Text uses the same
+font cache as the coupon renderer (text_layout).
+"""
+import hashlib
+import html
+import json
+import os
+import re
+from contextlib import contextmanager
+
+from PIL import Image, ImageDraw, features
+
+from image_memory import image_bytes, load_fitted, reserve
+from text_layout import get_measurer, missing_glyphs
+
+FONT_PATH = 'assets/fonts/NotoSansJP-Bold.otf'
+
+# CSS layout the baked images reproduce: .comic-strip-section max-width and a 1.5x display
+SLOT_WIDTH = 800
+MAX_DPR = 1.5
+QUALITY = 80
+# Bump when the drawing changes so cached bakes are regenerated
+BAKE_VERSION = 1
+
+BAKE_MODES = ('frames', 'strip')
+
+# Glyphs drawn rotated in vertical text (long vowel mark, dashes, ellipsis, wave dash)
+ROTATED_CHARS = set('ー－-―—…‥~〜～')
+# Punctuation set in the upper-right of its cell in vertical text
+CORNER_CHARS = set('、。，．')
+TAG_RE = re.compile(r'<[^>]+>')
+BR_RE = re.compile(r'<br\s*/?>', re.IGNORECASE)
+
+
+def _lines(text):
+    """Bubble/caption markup -> plain lines (<br> breaks, other tags dropped, entities decoded)."""
+    return [html.unescape(TAG_RE.sub('', part)).strip() for part in BR_RE.split(text or '')]
+
+
+def _source_hash(path):
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class ComicBaker:
+    def __init__(self, font_path=FONT_PATH):
+        # Shared with CouponRenderer: fonts opened once per size, glyph metrics cached
+        self.text = get_measurer(font_path)
+
+    # --- Bubbles -------------------------------------------------------
+
+    def _vertical_text(self, img, lines, center, font_px, color=(0, 0, 0)):
+        """vertical-rl, text-orientation: upright; columns right to left, centred on center."""
+        font = self.text.font(font_px)
+        draw = ImageDraw.Draw(img)
+        column = font_px * 1.4
+        cx, cy = center
+        first_x = cx + (len(lines) - 1) * column / 2
+        for i, line in enumerate(lines):
+            x = first_x - i * column
+            top = cy - len(line) * font_px / 2
+            for j, char in enumerate(line):
+                y = top + (j + 0.5) * font_px
+                if char in ROTATED_CHARS:
+                    cell = Image.new('RGBA', (font_px * 2, font_px * 2), (0, 0, 0, 0))
+                    ImageDraw.Draw(cell).text((font_px, font_px), char, font=font, fill=color, anchor='mm')
+                    cell = cell.rotate(-90)
+                    img.alpha_composite(cell, (round(x - font_px), round(y - font_px)))
+                elif char in CORNER_CHARS:
+                    draw.text((x + font_px * 0.35, y - font_px * 0.35), char, font=font, fill=color, anchor='mm')
+                else:
+                    draw.text((x, y), char, font=font, fill=color, anchor='mm')
+
+    def _tail(self, draw, kind, box, s):
+        """The CSS ::after (black) / ::before (white) border triangles of each tail class."""
+        left, top, right, bottom = box
+        width = right - left
+        middle = (top + bottom) / 2
+        if kind == 'tail-bottom-left':
+            x, x2 = left + width * 0.20, left + width * 0.22
+            outer = [(x, bottom), (x + 15 * s, bottom), (x, bottom + 15 * s)]
+            inner = [(x2, bottom - 2 * s), (x2 + 12 * s, bottom - 2 * s), (x2, bottom + 10 * s)]
+        elif kind == 'tail-bottom-right':
+            x, x2 = right - width * 0.20, right - width * 0.22
+            outer = [(x - 15 * s, bottom), (x, bottom), (x, bottom + 15 * s)]
+            inner = [(x2 - 12 * s, bottom - 2 * s), (x2, bottom - 2 * s), (x2, bottom + 10 * s)]
+        elif kind == 'tail-top-left':
+            x, x2 = left + width * 0.20, left + width * 0.22
+            outer = [(x, top - 15 * s), (x, top), (x + 15 * s, top)]
+            inner = [(x2, top - 10 * s), (x2, top + 2 * s), (x2 + 12 * s, top + 2 * s)]
+        elif kind == 'tail-right':
+            outer = [(right, middle - 10 * s), (right, middle + 10 * s), (right + 15 * s, middle)]
+            inner = [(right - 1 * s, middle - 8 * s), (right - 1 * s, middle + 8 * s), (right + 11 * s, middle)]
+        else:
+            return
+        draw.polygon(outer, fill=(0, 0, 0, 255))
+        draw.polygon(inner, fill=(255, 255, 255, 255))
+
+    def draw_bubble(self, img, bubble, s):
+        """One .comic-bubble, s = image px per CSS px of the 800px layout."""
+        W, H = img.size
+        cqw = SLOT_WIDTH / 100 * s
+        lines = [line for line in _lines(bubble.get('text')) if line] or ['']
+        font_px = max(1, round(min(max(10 * s, 4 * cqw), 24 * s)))
+        shout = bubble.get('type') == 'shout'
+        pad = 25 * s if shout else 3 * cqw
+        border = 0 if shout else 3 * s
+
+        # content-box sizing: min-width/min-height apply to the content, padding/border add on
+        content_w = max(15 * cqw, len(lines) * font_px * 1.4)
+        content_h = max(20 * cqw, max(len(line) for line in lines) * font_px)
+        box_w = content_w + 2 * (pad + border)
+        box_h = content_h + 2 * (pad + border)
+        cx = float(bubble.get('x', 50)) / 100 * W
+        cy = float(bubble.get('y', 50)) / 100 * H
+        box = (cx - box_w / 2, cy - box_h / 2, cx + box_w / 2, cy + box_h / 2)
+
+        overlay = Image.new('RGBA', img.size, (0, 0, 0, 0))
+        draw = ImageDraw.Draw(overlay)
+        shadow = tuple(v + 4 * s for v in box)
+        if shout:
+            # clip-path polygon of .comic-bubble.shout, in box fractions
+            points = [(0.2, 0), (0, 0.2), (0.3, 0.5), (0, 0.8), (0.2, 1), (0.5, 0.7), (0.8, 1),
+                      (1, 0.8), (0.7, 0.5), (1, 0.2), (0.8, 0), (0.5, 0.3)]
+            polygon = [(box[0] + px * box_w, box[1] + py * box_h) for px, py in points]
+            draw.polygon([(x + 4 * s, y + 4 * s) for x, y in polygon], fill=(0, 0, 0, 26))
+            draw.polygon(polygon, fill=(255, 255, 255, 255))
+        else:
+            draw.ellipse(shadow, fill=(0, 0, 0, 26))
+            draw.ellipse(box, fill=(255, 255, 255, 255), outline=(0, 0, 0, 255), width=max(1, round(border)))
+            self._tail(draw, bubble.get('tail_position', 'bottom-left'), box, s)
+        img.alpha_composite(overlay)
+        self._vertical_text(img, lines, (cx, cy), font_px)
+
+    # --- Captions ------------------------------------------------------
+
+    def _wrap(self, text, font, max_width):
+        """Greedy per-character wrap (Japanese has no spaces to break on)."""
+        lines = []
+        for paragraph in _lines(text):
+            current = ''
+            for char in paragraph:
+                box = self.text.bbox(current + char, font)
+                if current and box[2] - box[0] > max_width:
+                    lines.append(current)
+                    current = char
+                else:
+                    current += char
+            lines.append(current)
+        return lines
+
+    def draw_caption(self, img, caption, s):
+        """.comic-caption: white box 20px from the bottom/sides, centred text."""
+        W, H = img.size
+        font_px = max(1, round(17.6 * s))
+        font = self.text.font(font_px)
+        pad, border, inset = 15 * s, 2 * s, 20 * s
+        lines = self._wrap(caption, font, W - 2 * (inset + pad + border))
+        line_h = font_px * 1.4
+        box_h = len(lines) * line_h + 2 * (pad + border)
+        box = (inset, H - inset - box_h, W - inset, H - inset)
+
+        overlay = Image.new('RGBA', img.size, (0, 0, 0, 0))
+        draw = ImageDraw.Draw(overlay)
+        draw.rounded_rectangle(tuple(v + 3 * s for v in box), radius=10 * s, fill=(0, 0, 0, 51))
+        draw.rounded_rectangle(box, radius=10 * s, fill=(255, 255, 255, 230), outline=(0, 0, 0, 255),
+                               width=max(1, round(border)))
+        img.alpha_composite(overlay)
+
+        draw = ImageDraw.Draw(img)
+        y = box[1] + border + pad + line_h / 2
+        for line in lines:
+            draw.text((W / 2, y), line, font=font, fill=(0, 0, 0, 255), anchor='mm')
+            y += line_h
+
+    # --- Frames --------------------------------------------------------
+
+    @contextmanager
+    def bake_frame(self, frame, source_path):
+        """
+        The frame at display size with its bubbles and caption drawn in (RGB),
+        reserved in the memory budget until the block ends.
+        """
+        width, height = _frame_size(source_path)
+        # Each bubble/caption composites a full-frame overlay, then the RGB copy
+        with load_fitted(source_path, (width, height), 'RGBA') as img, \
+                reserve(image_bytes((width, height), 'RGBA') * 2):
+            s = width / SLOT_WIDTH
+            for bubble in frame.get('bubbles') or []:
+                self.draw_bubble(img, bubble, s)
+            if frame.get('caption'):
+                self.draw_caption(img, frame['caption'], s)
+            yield img.convert('RGB')
+
+
+def _frame_size(source_path):
+    """Display size of a baked frame, from the image header."""
+    with Image.open(source_path) as src:
+        width = min(src.width, round(SLOT_WIDTH * MAX_DPR))
+        return width, round(src.height * width / src.width)
+
+
+def _save(img, output_img_dir, stem):
+    # WebP caps each side at 16383px; long strips fall back to JPEG
+    if features.check('webp') and max(img.size) <= 16383:
+        ext, fmt, params = 'webp', 'WEBP', {'quality': QUALITY, 'method': 6}
+    else:
+        ext, fmt, params = 'jpg', 'JPEG', {'quality': QUALITY, 'optimize': True, 'progressive': True}
+    filename = f"{stem}.{ext}"
+    tmp_path = os.path.join(output_img_dir, f".{filename}.tmp")
+    img.save(tmp_path, fmt, **params)
+    os.replace(tmp_path, os.path.join(output_img_dir, filename))
+    return filename
+
+
+def _existing(output_img_dir, stem):
+    for ext in ('webp', 'jpg'):
+        if os.path.exists(os.path.join(output_img_dir, f"{stem}.{ext}")):
+            return f"{stem}.{ext}"
+    return None
+
+
+def bake_comic(comic_data, output_img_dir, rel_img_dir, font_path=FONT_PATH):
+    """
+    Bakes a comic_strip section (top-level so it can run in an image worker).
+    Returns {'mode', 'frames': [urls]} or {'mode', 'strip': url}, or None when
+    a frame image is not a local file (the section then renders as HTML overlays).
+    File names hash the sources and the bubble data, so unchanged comics are reused.
+    """
+    mode = comic_data.get('bake')
+    frames = comic_data.get('frames') or []
+    if mode not in BAKE_MODES or not frames:
+        return None
+    sources = [frame.get('image_url') for frame in frames]
+    if not all(isinstance(url, str) and '://' not in url and not url.startswith(('data:', '//'))
+               and os.path.isfile(url) for url in sources):
+        print("Warning: Comic baking needs local frame images; keeping HTML bubbles.")
+        return None
+
+    # Without the font (Pillow would fall back to its bitmap default) the
+    # Japanese dialogue would be baked as empty boxes
+    if not os.path.isfile(font_path):
+        print(f"Warning: Comic baking needs the font {font_path}; keeping HTML bubbles.")
+        return None
+    text = ''.join(line for frame in frames
+                   for item in [bubble.get('text') for bubble in frame.get('bubbles') or []] + [frame.get('caption')]
+                   for line in _lines(item if isinstance(item, str) else ''))
+    missing = missing_glyphs(font_path, text)
+    if missing:
+        print(f"Warning: {font_path} has no glyphs for {''.join(sorted(missing))[:20]}; keeping HTML bubbles.")
+        return None
+
+    os.makedirs(output_img_dir, exist_ok=True)
+    baker = ComicBaker(font_path)
+
+    def stem_for(items):
+        payload = json.dumps([BAKE_VERSION, SLOT_WIDTH, MAX_DPR, mode,
+                              [[_source_hash(frame['image_url']), frame.get('bubbles'), frame.get('caption')]
+                               for frame in items]], sort_keys=True, ensure_ascii=False)
+        return f"comic_{mode}.{hashlib.sha1(payload.encode('utf-8')).hexdigest()[:10]}"
+
+    if mode == 'frames':
+        urls = []
+        for frame in frames:
+            stem = stem_for([frame])
+            filename = _existing(output_img_dir, stem)
+            if filename is None:
+                with baker.bake_frame(frame, frame['image_url']) as img:
+                    filename = _save(img, output_img_dir, stem)
+            urls.append(f"{rel_img_dir}/{filename}")
+        return {'mode': mode, 'frames': urls}
+
+    stem = stem_for(frames)
+    filename = _existing(output_img_dir, stem)
+    if filename is None:
+        # Sized from the headers, so frames are baked and pasted one at a time
+        sizes = [_frame_size(frame['image_url']) for frame in frames]
+        width = min(w for w, _ in sizes)
+        heights = [h if w == width else round(h * width / w) for w, h in sizes]
+        with reserve(image_bytes((width, sum(heights)), 'RGB')):
+            strip = Image.new('RGB', (width, sum(heights)))
+            y = 0
+            for frame, height in zip(frames, heights):
+                with baker.bake_frame(frame, frame['image_url']) as img:
+                    if img.width != width:
+                        with reserve(image_bytes((width, height), 'RGB')):
+                            strip.paste(img.resize((width, height), Image.Resampling.LANCZOS), (0, y))
+                    else:
+                        strip.paste(img, (0, y))
+                y += height
+            filename = _save(strip, output_img_dir, stem)
+    return {'mode': mode, 'strip': f"{rel_img_dir}/{filename}"}
@@ -1,11 +1,37 @@
+import hashlib
+import io
+import json
 import os
-from PIL import Image, ImageDraw, ImageFont, ImageOps
+import shutil
+from html import escape
+from PIL import Image, ImageDraw, ImageOps, features
+
+from image_memory import image_bytes, load_fitted, reserve
+from text_layout import get_measurer
+
+# Fixed PNG encoder settings (Pillow's defaults, spelled out) so coupon bytes
+# only depend on the coupon, not on library defaults
+PNG_PARAMS = {'compress_level': 6, 'optimize': False}
+
+# Prefix of the mask ids in generated SVG (see svg_instance)
+SVG_ID_PREFIX = 'coupon-'
+
+
+def svg_instance(svg, index):
+    """The SVG markup with its mask ids made unique for the index-th copy inlined into one page."""
+    return (svg.replace(f'id="{SVG_ID_PREFIX}', f'id="{SVG_ID_PREFIX}{index}-')
+               .replace(f'url(#{SVG_ID_PREFIX}', f'url(#{SVG_ID_PREFIX}{index}-'))
+
 
 class CouponRenderer:
     def __init__(self, template_dir='assets/templates/coupon', font_path='assets/fonts/NotoSansJP-Bold.otf'):
         self.template_dir = template_dir
         self.font_path = font_path
         self.default_font_size = 40
+        self._background_cache = {}
+        self._decoded_backgrounds = {}
+        # Fonts and glyph metrics are cached per font file and shared process-wide
+        self.text = get_measurer(font_path)
         
         # Color palettes for auto-styling
         self.palettes = {
@@ -33,11 +59,7 @@ class CouponRenderer:
         }
 
     def _get_font(self, size):
-        try:
-            return ImageFont.truetype(self.font_path, size)
-        except OSError:
-            # Fallback to default if font not found
-            return ImageFont.load_default()
+        return self.text.font(size)
 
     def auto_style(self, template_id, element_type):
         """Returns default style for an element based on template."""
@@ -72,12 +94,23 @@ class CouponRenderer:
         output.putalpha(mask)
         return output
 
-    def generate(self, coupon_data, output_path):
-        """
-        Generates a coupon image based on data.
-        coupon_data: dict containing 'template' and 'elements'
-        output_path: where to save the image
-        """
+    def _load_elements(self, coupon_data):
+        """Returns a private copy of the coupon's element configs (with misplaced keys merged in)."""
+        # Copy each element config: auto-layout below writes x/align into them,
+        # which must not leak back into the caller's plan data.
+        elements = {k: dict(v) if isinstance(v, dict) else v for k, v in coupon_data.get('elements', {}).items()}
+        
+        # Robustness: Check for misplaced elements at the top level
+        # If user accidentally puts 'amount' or 'target' outside 'elements', capture them.
+        known_keys = ['title', 'subtitle', 'target', 'amount', 'unit', 'off', 'message', 'condition', 'logo', 'description']
+        for k, v in coupon_data.items():
+             if k in known_keys and k not in elements and isinstance(v, dict):
+                 print(f"Auto-repair: Found misplaced element '{k}' at top level. Merging into elements.")
+                 elements[k] = dict(v)
+        return elements
+
+    def resolve_template(self, coupon_data):
+        """Returns (template_id, background path), falling back to gold. Path is None if no template exists."""
         template_id = coupon_data.get('template', 'gold')
         bg_path = os.path.join(self.template_dir, f"{template_id}.png")
         
@@ -87,29 +120,38 @@ class CouponRenderer:
             template_id = 'gold'
             if not os.path.exists(bg_path):
                  print("Error: Base templates not found.")
-                 return False
+                 return template_id, None
+        return template_id, bg_path
 
-        # Open Background
+    def load_background(self, bg_path):
+        """Returns a fresh RGBA copy of a template background, decoded once per process."""
+        st = os.stat(bg_path)
+        key = (bg_path, st.st_size, st.st_mtime_ns)
+        if key not in self._decoded_backgrounds:
+            with Image.open(bg_path) as bg:
+                self._decoded_backgrounds[key] = bg.convert("RGBA")
+        return self._decoded_backgrounds[key].copy()
+
+    def _measure(self, text, font):
+        """Returns the text bbox (left, top, right, bottom) when drawn at the origin."""
+        return self.text.bbox(text, font)
+
+    def _ascent(self, font, size):
+        """Distance from the top of a line to its baseline (for SVG text placement)."""
         try:
-            image = Image.open(bg_path).convert("RGBA")
-            draw = ImageDraw.Draw(image)
-            width, height = image.size
-        except Exception as e:
-            print(f"Error loading template: {e}")
-            return False
+            return font.getmetrics()[0]
+        except AttributeError:
+            # Bitmap fallback font has no metrics
+            return int(size * 0.88)
 
-        elements = coupon_data.get('elements', {}).copy()
-        
-        # Robustness: Check for misplaced elements at the top level
-        # If user accidentally puts 'amount' or 'target' outside 'elements', capture them.
-        known_keys = ['title', 'subtitle', 'target', 'amount', 'unit', 'off', 'message', 'condition', 'logo', 'description']
-        for k, v in coupon_data.items():
-             if k in known_keys and k not in elements and isinstance(v, dict):
-                 print(f"Auto-repair: Found misplaced element '{k}' at top level. Merging into elements.")
-                 elements[k] = v
-        
-        # Draw each element
-        # Supported elements: text, image
+    def layout(self, template_id, elements, width, height):
+        """
+        Computes the drawing operations for a coupon of the given size.
+        Shared by the raster (PNG) and vector (SVG) back ends, so both place
+        every element identically. Each op is a dict with 'kind' in
+        ('rect', 'text', 'image').
+        """
+        ops = []
         
         # -------------------------------------------------------------
         # Auto-Layout: Center Group (Amount + Unit)
@@ -129,13 +171,13 @@ class CouponRenderer:
                  # 1. Measure Amount
                  amt_defaults = self.auto_style(template_id, 'amount')
                  amt_font = self._get_font(elements['amount'].get('size', amt_defaults['size']))
-                 amt_bbox = draw.textbbox((0, 0), elements['amount']['text'], font=amt_font)
+                 amt_bbox = self._measure(elements['amount']['text'], amt_font)
                  amt_w = amt_bbox[2] - amt_bbox[0]
                  
                  # 2. Measure Unit
                  unit_defaults = self.auto_style(template_id, 'unit')
                  unit_font = self._get_font(elements['unit'].get('size', unit_defaults['size']))
-                 unit_bbox = draw.textbbox((0, 0), elements['unit']['text'], font=unit_font)
+                 unit_bbox = self._measure(elements['unit']['text'], unit_font)
                  unit_w = unit_bbox[2] - unit_bbox[0]
                  
                  # 3. Calculate Total Width + Spacing
@@ -153,9 +195,6 @@ class CouponRenderer:
                  elements['unit']['x'] = start_x + amt_w + spacing
                  elements['unit']['align'] = 'left'
                  
-                 # Adjust Y to align baselines if needed (simple approach: keep existing relative Y)
-                 # Or align centers? Let's trust the Y config for now but maybe nudge unit down?
-                 # Often unit is smaller and needs to sit on baseline. 
                  # For now, we trust the JSON's Y relative positioning for vertical alignment.
 
         # -------------------------------------------------------------
@@ -164,54 +203,50 @@ class CouponRenderer:
             element_type = config.get('type', 'text')
             
             if element_type == 'image':
-                # Image Compositing
                 img_path = config.get('path', '')
                 if not img_path or not os.path.exists(img_path):
                     print(f"Warning: Image element {key} path not found: {img_path}")
                     continue
                 
                 try:
-                    overlay = Image.open(img_path).convert("RGBA")
-                    
-                    # Resize if needed
-                    if 'width' in config and 'height' in config:
-                        overlay = overlay.resize((config['width'], config['height']), Image.Resampling.LANCZOS)
-                    elif 'scale' in config:
-                         new_size = (int(overlay.width * config['scale']), int(overlay.height * config['scale']))
-                         overlay = overlay.resize(new_size, Image.Resampling.LANCZOS)
-
-                    # Position
-                    img_w, img_h = overlay.size
-                    
-                    # Y Position
-                    if 'y' in config:
-                        if isinstance(config['y'], float):
-                            y = int(height * config['y'])
-                        else:
-                            y = int(config['y'])
+                    # Size only: the raster back end decodes the pixels later
+                    with Image.open(img_path) as overlay:
+                        img_w, img_h = overlay.size
+                except Exception as e:
+                    print(f"Error drawing image element {key}: {e}")
+                    continue
+
+                # Resize if needed
+                if 'width' in config and 'height' in config:
+                    img_w, img_h = config['width'], config['height']
+                elif 'scale' in config:
+                    img_w, img_h = int(img_w * config['scale']), int(img_h * config['scale'])
+
+                # Y Position
+                if 'y' in config:
+                    if isinstance(config['y'], float):
+                        y = int(height * config['y'])
                     else:
-                        y = 0
-
-                    # X Position
-                    if 'x' in config:
-                        if isinstance(config['x'], float):
-                            x = int(width * config['x'])
-                        else:
-                            x = int(config['x'])
-                        
-                        align = config.get('align', 'center')
-                        if align == 'center':
-                            x = x - int(img_w / 2)
-                        elif align == 'right':
-                            x = x - img_w
+                        y = int(config['y'])
+                else:
+                    y = 0
+
+                # X Position
+                if 'x' in config:
+                    if isinstance(config['x'], float):
+                        x = int(width * config['x'])
                     else:
-                        x = int((width - img_w) / 2)
-                        
-                    image.alpha_composite(overlay, (x, y))
+                        x = int(config['x'])
                     
-                except Exception as e:
-                    print(f"Error drawing image element {key}: {e}")
-                
+                    align = config.get('align', 'center')
+                    if align == 'center':
+                        x = x - int(img_w / 2)
+                    elif align == 'right':
+                        x = x - img_w
+                else:
+                    x = int((width - img_w) / 2)
+
+                ops.append({'kind': 'image', 'key': key, 'path': img_path, 'x': x, 'y': y, 'width': img_w, 'height': img_h})
                 continue
 
             # Text Rendering
@@ -228,7 +263,7 @@ class CouponRenderer:
             
             # Measure text
             # textbbox returns (left, top, right, bottom)
-            text_bbox = draw.textbbox((0, 0), text, font=font)
+            text_bbox = self._measure(text, font)
             text_width = text_bbox[2] - text_bbox[0]
             text_height = text_bbox[3] - text_bbox[1]
             
@@ -267,16 +302,68 @@ class CouponRenderer:
             # Background (e.g. for Target badge)
             if bg_color:
                 padding = 15
-                bg_box = [
-                    x - padding, 
-                    y - padding, 
-                    x + text_width + padding, 
-                    y + text_height + padding
-                ]
-                draw.rectangle(bg_box, fill=bg_color, outline=None)
+                ops.append({
+                    'kind': 'rect',
+                    'box': [x - padding, y - padding, x + text_width + padding, y + text_height + padding],
+                    'fill': bg_color
+                })
             
-            # Draw Text
-            draw.text((x, y), text, font=font, fill=color)
+            ops.append({
+                'kind': 'text', 'key': key, 'text': text, 'x': x, 'y': y,
+                'size': size, 'color': color, 'font': font, 'ascent': self._ascent(font, size)
+            })
+
+        return ops
+
+    def generate(self, coupon_data, output_path):
+        """
+        Generates a coupon image based on data.
+        coupon_data: dict containing 'template' and 'elements'
+        output_path: where to save the image
+        """
+        template_id, bg_path = self.resolve_template(coupon_data)
+        if bg_path is None:
+            return False
+
+        # Canvas, its shape mask and the alpha-composite scratch copy; the
+        # decoded background itself stays cached in the renderer
+        try:
+            with Image.open(bg_path) as bg:
+                canvas_bytes = image_bytes(bg.size, 'RGBA') * 2 + image_bytes(bg.size, 'L')
+        except Exception as e:
+            print(f"Error loading template: {e}")
+            return False
+        with reserve(canvas_bytes):
+            return self._render(coupon_data, template_id, bg_path, output_path)
+
+    def _render(self, coupon_data, template_id, bg_path, output_path):
+        # Open Background
+        try:
+            image = self.load_background(bg_path)
+            draw = ImageDraw.Draw(image)
+            width, height = image.size
+        except Exception as e:
+            print(f"Error loading template: {e}")
+            return False
+
+        elements = self._load_elements(coupon_data)
+
+        # Draw each element
+        # Supported elements: text, image
+        for op in self.layout(template_id, elements, width, height):
+            if op['kind'] == 'image':
+                # Image Compositing
+                try:
+                    # Decoded at (or near) the drawn size: JPEG draft, reduce, band-wise resize
+                    with load_fitted(op['path'], (op['width'], op['height']), "RGBA") as overlay:
+                        image.alpha_composite(overlay, (op['x'], op['y']))
+                except Exception as e:
+                    print(f"Error drawing image element {op['key']}: {e}")
+            elif op['kind'] == 'rect':
+                draw.rectangle(op['box'], fill=op['fill'], outline=None)
+            else:
+                # Draw Text
+                draw.text((op['x'], op['y']), op['text'], font=op['font'], fill=op['color'])
 
         # Apply Shape Mask if requested
         shape = coupon_data.get('shape')
@@ -284,10 +371,134 @@ class CouponRenderer:
             image = self._apply_mask(image, shape_type=shape)
 
         # Save
-        image.save(output_path)
+        image.save(output_path, 'PNG', **PNG_PARAMS)
         print(f"Coupon generated at {output_path}")
         return True
 
+    def background_asset(self, template_id, bg_path, output_dir):
+        """
+        Writes the template background once as a compressed, content-hashed file
+        into output_dir and returns its filename. Encoded bytes are cached per
+        template, so every coupon on every page shares one image.
+        """
+        if template_id not in self._background_cache:
+            with Image.open(bg_path) as bg:
+                bg = bg.convert("RGB")
+                buf = io.BytesIO()
+                if features.check('webp'):
+                    bg.save(buf, 'WEBP', quality=85, method=6)
+                    ext = 'webp'
+                else:
+                    bg.save(buf, 'JPEG', quality=85, optimize=True, progressive=True)
+                    ext = 'jpg'
+            data = buf.getvalue()
+            digest = hashlib.sha1(data).hexdigest()[:10]
+            self._background_cache[template_id] = (f"coupon_bg_{template_id}.{digest}.{ext}", data)
+
+        filename, data = self._background_cache[template_id]
+        if not os.path.exists(output_dir):
+            os.makedirs(output_dir)
+        path = os.path.join(output_dir, filename)
+        if not os.path.exists(path):
+            with open(path, 'wb') as f:
+                f.write(data)
+        return filename
+
+    def _svg_shape(self, shape, width, height, clip_id, radius=30):
+        """Returns (defs markup, mask attribute) reproducing _apply_mask as an SVG mask."""
+        if shape not in ('rounded', 'ticket'):
+            return '', ''
+        cut = ''
+        if shape == 'ticket':
+            cut_radius = 40
+            cy = height // 2
+            cut = (f'<circle cx="0" cy="{cy}" r="{cut_radius}" fill="black"/>'
+                   f'<circle cx="{width}" cy="{cy}" r="{cut_radius}" fill="black"/>')
+        defs = (f'<mask id="{clip_id}"><rect width="{width}" height="{height}" rx="{radius}" fill="white"/>'
+                f'{cut}</mask>')
+        return defs, f' mask="url(#{clip_id})"'
+
+    def overlay_asset(self, path, output_dir):
+        """
+        Copies an image overlay into output_dir under a content-hashed name
+        ({stem}.{hash}{ext}, so different files with the same name never
+        collide) and returns the filename.
+        """
+        with open(path, 'rb') as f:
+            digest = hashlib.sha1(f.read()).hexdigest()[:10]
+        stem, ext = os.path.splitext(os.path.basename(path))
+        filename = f"{stem}.{digest}{ext}"
+        os.makedirs(output_dir, exist_ok=True)
+        target = os.path.join(output_dir, filename)
+        if not os.path.exists(target):
+            shutil.copyfile(path, target)
+        return filename
+
+    def generate_svg(self, coupon_data, asset_dir, asset_url_prefix, font_family="'Noto Sans JP', sans-serif",
+                     overlays=None):
+        """
+        Vector coupon: the same layout as generate(), emitted as inline SVG markup.
+        The background is written once to asset_dir (shared by all coupons using
+        the template) and text stays real text, so it is crisp at any DPI and
+        can be covered by the page's subset web font.
+        asset_url_prefix: page-relative URL of asset_dir.
+        overlays: optional list; source paths of the image overlays copied into
+        asset_dir are appended (callers reusing the markup copy them again).
+        Mask ids are the same for every copy; see svg_instance().
+        Returns the SVG markup, or None on failure.
+        """
+        template_id, bg_path = self.resolve_template(coupon_data)
+        if bg_path is None:
+            return None
+
+        try:
+            with Image.open(bg_path) as bg:
+                width, height = bg.size
+            bg_file = self.background_asset(template_id, bg_path, asset_dir)
+        except Exception as e:
+            print(f"Error loading template: {e}")
+            return None
+
+        elements = self._load_elements(coupon_data)
+        ops = self.layout(template_id, elements, width, height)
+
+        label = ' '.join(op['text'] for op in ops if op['kind'] == 'text')
+        clip_id = SVG_ID_PREFIX + hashlib.sha1(json.dumps(coupon_data, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()[:8]
+        defs, mask_attr = self._svg_shape(coupon_data.get('shape'), width, height, clip_id)
+
+        parts = [
+            f'<svg class="coupon-svg" xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {width} {height}" '
+            f'width="{width}" height="{height}" style="max-width:100%;height:auto" role="img" '
+            f'aria-label="{escape(label)}" font-family="{escape(font_family)}">'
+        ]
+        if defs:
+            parts.append(f'<defs>{defs}</defs>')
+        parts.append(f'<g{mask_attr}>')
+        parts.append(f'<image href="{asset_url_prefix}/{bg_file}" width="{width}" height="{height}"/>')
+
+        for op in ops:
+            if op['kind'] == 'image':
+                # Overlays are copied next to the background
+                name = self.overlay_asset(op['path'], asset_dir)
+                if overlays is not None:
+                    overlays.append(op['path'])
+                parts.append(f'<image href="{asset_url_prefix}/{escape(name)}" x="{op["x"]}" y="{op["y"]}" '
+                             f'width="{op["width"]}" height="{op["height"]}"/>')
+            elif op['kind'] == 'rect':
+                x0, y0, x1, y1 = op['box']
+                parts.append(f'<rect x="{x0}" y="{y0}" width="{x1 - x0}" height="{y1 - y0}" fill="{escape(op["fill"])}"/>')
+            else:
+                # SVG text is placed on its baseline; Pillow draws from the line top
+                parts.append(
+                    f'<text x="{op["x"]}" y="{op["y"] + op["ascent"]}" font-size="{op["size"]}" '
+                    f'font-weight="700" fill="{escape(op["color"])}">{escape(op["text"])}</text>'
+                )
+
+        parts.append('</g></svg>')
+        svg = ''.join(parts)
+        print(f"Coupon SVG generated ({len(svg)} bytes, background {bg_file})")
+        return svg
+
 if __name__ == "__main__":
     # Test run
     renderer = CouponRenderer()
@@ -0,0 +1,223 @@
+import json
+import os
+import sys
+import threading
+from contextlib import contextmanager
+
+from jinja2 import Environment
+
+_recording = threading.local()
+
+
+def _rel(path):
+    return os.path.relpath(path).replace(os.sep, '/')
+
+
+class TrackingEnvironment(Environment):
+    """
+    Environment that reports every template a render pulls in (the page
+    itself, extends, include, import) to the recorder active in the
+    calling thread. This sits on get_template rather than the loader:
+    Jinja caches compiled templates per environment, so a loader only sees
+    the first page that needs a template, not every page that uses it.
+    """
+
+    def _note(self, template):
+        loaded = getattr(_recording, 'loaded', None)
+        if loaded is not None and template.filename:
+            loaded[template.name] = _rel(template.filename)
+        return template
+
+    def get_template(self, name, parent=None, globals=None):
+        return self._note(super().get_template(name, parent, globals))
+
+    def select_template(self, names, parent=None, globals=None):
+        return self._note(super().select_template(names, parent, globals))
+
+
+@contextmanager
+def recording():
+    """Collects {template name: file} of the templates loaded in this thread while active."""
+    previous = getattr(_recording, 'loaded', None)
+    _recording.loaded = {}
+    try:
+        yield _recording.loaded
+    finally:
+        loaded = _recording.loaded
+        _recording.loaded = previous
+        if previous is not None:
+            previous.update(loaded)
+
+
+def _template_name(path):
+    """
+    templates/{style}/x.html -> (style, 'x.html'); templates/common/x.html and
+    templates/x.html -> (None, 'x.html') since every style can load them.
+    None for paths outside the template tree.
+    """
+    from generator import TEMPLATE_DIR
+    parts = _rel(path).split('/')
+    root = _rel(TEMPLATE_DIR).split('/')
+    if parts[:len(root)] != root or len(parts) <= len(root):
+        return None
+    rest = parts[len(root):]
+    if len(rest) == 1:
+        return None, rest[0]
+    if rest[0] == 'common':
+        return None, '/'.join(rest[1:])
+    return rest[0], '/'.join(rest[1:])
+
+
+class DependencyIndex:
+    """
+    Which files each built page was made from: the templates its render
+    loaded (by name and resolved file), the other source files it was
+    built from (JS modules, static CSS, coupon background), the section
+    types of its plan and the plan file itself. Saved with reverse indexes
+    (template / source file -> pages) so "what does this edit affect?" is
+    a lookup, not a rebuild.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.pages = {}
+        self.sources = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    saved = json.load(f)
+                self.pages = saved.get('pages', {})
+                self.sources = saved.get('sources', {})
+            except (OSError, ValueError):
+                print(f"Warning: Ignoring unreadable dependency index {path}.")
+
+    def record(self, html_path, plan, style, templates, sections, files=()):
+        """
+        Replaces the entry of one page (templates: {name: file} from recording(),
+        files: other source files the page's output was built from).
+        """
+        with self._lock:
+            self.pages[_rel(html_path)] = {
+                'plan': plan,
+                'style': style,
+                'templates': dict(sorted(templates.items())),
+                'files': sorted({_rel(path) for path in files}),
+                'sections': sorted(set(sections))
+            }
+            self._dirty = True
+
+    def add_source(self, plan, path):
+        with self._lock:
+            if self.sources.get(plan) != _rel(path):
+                self.sources[plan] = _rel(path)
+                self._dirty = True
+
+    def reverse(self, key='templates'):
+        """{template file: [pages]}, or {source file: [pages]} for key='files'"""
+        index = {}
+        for page, entry in self.pages.items():
+            used = entry.get(key, ())
+            for filename in (used.values() if isinstance(used, dict) else used):
+                index.setdefault(filename, []).append(page)
+        return {filename: sorted(pages) for filename, pages in sorted(index.items())}
+
+    def save(self):
+        """Writes pages, plan sources and the reverse index (pages that no longer exist are dropped)."""
+        if not self._dirty or not self.path:
+            return
+        with self._lock:
+            self.pages = {page: entry for page, entry in self.pages.items() if os.path.exists(page)}
+            self._dirty = False
+            saved = {'pages': self.pages, 'sources': self.sources, 'templates': self.reverse(),
+                     'files': self.reverse('files')}
+        index_dir = os.path.dirname(self.path)
+        if index_dir:
+            os.makedirs(index_dir, exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(saved, f, ensure_ascii=False, sort_keys=True)
+        os.replace(tmp, self.path)
+
+
+def load_index(path):
+    """The saved index as a dict, or None if no build has written one yet."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def affected(index, path):
+    """
+    Pages to rebuild after `path` changed, from a saved index:
+    - a template file: the pages that loaded it, plus pages that would now
+      resolve to it (a new templates/{style}/x.html shadowing a common one,
+      or a component for a section type that had no template of its own);
+    - a JS module, static CSS file or coupon background: the pages built from it;
+    - a plan file: every page built from it.
+    """
+    rel = _rel(path)
+    pages = set(index.get('templates', {}).get(rel, []))
+    pages.update(index.get('files', {}).get(rel, []))
+
+    resolved = _template_name(rel)
+    if resolved is not None:
+        style, name = resolved
+        stem = os.path.splitext(name)[0]
+        section = stem[len('components/'):] if stem.startswith('components/') else None
+        for page, entry in index.get('pages', {}).items():
+            if style is not None and entry['style'] != style:
+                continue
+            if name in entry['templates'] or section in entry['sections']:
+                pages.add(page)
+
+    plans = {plan for plan, source in index.get('sources', {}).items() if source == rel}
+    if plans:
+        pages.update(page for page, entry in index.get('pages', {}).items() if entry['plan'] in plans)
+    return sorted(pages)
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(prog='generator.py affected',
+                                     description='List built pages that depend on the given templates, assets or plans')
+    parser.add_argument('paths', nargs='+',
+                        help='Changed files (templates/..., static/js/modules/*.js, static/css/*.css, '
+                             'assets/templates/coupon/*.png, input/*.json)')
+    parser.add_argument('--index', help='Dependency index written by the last build (default: generator.DEPS_PATH)')
+    parser.add_argument('--commands', action='store_true',
+                        help='Print the generator.py invocations that rebuild them instead of the pages')
+    args = parser.parse_args(argv)
+
+    from generator import DEPS_PATH
+    args.index = args.index or DEPS_PATH
+    index = load_index(args.index)
+    if index is None:
+        print(f"No dependency index at {args.index}; run a build first.", file=sys.stderr)
+        return 1
+
+    pages = sorted({page for path in args.paths for page in affected(index, path)})
+    if not args.commands:
+        for page in pages:
+            print(page)
+        return 0
+
+    # One invocation per (plan file, style); variant plans rebuild all their variants
+    commands = set()
+    for page in pages:
+        entry = index['pages'][page]
+        source = index.get('sources', {}).get(entry['plan'])
+        if source is None:
+            print(f"Warning: No plan file recorded for {page}.", file=sys.stderr)
+            continue
+        commands.add((source, entry['style']))
+    for source, style in sorted(commands):
+        print(f"python generator.py {source} --style {style}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,34 +1,253 @@
-from bs4 import BeautifulSoup
+"""
+Asset inventory of LP markup: ours (output/**/index.html) and reference pages.
+
+Every file is parsed in a worker process (selectolax when installed, the
+standard library parser otherwise); references are collected from <img src>
+and srcset, <picture><source srcset>, video posters and sources (click-to-play
+facades included), preload / icon links, og:image, and CSS url() in style
+attributes and <style> blocks.
+The merged inventory lists each asset once, with the pages that use it and,
+for local files, its size and dimensions.
+
+    python extract_images.py                      # default page set
+    python extract_images.py research/lp_styles/*.html --output inventory.json
+"""
+import glob
 import json
 import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from html.parser import HTMLParser
+from urllib.parse import urlparse
+
+DEFAULT_INPUTS = ['reference_markup.html', 'research/lp_styles/*.html', 'output/**/index.html']
+INVENTORY_PATH = '.cache/asset_inventory.json'
+
+CSS_URL_RE = re.compile(r'url\(\s*([\'"]?)(.*?)\1\s*\)')
+# One srcset candidate: a URL (data: URIs may contain commas) and an optional descriptor
+SRCSET_RE = re.compile(r'(?:^|,)\s*(data:\S+|[^\s,]+)(?:\s+[^,]*)?')
+PRELOAD_RELS = {'preload', 'prefetch', 'modulepreload', 'icon', 'apple-touch-icon'}
+
+
+def _srcset_urls(value):
+    return [m.group(1) for m in SRCSET_RE.finditer(value or '')]
+
+
+def _refs_from_tag(tag, attrs, in_picture):
+    """(kind, url) references of one start tag."""
+    refs = []
+    if attrs.get('style'):
+        refs.extend(('css-url', url) for url in _css_urls(attrs['style']))
+    # Click-to-play facades (templates/common/video_facade.html) create the <video> on interaction
+    if attrs.get('data-poster'):
+        refs.append(('poster', attrs['data-poster']))
+    if attrs.get('data-video-src'):
+        refs.append(('video', attrs['data-video-src']))
+
+    if tag == 'img':
+        if attrs.get('src'):
+            refs.append(('img', attrs['src']))
+        # Lazy-loading libraries keep the real source in data-*
+        for name in ('data-src', 'data-lazy-src'):
+            if attrs.get(name):
+                refs.append(('img', attrs[name]))
+        refs.extend(('srcset', url) for url in _srcset_urls(attrs.get('srcset') or attrs.get('data-srcset')))
+    elif tag == 'source':
+        if in_picture:
+            refs.extend(('picture-source', url) for url in _srcset_urls(attrs.get('srcset')))
+        elif attrs.get('src'):
+            refs.append(('video', attrs['src']))
+    elif tag == 'video':
+        if attrs.get('poster'):
+            refs.append(('poster', attrs['poster']))
+        if attrs.get('src'):
+            refs.append(('video', attrs['src']))
+    elif tag == 'link':
+        rel = set((attrs.get('rel') or '').lower().split())
+        if rel & PRELOAD_RELS and attrs.get('href'):
+            refs.append(('preload' if rel & {'preload', 'prefetch', 'modulepreload'} else 'icon', attrs['href']))
+        if 'preload' in rel and attrs.get('imagesrcset'):
+            refs.extend(('preload', url) for url in _srcset_urls(attrs['imagesrcset']))
+    elif tag == 'meta':
+        if (attrs.get('property') or attrs.get('name')) in ('og:image', 'twitter:image') and attrs.get('content'):
+            refs.append(('og:image', attrs['content']))
+    return refs
+
+
+def _css_urls(css):
+    return [m.group(2) for m in CSS_URL_RE.finditer(css) if m.group(2)]
+
+
+class _RefParser(HTMLParser):
+    """Standard-library fallback: streams start tags and <style> text."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.refs = []
+        self._picture = 0
+        self._in_style = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'picture':
+            self._picture += 1
+        elif tag == 'style':
+            self._in_style = True
+        self.refs.extend(_refs_from_tag(tag, {k: v for k, v in attrs if v is not None}, self._picture > 0))
+
+    def handle_startendtag(self, tag, attrs):
+        self.refs.extend(_refs_from_tag(tag, {k: v for k, v in attrs if v is not None}, self._picture > 0))
+
+    def handle_endtag(self, tag):
+        if tag == 'picture':
+            self._picture = max(0, self._picture - 1)
+        elif tag == 'style':
+            self._in_style = False
+
+    def handle_data(self, data):
+        if self._in_style:
+            self.refs.extend(('css-url', url) for url in _css_urls(data))
+
+
+def _parse_selectolax(html):
+    from selectolax.parser import HTMLParser as FastParser
+
+    tree = FastParser(html)
+    refs = []
+    for node in tree.css('img, source, video, link, meta, [style], [data-video-src], [data-poster]'):
+        attrs = {k: v for k, v in node.attributes.items() if v is not None}
+        in_picture = node.tag == 'source' and node.parent is not None and node.parent.tag == 'picture'
+        refs.extend(_refs_from_tag(node.tag, attrs, in_picture))
+    for node in tree.css('style'):
+        refs.extend(('css-url', url) for url in _css_urls(node.text(deep=True)))
+    return refs
+
+
+def _parse_stdlib(html):
+    parser = _RefParser()
+    parser.feed(html)
+    parser.close()
+    return parser.refs
+
 
 def extract_images(html_file):
-    if not os.path.exists(html_file):
-        print(f"File not found: {html_file}")
-        return
-
-    with open(html_file, 'r', encoding='utf-8') as f:
-        content = f.read()
-
-    soup = BeautifulSoup(content, 'html.parser')
-    
-    images = []
-    
-    # Standard img tags
-    for img in soup.find_all('img'):
-        src = img.get('src')
-        if src:
-            images.append({'type': 'img', 'src': src, 'alt': img.get('alt', '')})
-            
-    # Next.js images often use style or other attributes, but let's check standard first
-    # Also check for background images in inline styles if possible, though harder.
-    
-    # Check for OpenGraph image
-    og_image = soup.find('meta', property='og:image')
-    if og_image:
-        images.append({'type': 'og:image', 'src': og_image.get('content')})
-
-    print(json.dumps(images, indent=2, ensure_ascii=False))
+    """Returns the (kind, url) asset references of one HTML file, in document order."""
+    with open(html_file, 'r', encoding='utf-8', errors='replace') as f:
+        html = f.read()
+    try:
+        refs = _parse_selectolax(html)
+    except ImportError:
+        refs = _parse_stdlib(html)
+    return [(kind, url.strip()) for kind, url in refs if url.strip() and not url.startswith(('data:', '#'))]
+
+
+def _extract(html_file):
+    try:
+        return html_file, extract_images(html_file), None
+    except (OSError, ValueError) as e:
+        return html_file, [], str(e)
+
+
+def _local_path(html_file, url):
+    """The file a page-relative URL points at, or None (remote, root-relative or missing)."""
+    if '://' in url or url.startswith(('//', '/')):
+        return None
+    path = os.path.normpath(os.path.join(os.path.dirname(html_file), urlparse(url).path))
+    return path if os.path.isfile(path) else None
+
+
+def _describe(path):
+    entry = {'bytes': os.path.getsize(path), 'width': None, 'height': None}
+    if not path.lower().endswith(('.svg', '.mp4', '.webm')):
+        try:
+            from PIL import Image
+            with Image.open(path) as img:  # header only
+                entry['width'], entry['height'] = img.size
+        except (ImportError, OSError):
+            pass
+    return entry
+
+
+def expand_inputs(patterns):
+    files = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern, recursive=True)) if glob.has_magic(pattern) else [pattern]
+        files.extend(m for m in matches if os.path.isfile(m))
+    return list(dict.fromkeys(files))
+
+
+def build_inventory(files, jobs=None):
+    """
+    Parses files concurrently and merges their references.
+    Assets are keyed by local path when the file exists, else by URL.
+    """
+    jobs = jobs or os.cpu_count() or 1
+    if jobs > 1 and len(files) > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            parsed = list(pool.map(_extract, files, chunksize=max(1, len(files) // (jobs * 4))))
+    else:
+        parsed = [_extract(f) for f in files]
+
+    assets = {}
+    errors = {}
+    for html_file, refs, error in parsed:
+        if error:
+            errors[html_file] = error
+        for kind, url in refs:
+            path = _local_path(html_file, url)
+            key = path or url
+            asset = assets.setdefault(key, {'url': url, 'path': path, 'kinds': [], 'pages': []})
+            if kind not in asset['kinds']:
+                asset['kinds'].append(kind)
+            if html_file not in asset['pages']:
+                asset['pages'].append(html_file)
+
+    local = [a for a in assets.values() if a['path']]
+    with ThreadPoolExecutor(max_workers=min(8, jobs * 2)) as pool:
+        for asset, entry in zip(local, pool.map(lambda a: _describe(a['path']), local)):
+            asset.update(entry)
+
+    return {
+        'pages': files,
+        'errors': errors,
+        'assets': sorted(assets.values(), key=lambda a: (a['path'] is None, a['path'] or a['url']))
+    }
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description='Deduplicated asset inventory of LP markup')
+    parser.add_argument('inputs', nargs='*', default=DEFAULT_INPUTS, help='HTML files or glob patterns')
+    parser.add_argument('--output', default=INVENTORY_PATH, help='Inventory JSON path (- for stdout)')
+    parser.add_argument('--jobs', type=int, help='Parser processes (default: CPU count)')
+    args = parser.parse_args(argv)
+
+    files = expand_inputs(args.inputs)
+    if not files:
+        print("No HTML files found.")
+        return 1
+
+    inventory = build_inventory(files, args.jobs)
+    text = json.dumps(inventory, indent=2, ensure_ascii=False)
+    if args.output == '-':
+        print(text)
+    else:
+        out_dir = os.path.dirname(args.output)
+        if out_dir and not os.path.exists(out_dir):
+            os.makedirs(out_dir)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+
+    assets = inventory['assets']
+    local = [a for a in assets if a['path']]
+    print(f"{len(files)} pages, {len(assets)} unique assets "
+          f"({len(local)} local, {sum(a['bytes'] for a in local) / 1024:.0f} KiB).")
+    for html_file, error in inventory['errors'].items():
+        print(f"Warning: Could not read {html_file} ({error}).")
+    if args.output != '-':
+        print(f"Inventory written to {args.output}")
+    return 0
+
 
 if __name__ == "__main__":
-    extract_images('bihadado_markup.html')
+    sys.exit(main())
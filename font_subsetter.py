@@ -0,0 +1,206 @@
+import hashlib
+import io
+import os
+import re
+from html.parser import HTMLParser
+
+# Fonts to self-host. 'family' must match the font-family names used in the CSS,
+# so the generated @font-face rules take over from the system/Google fallback.
+# A family is only self-hosted with a regular face: browsers render every
+# weight with the closest face declared, so a bold-only family turns body text bold
+FONT_CONFIG = [
+    {
+        'family': 'Noto Sans JP',
+        'path': 'assets/fonts/NotoSansJP-Regular.otf',
+        'weight': 400,
+        'style': 'normal'
+    },
+    {
+        'family': 'Noto Sans JP',
+        'path': 'assets/fonts/NotoSansJP-Bold.otf',
+        'weight': 700,
+        'style': 'normal'
+    }
+]
+REGULAR_WEIGHT_MAX = 500
+
+CACHE_DIR = '.cache/fonts'
+
+CSS_CONTENT_RE = re.compile(r'content\s*:\s*(["\'])(.*?)\1', re.S)
+CSS_ESCAPE_RE = re.compile(r'\\([0-9a-fA-F]{1,6})\s?')
+
+
+class _TextCollector(HTMLParser):
+    """Collects text that actually gets painted: element text, button-like attributes and <style> bodies."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.text = []
+        self.styles = []
+        self._skip = 0
+        self._in_style = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ('script', 'noscript', 'template'):
+            self._skip += 1
+        elif tag == 'style':
+            self._in_style = True
+        elif tag in ('input', 'button'):
+            for name, value in attrs:
+                if name in ('value', 'placeholder') and value:
+                    self.text.append(value)
+
+    def handle_endtag(self, tag):
+        if tag in ('script', 'noscript', 'template') and self._skip:
+            self._skip -= 1
+        elif tag == 'style':
+            self._in_style = False
+
+    def handle_data(self, data):
+        if self._in_style:
+            self.styles.append(data)
+        elif not self._skip:
+            self.text.append(data)
+
+
+def css_content_text(css):
+    """Returns the strings used in CSS `content:` declarations (with \\XXXX escapes decoded)."""
+    values = []
+    for _, value in CSS_CONTENT_RE.findall(css):
+        values.append(CSS_ESCAPE_RE.sub(lambda m: chr(int(m.group(1), 16)), value))
+    return ''.join(values)
+
+
+def collect_codepoints(html, css_texts=()):
+    """Returns the set of code points rendered by a page (HTML text + CSS content values)."""
+    parser = _TextCollector()
+    parser.feed(html)
+    parser.close()
+
+    chars = ''.join(parser.text)
+    for css in list(parser.styles) + list(css_texts):
+        chars += css_content_text(css)
+
+    # Whitespace is always needed; control characters never are
+    codepoints = {ord(c) for c in chars if c.isprintable()}
+    codepoints.add(0x20)
+    return codepoints
+
+
+class FontSubsetter:
+    """
+    Subsets the configured fonts to the glyphs a page (or campaign) uses and
+    emits self-hosted WOFF2 files plus the <head> markup that loads them.
+    Subset results are cached in memory and on disk by (font hash, code points).
+    """
+
+    def __init__(self, fonts=None, cache_dir=CACHE_DIR):
+        fonts = [f for f in (fonts or FONT_CONFIG) if os.path.exists(f['path'])]
+        regular = {f['family'] for f in fonts if f.get('weight', 400) <= REGULAR_WEIGHT_MAX}
+        for family in sorted({f['family'] for f in fonts} - regular):
+            print(f"Warning: No regular face of {family} in assets/fonts; not self-hosting it "
+                  f"(body text would render bold).")
+        self.fonts = [f for f in fonts if f['family'] in regular]
+        self.cache_dir = cache_dir
+        self._font_hashes = {}
+        self._memory_cache = {}
+
+        try:
+            from fontTools import subset  # noqa: F401
+            import brotli  # noqa: F401  (required by fontTools for WOFF2)
+            self._has_fonttools = True
+        except ImportError:
+            self._has_fonttools = False
+
+    def available(self):
+        """True when fontTools (with brotli) is installed and at least one configured font exists."""
+        return self._has_fonttools and bool(self.fonts)
+
+    def _font_hash(self, path):
+        if path not in self._font_hashes:
+            with open(path, 'rb') as f:
+                self._font_hashes[path] = hashlib.sha1(f.read()).hexdigest()
+        return self._font_hashes[path]
+
+    def _subset_bytes(self, font, codepoints):
+        key_src = self._font_hash(font['path']) + ','.join(f"{c:x}" for c in sorted(codepoints))
+        # fontTools stamps head.modified from SOURCE_DATE_EPOCH when set (reproducible builds)
+        key_src += os.environ.get('SOURCE_DATE_EPOCH', '')
+        key = hashlib.sha1(key_src.encode('ascii')).hexdigest()[:16]
+
+        if key in self._memory_cache:
+            return key, self._memory_cache[key]
+
+        cache_path = os.path.join(self.cache_dir, f"{key}.woff2")
+        if os.path.exists(cache_path):
+            with open(cache_path, 'rb') as f:
+                data = f.read()
+        else:
+            from fontTools import subset
+            from fontTools.ttLib import TTFont
+
+            options = subset.Options()
+            options.flavor = 'woff2'
+            options.name_IDs = []
+            options.notdef_outline = True
+            options.hinting = False
+
+            tt = TTFont(font['path'])
+            subsetter = subset.Subsetter(options=options)
+            subsetter.populate(unicodes=codepoints)
+            subsetter.subset(tt)
+            tt.flavor = 'woff2'
+            buf = io.BytesIO()
+            tt.save(buf)
+            data = buf.getvalue()
+
+            if not os.path.exists(self.cache_dir):
+                os.makedirs(self.cache_dir)
+            with open(cache_path, 'wb') as f:
+                f.write(data)
+
+        self._memory_cache[key] = data
+        return key, data
+
+    def build(self, codepoints, output_static_dir, url_prefix='static/fonts'):
+        """
+        Writes subset fonts into {output_static_dir}/fonts and returns the
+        <head> snippet (preload links + @font-face with font-display: swap).
+        """
+        output_font_dir = os.path.join(output_static_dir, 'fonts')
+        if not os.path.exists(output_font_dir):
+            os.makedirs(output_font_dir)
+
+        preloads = []
+        faces = []
+        total_bytes = 0
+        for font in self.fonts:
+            try:
+                key, data = self._subset_bytes(font, codepoints)
+            except Exception as e:
+                print(f"Warning: Could not subset font {font['path']} ({e}). Skipping.")
+                continue
+
+            stem = os.path.splitext(os.path.basename(font['path']))[0]
+            filename = f"{stem}-{key[:10]}.woff2"
+            font_path = os.path.join(output_font_dir, filename)
+            if not os.path.exists(font_path):
+                with open(font_path, 'wb') as f:
+                    f.write(data)
+            total_bytes += len(data)
+
+            url = f"{url_prefix}/{filename}"
+            preloads.append(f'<link rel="preload" href="{url}" as="font" type="font/woff2" crossorigin>')
+            faces.append(
+                f"@font-face{{font-family:'{font['family']}';"
+                f"src:url('{url}') format('woff2');"
+                f"font-weight:{font.get('weight', 400)};"
+                f"font-style:{font.get('style', 'normal')};"
+                f"font-display:swap}}"
+            )
+
+        if not faces:
+            return ''
+
+        print(f"Font subset: {len(codepoints)} code points, {total_bytes / 1024:.1f} KB across {len(faces)} font(s)")
+        return '\n    '.join(preloads + [f"<style>{''.join(faces)}</style>"])
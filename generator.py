@@ -1,13 +1,41 @@
+import hashlib
+import itertools
 import json
+import math
 import os
+import re
 import sys
 import shutil
-from jinja2 import Environment, FileSystemLoader
+from jinja2 import FileSystemLoader, pass_context
+from markupsafe import Markup
 
 # Configuration
 OUTPUT_DIR = 'output'
 TEMPLATE_DIR = 'templates'
 STATIC_DIR = 'static'
+DEPS_PATH = '.cache/deps.json'
+# Written by --reproducible builds: every shipped file of the built pages with its hash
+BUILD_MANIFEST = 'build-manifest.json'
+
+# Source-only static subtrees (bundled by js_bundler instead of copied)
+SYNC_EXCLUDE = ['js/modules']
+# Files the build writes into a page's static/ itself; a first sync must not take them for leftovers
+SYNC_GENERATED = ['css/style.css', 'js/bundle.*.js', 'fonts/*', 'vendor/*', 'images/generated/*', 'images/coupon/*']
+
+# Number of leading sections treated as above the fold (eager images, LCP preload)
+ABOVE_FOLD_SECTIONS = 1
+
+# Injected into plans without 'legal' (the legal footer needs it). Shared by
+# every page, never copied: templates only read it.
+DEFAULT_LEGAL = {
+    'price_min': '880円',
+    'price_max': '12,000円',
+    'price_regular_min': '4,000円',
+    'price_regular_max': '15,000円',
+    'contact_email': 'info@latrico.jp',
+    'company_name': '株式会社ラトリコ',
+    'company_address': '東京都港区赤坂8-4-14'
+}
 
 def load_data(filepath):
     """Loads the JSON planning document."""
@@ -27,58 +55,94 @@ def nl2br(value):
         return value.replace('\n', '<br>')
     return value
 
-def sync_directories(src_dir, dst_dir):
-    """Recursively copies files from src_dir to dst_dir if they are newer or missing."""
-    if not os.path.exists(dst_dir):
-        os.makedirs(dst_dir)
-    
-    count_updated = 0
-    count_skipped = 0
-    
-    for root, dirs, files in os.walk(src_dir):
-        rel_path = os.path.relpath(root, src_dir)
-        dest_root = os.path.join(dst_dir, rel_path)
-        
-        if not os.path.exists(dest_root):
-            os.makedirs(dest_root)
-            
-        for file in files:
-            src_file = os.path.join(root, file)
-            dst_file = os.path.join(dest_root, file)
-            
-            should_copy = False
-            if not os.path.exists(dst_file):
-                should_copy = True
-            else:
-                if os.stat(src_file).st_mtime > os.stat(dst_file).st_mtime:
-                    should_copy = True
-            
-            if should_copy:
-                shutil.copy2(src_file, dst_file)
-                count_updated += 1
-            else:
-                count_skipped += 1
-                
-    print(f"Sync complete: {count_updated} updated, {count_skipped} skipped.")
-
-def generate_site(input_file, style="standard"):
-    # 1. Load Data
-    print(f"Loading data from {input_file}...")
-    data = load_data(input_file)
-    
-    # Inject default 'legal' data if missing (Safety for legal footer)
-    if 'legal' not in data:
-        data['legal'] = {
-            'price_min': '880円',
-            'price_max': '12,000円',
-            'price_regular_min': '4,000円',
-            'price_regular_max': '15,000円',
-            'contact_email': 'info@latrico.jp',
-            'company_name': '株式会社ラトリコ',
-            'company_address': '東京都港区赤坂8-4-14'
-        }
+def loading_attrs(fold):
+    """Custom filter: image loading attributes for a section's fold position ('above' / 'below')."""
+    if fold == 'above':
+        return Markup('loading="eager"')
+    return Markup('loading="lazy" decoding="async"')
+
+_PLACEHOLDERS = None
+_JS_BUNDLER = None
+
+def get_js_bundler():
+    """Returns the process-wide JSBundler (bundles are cached per feature set)."""
+    global _JS_BUNDLER
+    if _JS_BUNDLER is None:
+        from js_bundler import JSBundler
+        _JS_BUNDLER = JSBundler()
+    return _JS_BUNDLER
+
+def get_placeholder_cache():
+    """Returns the process-wide PlaceholderCache (Pillow is imported on first use)."""
+    global _PLACEHOLDERS
+    if _PLACEHOLDERS is None:
+        from image_placeholders import PlaceholderCache
+        _PLACEHOLDERS = PlaceholderCache()
+    return _PLACEHOLDERS
+
+def _resolve_local_image(context, url):
+    """Maps a page-relative image URL to a file: the page output dir first (coupon), then the project root."""
+    if not isinstance(url, str) or not url or url.startswith(('data:', '//')) or '://' in url:
+        return None
+    url = url.split('?')[0].split('#')[0]
+    for root in (context.get('page_output_dir'), '.'):
+        if root:
+            path = os.path.join(root, url)
+            if os.path.isfile(path):
+                return path
+    return None
+
+@pass_context
+def image_meta(context, url):
+    """Template global: {'width', 'height', 'placeholder'} for a local image, or {} if unknown."""
+    path = _resolve_local_image(context, url)
+    if path is None:
+        return {}
+    return get_placeholder_cache().get(path) or {}
+
+@pass_context
+def image_attrs(context, url, placeholder=True):
+    """
+    Custom filter: intrinsic width/height (reserves layout space) and an inline
+    blurred preview. Emits a leading space, or nothing for unknown/remote images.
+    """
+    meta = image_meta(context, url)
+    if not meta:
+        return Markup('')
+    attrs = f' width="{meta["width"]}" height="{meta["height"]}"'
+    if placeholder and meta.get('placeholder'):
+        attrs += f' style="background:url({meta["placeholder"]}) center/cover no-repeat"'
+    return Markup(attrs)
+
+def sync_directories(src_dir, dst_dir, exclude=(), dry_run=False, mtime=None, generated=()):
+    """
+    Mirrors src_dir into dst_dir (see asset_sync.AssetSync): copies new and
+    changed files in parallel, removes files whose source was deleted, and
+    skips unchanged files using a persisted size/mtime/hash manifest.
+    exclude: directories (relative to src_dir, '/'-separated) that are not copied.
+    dry_run: only print the diff report.
+    mtime: fixed timestamp for the synced files (reproducible builds).
+    generated: dst files (fnmatch patterns) the build writes itself, kept by a first sync.
+    """
+    from asset_sync import AssetSync, format_report
+
+    actions = AssetSync(src_dir, dst_dir, exclude=exclude, mtime=mtime, generated=generated).run(dry_run=dry_run)
+    if dry_run:
+        print(f"Sync dry run ({src_dir} -> {dst_dir}):")
+        print(format_report(actions))
+        return actions
+
+    updated = len(actions['add']) + len(actions['update'])
+    print(f"Sync complete: {updated} updated, {len(actions['unchanged'])} skipped, {len(actions['remove'])} removed.")
+    return actions
+
+_ENV_CACHE = {}
+
+def get_environment(style):
+    """Returns the Jinja2 Environment for a style, creating it once per process."""
+    if style in _ENV_CACHE:
+        return _ENV_CACHE[style]
 
-    # 2. Setup Jinja2 Environment with Style Support
     # Search paths: specific style -> common -> base
     template_paths = [
         os.path.join(TEMPLATE_DIR, style),
@@ -87,193 +151,956 @@ def generate_site(input_file, style="standard"):
     ]
     print(f"Style: {style}")
     print(f"Template paths: {template_paths}")
-    
-    env = Environment(loader=FileSystemLoader(template_paths))
+
+    # Reports the templates each render loads (dependency index)
+    from dep_index import TrackingEnvironment
+    env = TrackingEnvironment(loader=FileSystemLoader(template_paths))
     env.filters['nl2br'] = nl2br
-    
+    env.filters['loading_attrs'] = loading_attrs
+    env.filters['image_attrs'] = image_attrs
+    env.globals['image_meta'] = image_meta
+    _ENV_CACHE[style] = env
+    return env
+
+_STYLE_CACHE = {}
+
+def get_style(style):
+    """
+    Resolves a style once per process: its environment plus the compiled page
+    and stylesheet templates ({'env', 'index', 'css', 'css_error'}).
+    Raises if the style has no index.html.
+    """
+    if style not in _STYLE_CACHE:
+        env = get_environment(style)
+        resolved = {'env': env, 'index': env.get_template('index.html'), 'css': None, 'css_error': None}
+        try:
+            resolved['css'] = env.get_template('css/style.css')
+        except Exception as e:
+            # Reported (and skipped) when a page renders its CSS
+            resolved['css_error'] = e
+        _STYLE_CACHE[style] = resolved
+    return _STYLE_CACHE[style]
+
+_COUPON_RENDERER = None
+
+def get_coupon_renderer():
+    """Returns the process-wide CouponRenderer (fonts and coupon backgrounds stay cached)."""
+    global _COUPON_RENDERER
+    if _COUPON_RENDERER is None:
+        from coupon_generator import CouponRenderer
+        _COUPON_RENDERER = CouponRenderer()
+    return _COUPON_RENDERER
+
+def attach_coupon_image(data, rel_path, svg=None):
+    """
+    Points the campaign visual at the generated coupon (and, in vector mode,
+    hands the inline SVG markup to the template as campaign.coupon_svg).
+    Containers on the way are copied instead of mutated, so plans that share
+    sections (e.g. expanded variants) never see each other's coupon path.
+    Every inlined SVG copy gets its own mask ids.
+    Returns True if a campaign was found.
+    """
+    from coupon_generator import svg_instance
+
+    found_campaign = False
+    instances = itertools.count(1)
+
+    def updates():
+        values = {'image_url': rel_path}
+        if svg is not None:
+            values['coupon_svg'] = Markup(svg_instance(svg, next(instances)))
+        return values
+
+    # Strategy 1: Top-level 'campaign' key (if used)
+    if 'campaign' in data:
+        data['campaign'] = dict(data['campaign'], **updates())
+        found_campaign = True
+
+    # Strategy 2: 'sections' list (standard/manga structure)
+    if 'sections' in data:
+        sections = list(data['sections'])
+        for i, section in enumerate(sections):
+            if section['type'] == 'campaign_box' or section['type'] == 'campaign':
+                section = dict(section)
+                section['data'] = dict(section['data'], **updates())
+                sections[i] = section
+                found_campaign = True
+        data['sections'] = sections
+
+    return found_campaign
+
+def render_coupon_png(coupon_data, output_path):
+    """Renders one PNG coupon (top-level so it can run in an image worker process)."""
+    return get_coupon_renderer().generate(coupon_data, output_path)
+
+def generate_coupon(data, plan_name, output_static_dir, coupon_cache=None, run_image=None, writer=None):
+    """
+    Renders the coupon image for a plan and attaches it to the campaign section.
+    coupon_cache: optional dict (coupon JSON -> rendered file) shared across pages,
+    so identical coupons are rendered once and copied afterwards.
+    run_image: optional Executors.run_image, to encode the PNG in a worker process.
+    writer: optional output_writer.OutputWriter; an identical coupon.png is left untouched.
+    With "mode": "svg" the coupon becomes inline vector markup over a shared background.
+    """
+    if data['coupon'].get('mode') == 'svg':
+        generate_coupon_svg(data, output_static_dir, coupon_cache)
+        return
+
+    print("Generating Coupon Image...")
     try:
-        template = env.get_template('index.html')
+        # Ensure images/generated/{plan_name} exists
+        # exist_ok: parallel variant renders can race to create it
+        output_img_dir = os.path.join(output_static_dir, f"images/generated/{plan_name}")
+        os.makedirs(output_img_dir, exist_ok=True)
+
+        output_coupon_path = os.path.join(output_img_dir, 'coupon.png')
+        cache_key = json.dumps(data['coupon'], sort_keys=True, ensure_ascii=False)
+
+        if coupon_cache is not None and cache_key in coupon_cache:
+            if writer is not None:
+                writer.copy(coupon_cache[cache_key], output_coupon_path)
+            else:
+                shutil.copyfile(coupon_cache[cache_key], output_coupon_path)
+            success = True
+        else:
+            # Rendered next to the target, then moved into place only if the bytes differ
+            render_path = output_coupon_path
+            if writer is not None:
+                render_path = os.path.join(output_img_dir, f".coupon.{os.getpid()}.tmp.png")
+            if run_image is not None:
+                success = run_image(render_coupon_png, data['coupon'], render_path)
+            else:
+                success = render_coupon_png(data['coupon'], render_path)
+            if success and writer is not None:
+                writer.replace(render_path, output_coupon_path)
+            if success and coupon_cache is not None:
+                coupon_cache[cache_key] = output_coupon_path
+
+        if success:
+            # Calculate relative path for HTML use
+            rel_path = f"static/images/generated/{plan_name}/coupon.png"
+            print(f"Coupon generated successfully at {output_coupon_path}")
+
+            # Update campaign image URL in data object (In-memory update for Jinja)
+            if attach_coupon_image(data, rel_path):
+                print(f"Updated campaign image URL to: {rel_path}")
+            else:
+                print("Warning: Generated coupon but could not find a campaign section to attach it to.")
     except Exception as e:
-        print(f"Error loading template 'index.html' for style '{style}': {e}")
+        print(f"Error generating coupon: {e}")
+
+# Defaults for video sections; a plan can override them with a top-level
+# 'video_policy' and each video section with its own 'facade' / 'preload' keys.
+VIDEO_POLICY = {'facade': True, 'preload': 'none'}
+
+def prepare_videos(data, plan_name, output_static_dir, run_image=None):
+    """
+    Applies the video policy (click-to-play facade, preload) and swaps in an
+    optimized poster built from poster_url or a frame of a local video_url.
+    Video sections are copied, never mutated.
+    run_image: optional Executors.run_image, to encode posters in a worker process.
+    """
+    policy = dict(VIDEO_POLICY, **data.get('video_policy', {}))
+    rel_img_dir = f"static/images/generated/{plan_name}"
+    output_img_dir = os.path.join(output_static_dir, f"images/generated/{plan_name}")
+
+    def prepare(video):
+        video = dict(policy, **video)
+        from video_poster import build_poster
+        if run_image is not None:
+            poster = run_image(build_poster, video, output_img_dir, rel_img_dir)
+        else:
+            poster = build_poster(video, output_img_dir, rel_img_dir)
+        if poster:
+            print(f"Video poster optimized: {poster}")
+            video['poster_url'] = poster
+        return video
+
+    if 'sections' in data:
+        if any(s.get('type') == 'video' for s in data['sections']):
+            data['sections'] = [dict(s, data=prepare(s.get('data', {}))) if s.get('type') == 'video' else s
+                                for s in data['sections']]
+    elif data.get('video_section'):
+        # Legacy Mode
+        data['video_section'] = prepare(data['video_section'])
+
+def bake_comics(data, plan_name, output_static_dir, run_image=None):
+    """
+    Comic strips with "bake": "frames" | "strip" get their bubbles and captions
+    composited into right-sized images (comic_baker); the template then keeps
+    the text as visually hidden HTML. Sections are copied, never mutated.
+    run_image: optional Executors.run_image, to composite in a worker process.
+    """
+    if not any(s.get('type') == 'comic_strip' and s.get('data', {}).get('bake') for s in data.get('sections', [])):
         return
+    from comic_baker import bake_comic
+    rel_img_dir = f"static/images/generated/{plan_name}"
+    output_img_dir = os.path.join(output_static_dir, f"images/generated/{plan_name}")
+
+    sections = list(data['sections'])
+    for i, section in enumerate(sections):
+        comic = section.get('data', {})
+        if section.get('type') != 'comic_strip' or not comic.get('bake'):
+            continue
+        print(f"Baking comic strip ({comic['bake']})...")
+        try:
+            if run_image is not None:
+                baked = run_image(bake_comic, comic, output_img_dir, rel_img_dir)
+            else:
+                baked = bake_comic(comic, output_img_dir, rel_img_dir)
+        except OSError as e:
+            print(f"Warning: Could not bake comic strip ({e}). Keeping HTML bubbles.")
+            continue
+        if baked:
+            sections[i] = dict(section, data=dict(comic, baked=baked))
+    data['sections'] = sections
+
+def _section_visual(section_type, section_data):
+    """Returns (url, srcset, sizes) of the main visual of a section, or None."""
+    if not isinstance(section_data, dict):
+        return None
+    if section_type == 'comic_strip':
+        frames = section_data.get('frames')
+        section_data = frames[0] if isinstance(frames, list) and frames else {}
+        if not isinstance(section_data, dict):
+            return None
+    url = section_data.get('image_url')
+    if not url:
+        return None
+    return url, section_data.get('image_srcset'), section_data.get('image_sizes')
+
+def apply_loading_policy(data):
+    """
+    Marks each section as above/below the fold ('fold' key, read by the
+    loading_attrs filter) and picks the first section's visual as the LCP
+    image, which base.html preloads with fetchpriority="high".
+    Sections are copied, never mutated, so shared plan data stays untouched.
+    """
+    lcp = None
+    if isinstance(data.get('sections'), list):
+        sections = []
+        for index, section in enumerate(data['sections']):
+            if not isinstance(section, dict):
+                # Unusable entries render nothing; keep them as they are
+                sections.append(section)
+                continue
+            fold = 'above' if index < ABOVE_FOLD_SECTIONS else 'below'
+            sections.append(dict(section, fold=fold))
+            if lcp is None and fold == 'above':
+                lcp = _section_visual(section.get('type'), section.get('data'))
+        data['sections'] = sections
+    elif 'hero' in data:
+        # Legacy Mode: hero is always first (the templates mark it above the fold)
+        lcp = _section_visual('hero', data['hero'])
+
+    if lcp:
+        url, srcset, sizes = lcp
+        data['lcp_image'] = {'url': url, 'srcset': srcset, 'sizes': sizes}
+
+def inject_head(html, snippet):
+    """Inserts markup right before </head> (used for build-time resource hints)."""
+    if not snippet:
+        return html
+    index = html.find('</head>')
+    if index == -1:
+        return html
+    return html[:index] + '    ' + snippet + '\n' + html[index:]
+
+_STATIC_CSS = (None, [])
 
-    # 2.5 Generate Coupon Image (Before Rendering)
-    # We need to know output paths ahead of time or use temporary
-    # Actually, we need to know the target style output dir for proper relative paths?
-    # But wait, 'output_static_dir' isn't defined yet in the original code flow...
-    # We can define it early.
+def _static_css_files():
+    """Paths of the shared static CSS files every page ships (and collects font glyphs from)."""
+    css_dir = os.path.join(STATIC_DIR, 'css')
+    if not os.path.isdir(css_dir):
+        return []
+    return sorted(os.path.join(css_dir, name) for name in os.listdir(css_dir) if name.endswith('.css'))
+
+def _coupon_backgrounds(coupon_data):
+    """Template backgrounds a coupon is drawn from: the requested one, and gold while it is missing."""
+    template_dir = get_coupon_renderer().template_dir
+    requested = os.path.join(template_dir, f"{coupon_data.get('template', 'gold')}.png")
+    if os.path.exists(requested):
+        return [requested]
+    return [requested, os.path.join(template_dir, 'gold.png')]
+
+def _static_css_texts():
+    """
+    Returns the contents of the shared static CSS files (for font glyph collection).
+    Re-read only when a file's size/mtime changes.
+    """
+    global _STATIC_CSS
+    css_dir = os.path.join(STATIC_DIR, 'css')
+    if not os.path.isdir(css_dir):
+        return []
+    with os.scandir(css_dir) as it:
+        entries = sorted((e.name, e.stat().st_size, e.stat().st_mtime_ns) for e in it if e.name.endswith('.css'))
+    if _STATIC_CSS[0] != entries:
+        texts = []
+        for name, _, _ in entries:
+            with open(os.path.join(css_dir, name), 'r', encoding='utf-8') as f:
+                texts.append(f.read())
+        _STATIC_CSS = (entries, texts)
+    return list(_STATIC_CSS[1])
+
+def generate_coupon_svg(data, output_static_dir, coupon_cache=None):
+    """Vector coupon mode: inline SVG text over the template background (static/images/coupon/)."""
+    print("Generating Coupon SVG...")
+    try:
+        renderer = get_coupon_renderer()
+        asset_dir = os.path.join(output_static_dir, 'images', 'coupon')
+        asset_url = 'static/images/coupon'
+        cache_key = 'svg:' + json.dumps(data['coupon'], sort_keys=True, ensure_ascii=False)
+
+        if coupon_cache is not None and cache_key in coupon_cache:
+            svg, bg_url, overlays = coupon_cache[cache_key]
+            # Markup is shared; the files it references still have to exist in this page's output
+            template_id, bg_path = renderer.resolve_template(data['coupon'])
+            renderer.background_asset(template_id, bg_path, asset_dir)
+            for path in overlays:
+                renderer.overlay_asset(path, asset_dir)
+        else:
+            overlays = []
+            svg = renderer.generate_svg(data['coupon'], asset_dir, asset_url, overlays=overlays)
+            if svg is None:
+                return
+            template_id, bg_path = renderer.resolve_template(data['coupon'])
+            bg_url = f"{asset_url}/{renderer.background_asset(template_id, bg_path, asset_dir)}"
+            if coupon_cache is not None:
+                coupon_cache[cache_key] = (svg, bg_url, overlays)
+
+        if attach_coupon_image(data, bg_url, svg=svg):
+            print("Attached inline coupon SVG to campaign section.")
+        else:
+            print("Warning: Generated coupon but could not find a campaign section to attach it to.")
+    except Exception as e:
+        print(f"Error generating coupon: {e}")
+
+def render_site(data, plan_name, style, target_output_dir, coupon_cache=None,
+                font_subsetter=None, defer_fonts=False, executors=None, sync_static=True,
+                vendor_cache=None, writer=None, deps=None):
+    """
+    Renders one page (HTML, CSS, coupon, static assets) into target_output_dir.
+    Returns a dict describing the written page (paths, and the code points it
+    renders when font subsetting is enabled), or None on failure.
+    font_subsetter: FontSubsetter used to self-host subset web fonts.
+    defer_fonts: collect code points only; the caller subsets once for many pages.
+    executors: task_graph.Executors; with jobs > 1 independent steps (asset
+    sync, CSS, coupon encoding) overlap instead of running one after another.
+    sync_static: copy static/ into the page (off for previews served from the project).
+    vendor_cache: vendor.VendorCache; third-party assets (logo, Swiper) are served
+    from hashed copies under static/vendor/ instead of their remote hosts.
+    writer: output_writer.OutputWriter shared by a build; files whose content did
+    not change are not rewritten (their mtimes stay put).
+    deps: dep_index.DependencyIndex; records the templates, source assets and section types the page was built from.
+    """
+    from task_graph import TaskGraph
+    from output_writer import OutputWriter
+    from dep_index import recording
+
+    own_writer = writer is None
+    if own_writer:
+        writer = OutputWriter()
+
+    # Shallow copy: top-level keys are replaced below, never mutated in place
+    data = dict(data)
+
+    # Inject default 'legal' data if missing (Safety for legal footer)
+    if 'legal' not in data:
+        data['legal'] = DEFAULT_LEGAL
+
+    # 2. Setup Jinja2 Environment with Style Support
+    try:
+        resolved = get_style(style)
+    except Exception as e:
+        print(f"Error loading template 'index.html' for style '{style}': {e}")
+        return None
+    template = resolved['index']
+
+    use_fonts = font_subsetter is not None and font_subsetter.available()
+    if use_fonts:
+        # Drops the Google Fonts preconnect from base.html
+        data['fonts_self_hosted'] = True
 
-    plan_name = os.path.splitext(os.path.basename(input_file))[0]
-    target_output_dir = os.path.join(OUTPUT_DIR, plan_name, style)
     if not os.path.exists(target_output_dir):
         os.makedirs(target_output_dir)
     output_static_dir = os.path.join(target_output_dir, 'static')
-        
-    if 'coupon' in data:
-        print("Generating Coupon Image...")
-        try:
-            from coupon_generator import CouponRenderer
-            renderer = CouponRenderer()
-            
-            # Ensure images/generated/{plan_name} exists
-            output_img_dir = os.path.join(output_static_dir, f"images/generated/{plan_name}")
-            if not os.path.exists(output_img_dir):
-                os.makedirs(output_img_dir)
-            
-            output_coupon_path = os.path.join(output_img_dir, 'coupon.png')
-            success = renderer.generate(data['coupon'], output_coupon_path)
-            
-            if success:
-                # Calculate relative path for HTML use
-                rel_path = f"static/images/generated/{plan_name}/coupon.png"
-                print(f"Coupon generated successfully at {output_coupon_path}")
-                
-                # Update campaign image URL in data object (In-memory update for Jinja)
-                found_campaign = False
-                
-                # Strategy 1: Top-level 'campaign' key (if used)
-                if 'campaign' in data:
-                    data['campaign']['image_url'] = rel_path
-                    found_campaign = True
-                
-                # Strategy 2: 'sections' list (standard/manga structure)
-                if 'sections' in data:
-                    for section in data['sections']:
-                        if section['type'] == 'campaign_box' or section['type'] == 'campaign':
-                            section['data']['image_url'] = rel_path
-                            found_campaign = True
-                            
-                if found_campaign:
-                    print(f"Updated campaign image URL to: {rel_path}")
-                else:
-                    print("Warning: Generated coupon but could not find a campaign section to attach it to.")
-        except Exception as e:
-            print(f"Error generating coupon: {e}")
+    run_image = executors.run_image if executors is not None else None
 
-    # 3. Render HTML
-    print("Rendering HTML...")
-    output_html = template.render(**data)
+    # The stylesheet templates only read plan-level settings, so CSS renders from
+    # a snapshot while the page data chain below is still being filled in
+    css_data = dict(data)
 
-    # 4. Write Output
-    # Extract plan name from filename (e.g., input/busy_mom_plan.json -> busy_mom_plan)
-    plan_name = os.path.splitext(os.path.basename(input_file))[0]
-    
-    # New Structure: output/{plan_name}/{style_name}/
-    target_output_dir = os.path.join(OUTPUT_DIR, plan_name, style)
+    # {template name: file} loaded by the HTML and CSS renders
+    loaded = {template.name: os.path.relpath(template.filename).replace(os.sep, '/')}
+
+    # Page data chain: each step replaces top-level keys of `data`, so these run in order
+    def coupon():
+        # 2.5 Generate Coupon Image (Before Rendering, so the campaign can reference it)
+        if 'coupon' in data:
+            generate_coupon(data, plan_name, output_static_dir, coupon_cache, run_image=run_image, writer=writer)
+
+    def videos(_coupon):
+        # 2.55 Video facade + optimized poster
+        prepare_videos(data, plan_name, output_static_dir, run_image=run_image)
+
+    def comics(_videos):
+        # 2.57 Comic strips with baked speech bubbles
+        bake_comics(data, plan_name, output_static_dir, run_image=run_image)
+
+    def page_data(_comics):
+        # 2.6 Above-the-fold / LCP hints (after the coupon, which may be the first visual)
+        apply_loading_policy(data)
+        # 2.7 Runtime JS: only the modules this plan's sections need
+        data['js_bundle'] = get_js_bundler().bundle(data, template.environment)
+        return data['js_bundle']
+
+    def render_html(js_bundle):
+        # 3. Render HTML
+        # page_output_dir lets image_attrs find images generated for this page (coupon)
+        print("Rendering HTML...")
+        data['page_output_dir'] = target_output_dir
+        with recording() as used:
+            html = template.render(**data)
+        loaded.update(used)
+        get_placeholder_cache().save()
+        return html
+
+    def render_css():
+        # 4. Render CSS (Dynamic Style)
+        # 'css/style.css' is searched in [templates/{style}, templates/common, templates]
+        print("Rendering CSS...")
+        error = resolved['css_error']
+        if error is None:
+            try:
+                with recording() as used:
+                    css = resolved['css'].render(**css_data)
+                loaded.update(used)
+                loaded['css/style.css'] = os.path.relpath(resolved['css'].filename).replace(os.sep, '/')
+                return css
+            except Exception as e:
+                error = e
+        print(f"Warning: Could not render dynamic CSS ({error}). Skipping. Continuing with asset sync...")
+        return None
+
+    def fonts(html, css):
+        # 4.5 Subset web fonts to the glyphs this page renders
+        if not use_fonts:
+            return html, None
+        from font_subsetter import collect_codepoints
+        css_texts = _static_css_texts() + ([css] if css else [])
+        codepoints = collect_codepoints(html, css_texts)
+        if not defer_fonts:
+            html = inject_head(html, font_subsetter.build(codepoints, output_static_dir))
+        return html, codepoints
+
+    def vendor(html):
+        # 4.7 Self-host third-party assets
+        if vendor_cache is None:
+            return html
+        from vendor import vendor_page
+        html, count = vendor_page(html, output_static_dir, vendor_cache)
+        if count:
+            print(f"Vendored {count} third-party assets into {os.path.join(output_static_dir, 'vendor')}")
+        return html
+
+    def write_html(html):
+        # 5. Write Output
+        path = os.path.join(target_output_dir, 'index.html')
+        if writer.write(path, html):
+            print(f"HTML generated at {path}")
+        else:
+            print(f"HTML unchanged at {path}")
+        return path
+
+    def sync_assets():
+        # 6. Copy Static Assets (Incremental)
+        if not sync_static:
+            return
+        print("Syncing static assets...")
+        if os.path.exists(STATIC_DIR):
+            sync_directories(STATIC_DIR, output_static_dir, exclude=SYNC_EXCLUDE, mtime=writer.epoch,
+                             generated=SYNC_GENERATED)
+        else:
+            print("Warning: No static directory found to copy.")
+            if not os.path.exists(output_static_dir):
+                os.makedirs(output_static_dir, exist_ok=True)
+
+    def write_js(js_bundle):
+        # Write the hashed JS bundle (small bundles are already inlined in the HTML)
+        if js_bundle['inline']:
+            print(f"JS inlined: {js_bundle['bytes']} bytes ({', '.join(js_bundle['modules'])})")
+            return
+        output_js_dir = os.path.join(output_static_dir, 'js')
+        os.makedirs(output_js_dir, exist_ok=True)
+        js_file_path = os.path.join(output_js_dir, js_bundle['filename'])
+        writer.write(js_file_path, js_bundle['code'])
+        print(f"JS bundle: {js_bundle['bytes']} bytes at {js_file_path} ({', '.join(js_bundle['modules'])})")
+
+    def write_css(css, _synced):
+        # Write dynamic style.css after the sync (always overwrite, it depends on the JSON plan)
+        output_css_dir = os.path.join(output_static_dir, 'css')
+        os.makedirs(output_css_dir, exist_ok=True)
+        if css is not None:
+            css_file_path = os.path.join(output_css_dir, 'style.css')
+            if writer.write(css_file_path, css):
+                print(f"CSS generated at {css_file_path}")
+            else:
+                print(f"CSS unchanged at {css_file_path}")
+
+    graph = TaskGraph(f"{plan_name}/{style}")
+    graph.add('coupon', coupon, outputs=['coupon'])
+    graph.add('videos', videos, inputs=['coupon'], outputs=['videos'])
+    graph.add('comics', comics, inputs=['videos'], outputs=['comics'])
+    graph.add('page_data', page_data, inputs=['comics'], outputs=['js_bundle'])
+    graph.add('render_html', render_html, inputs=['js_bundle'], outputs=['raw_html'])
+    graph.add('render_css', render_css, outputs=['css'])
+    graph.add('fonts', fonts, inputs=['raw_html', 'css'], outputs=['html', 'codepoints'])
+    graph.add('vendor', vendor, inputs=['html'], outputs=['page_html'])
+    graph.add('write_html', write_html, inputs=['page_html'], outputs=['html_path'])
+    graph.add('sync_static', sync_assets, outputs=['synced'])
+    graph.add('write_js', write_js, inputs=['js_bundle'])
+    graph.add('write_css', write_css, inputs=['css', 'synced'])
+
+    results = graph.run(executors)
+    if executors is not None and executors.jobs > 1:
+        print(graph.report())
+    if own_writer:
+        writer.save()
+        print(writer.report())
+    if deps is not None:
+        # Sources outside the template tree: bundled JS modules, shared CSS, coupon background
+        bundler = get_js_bundler()
+        files = [os.path.join(bundler.module_dir, f"{name}.js") for name in results['js_bundle']['modules']]
+        files += _static_css_files()
+        if 'coupon' in data:
+            files += _coupon_backgrounds(data['coupon'])
+        deps.record(results['html_path'], plan_name, style, loaded,
+                    [s.get('type') for s in data.get('sections', []) if s.get('type')], files)
+
+    return {
+        'html_path': results['html_path'],
+        'static_dir': output_static_dir,
+        'codepoints': results['codepoints'],
+        'js_bytes': results['js_bundle']['bytes'],
+        'graph': graph
+    }
+
+def apply_campaign_fonts(pages, font_subsetter, writer=None):
+    """Subsets fonts once for the union of all pages' glyphs and injects them into every page."""
+    codepoints = set()
+    for page in pages:
+        codepoints |= page['codepoints'] or set()
+    if not codepoints:
+        return
+
+    print(f"Subsetting fonts for {len(pages)} pages (campaign scope)...")
+    for page in pages:
+        snippet = font_subsetter.build(codepoints, page['static_dir'])
+        with open(page['html_path'], 'r', encoding='utf-8') as f:
+            html = f.read()
+        if writer is not None:
+            writer.write(page['html_path'], inject_head(html, snippet))
+        else:
+            with open(page['html_path'], 'w', encoding='utf-8') as f:
+                f.write(inject_head(html, snippet))
+
+def _parse_pointer(pointer):
+    """Splits a JSON pointer ('/sections/0/data/title') into its reference tokens."""
+    if pointer == '':
+        return []
+    if not pointer.startswith('/'):
+        raise ValueError(f"Invalid JSON pointer: {pointer!r}")
+    return [t.replace('~1', '/').replace('~0', '~') for t in pointer[1:].split('/')]
+
+def apply_overrides(base, overrides):
+    """
+    Returns a copy of base with JSON-pointer overrides applied.
+    Only the containers on each overridden path are copied; every other
+    section/dict is shared with the base plan.
+    """
+    result = dict(base)
+    for pointer, value in overrides.items():
+        tokens = _parse_pointer(pointer)
+        if not tokens:
+            raise ValueError("Overriding the whole plan is not supported.")
+
+        node = result
+        for token in tokens[:-1]:
+            key = int(token) if isinstance(node, list) else token
+            child = node[key]
+            child = list(child) if isinstance(child, list) else dict(child)
+            node[key] = child
+            node = child
+
+        last = tokens[-1]
+        if isinstance(node, list):
+            if last == '-':
+                node.append(value)
+            else:
+                node[int(last)] = value
+        else:
+            node[last] = value
+    return result
+
+# Variant ids are directory names under output/{plan}/; vN ids belong to the matrix
+VARIANT_ID_RE = re.compile(r'^[A-Za-z0-9_-]+$')
+MATRIX_ID_RE = re.compile(r'^v\d+$')
+
+def _item_variants(items, default_style):
+    """(variant_id, style, overrides) of the 'items' form; raises ValueError for unusable ids."""
+    expanded = []
+    seen = set()
+    for index, item in enumerate(items, start=1):
+        variant_id = item.get('id', f"item{index}")
+        if not isinstance(variant_id, str) or not VARIANT_ID_RE.match(variant_id):
+            raise ValueError(f"Invalid variant id {variant_id!r} (letters, digits, '-' and '_' only)")
+        if MATRIX_ID_RE.match(variant_id):
+            raise ValueError(f"Variant id {variant_id!r} is reserved for matrix variants")
+        if variant_id in seen:
+            raise ValueError(f"Duplicate variant id {variant_id!r}")
+        seen.add(variant_id)
+        expanded.append((variant_id, item.get('style', default_style), item.get('overrides', {})))
+    return expanded
+
+def _matrix_variants(matrix, default_style):
+    axes = list(matrix.keys())
+    width = len(str(math.prod(len(v) for v in matrix.values())))
+    for index, combo in enumerate(itertools.product(*(matrix[a] for a in axes)), start=1):
+        overrides = dict(zip(axes, combo))
+        style = overrides.pop('style', default_style)
+        yield f"v{index:0{width}d}", style, overrides
+
+def iter_variants(variants, default_style):
+    """
+    Expands a plan's 'variants' block into (variant_id, style, overrides);
+    the matrix lazily, after the item ids are checked (ValueError).
+
+    Supported forms (can be combined):
+        "matrix": {"/hero/title": ["A", "B"], "style": ["standard", "manga"]}
+            -> cartesian product of all axes, ids v1, v2, ...
+        "items": [{"id": "spring", "style": "manga", "overrides": {"/coupon/...": "5,000"}}]
+    """
+    items = _item_variants(variants.get('items', []), default_style)
+    matrix = variants.get('matrix', {})
+    return itertools.chain(_matrix_variants(matrix, default_style) if matrix else (), items)
+
+def generate_variants(data, plan_name, default_style="standard", font_subsetter=None, font_scope='page',
+                      executors=None, vendor_cache=None, writer=None, deps=None):
+    """
+    Builds every variant of a plan in one process.
+    Output: output/{plan_name}/{variant_id}/{style}/ plus output/{plan_name}/variants.json
+    font_scope: 'page' subsets fonts per variant, 'campaign' once for all variants.
+    """
+    variants = data['variants']
+    base = {k: v for k, v in data.items() if k != 'variants'}
+    plan_dir = os.path.join(OUTPUT_DIR, plan_name)
+
+    coupon_cache = {}
+    manifest = {'plan': plan_name, 'variants': []}
+    pages = []
+    defer_fonts = font_scope == 'campaign'
 
-    if not os.path.exists(target_output_dir):
-        os.makedirs(target_output_dir)
-    
-    output_file_path = os.path.join(target_output_dir, 'index.html')
-    with open(output_file_path, 'w', encoding='utf-8') as f:
-        f.write(output_html)
-    print(f"HTML generated at {output_file_path}")
-
-    # 5. Render CSS (Dynamic Style)
-    # We look for style.css in the style folder context first
-    print("Rendering CSS...")
     try:
-        # Check if style-specific CSS template exists, otherwise fall back to common or skip
-        # For now, we assume style.css might be in templates/css/style.css (legacy) or templates/standard/css/style.css
-        # Current file structure: 
-        # templates/standard/components... 
-        # templates/base.html (in common)
-        # static/css/style.css (this is the SOURCE of the CSS structure usually, but we have a jinja template?)
-        # Wait, the previous code loaded 'css/style.css'. 
-        # Let's check where 'css/style.css' is now.
-        # It was likely in `templates/css/style.css`.
-        # I did `mv templates/components templates/standard/`.
-        # I did `mv templates/index.html templates/standard/`.
-        # I did `mv templates/base.html templates/common/`.
-        # I did NOT move `templates/css`. So it checks `templates/css/style.css`.
-        # Using FileSystemLoader(template_paths), 'css/style.css' will be searched in:
-        # [templates/standard, templates/common, templates]
-        # So 'templates/css/style.css' matches 'templates' + 'css/style.css'. It should still be found if I keep TEMPLATE_DIR in paths.
-        
-        css_template = env.get_template('css/style.css')
-        output_css = css_template.render(**data)
+        expanded = iter_variants(variants, default_style)
+    except ValueError as e:
+        print(f"Error: {e} in plan {plan_name}. Skipping.")
+        return
 
-    except Exception as e:
-        print(f"Warning: Could not render dynamic CSS ({e}). Skipping. Continuing with asset sync...")
+    for variant_id, style, overrides in expanded:
+        print(f"--- Variant {variant_id} ({style}) ---")
+        try:
+            variant_data = apply_overrides(base, overrides)
+        except (KeyError, IndexError, ValueError, TypeError) as e:
+            print(f"Error: Invalid override in variant {variant_id}: {e}. Skipping.")
+            continue
 
-    # 6. Copy Static Assets (Incremental) and Write CSS
-    print("Syncing static assets...")
-    output_static_dir = os.path.join(target_output_dir, 'static')
-    
-    # Incremental Copy instead of Full Delete
-    if os.path.exists(STATIC_DIR):
-        sync_directories(STATIC_DIR, output_static_dir)
+        target_output_dir = os.path.join(plan_dir, variant_id, style)
+        page = render_site(variant_data, plan_name, style, target_output_dir, coupon_cache=coupon_cache,
+                           font_subsetter=font_subsetter, defer_fonts=defer_fonts, executors=executors,
+                           vendor_cache=vendor_cache, writer=writer, deps=deps)
+        if page is None:
+            continue
+        pages.append(page)
+        manifest['variants'].append({
+            'id': variant_id,
+            'style': style,
+            'overrides': overrides,
+            'output': os.path.join(target_output_dir, 'index.html')
+        })
+
+    if defer_fonts and font_subsetter is not None and font_subsetter.available():
+        apply_campaign_fonts(pages, font_subsetter, writer=writer)
+
+    if not os.path.exists(plan_dir):
+        os.makedirs(plan_dir)
+    manifest_path = os.path.join(plan_dir, 'variants.json')
+    manifest_json = json.dumps(manifest, ensure_ascii=False, indent=2)
+    if writer is not None:
+        writer.write(manifest_path, manifest_json)
     else:
-        print("Warning: No static directory found to copy.")
-        if not os.path.exists(output_static_dir):
-            os.makedirs(output_static_dir)
-
-    # Ensure css dir exists
-    output_css_dir = os.path.join(output_static_dir, 'css')
-    if not os.path.exists(output_css_dir):
-        os.makedirs(output_css_dir)
-
-    # Write dynamic style.css (Always overwrite as it depends on JSON plan)
-    if 'output_css' in locals():
-        css_file_path = os.path.join(output_css_dir, 'style.css')
-        with open(css_file_path, 'w', encoding='utf-8') as f:
-            f.write(output_css)
-        print(f"CSS generated at {css_file_path}")
-
-    # 7. Generate Coupon Image (If configured)
-    if 'coupon' in data:
-        print("Generating Coupon Image...")
+        with open(manifest_path, 'w', encoding='utf-8') as f:
+            f.write(manifest_json)
+    print(f"Variant manifest written to {manifest_path} ({len(manifest['variants'])} variants)")
+
+def _json_loads():
+    """orjson.loads when installed (several times faster on large plans), else json.loads."""
+    try:
+        import orjson
+        return orjson.loads
+    except ImportError:
+        return json.loads
+
+def plan_id_for(path):
+    """input/busy_mom_plan.json -> busy_mom_plan"""
+    return os.path.splitext(os.path.basename(path))[0]
+
+def load_plans(paths):
+    """
+    Reads and parses many plan files in one pass.
+    Returns ({plan_id: data}, {path: error message}); unreadable plans are reported, not fatal.
+    """
+    loads = _json_loads()
+    plans = {}
+    errors = {}
+    for path in paths:
         try:
-            from coupon_generator import CouponRenderer
-            renderer = CouponRenderer()
-            
-            # Ensure images/generated/{plan_name} exists
-            output_img_dir = os.path.join(output_static_dir, f"images/generated/{plan_name}")
-            if not os.path.exists(output_img_dir):
-                os.makedirs(output_img_dir)
-            
-            output_coupon_path = os.path.join(output_img_dir, 'coupon.png')
-            success = renderer.generate(data['coupon'], output_coupon_path)
-            
-            if success:
-                # Calculate relative path for HTML use
-                # output_static_dir is .../static
-                # we saved to .../static/images/generated/{plan_name}/coupon.png
-                # relative path: static/images/generated/{plan_name}/coupon.png
-                rel_path = f"static/images/generated/{plan_name}/coupon.png"
-                print(f"Coupon generated successfully at {output_coupon_path}")
-                
-                # Update campaign image URL in data object (In-memory update for Jinja)
-                # Structure varies by plan/template. We attempt to find a 'campaign' or 'campaign_box' section.
-                found_campaign = False
-                
-                # Strategy 1: Top-level 'campaign' key (if used)
-                if 'campaign' in data:
-                    data['campaign']['image_url'] = rel_path
-                    found_campaign = True
-                
-                # Strategy 2: 'sections' list (standard/manga structure)
-                if 'sections' in data:
-                    for section in data['sections']:
-                        if section['type'] == 'campaign_box' or section['type'] == 'campaign':
-                            section['data']['image_url'] = rel_path
-                            found_campaign = True
-                            
-                if found_campaign:
-                    print(f"Updated campaign image URL to: {rel_path}")
-                else:
-                    print("Warning: Generated coupon but could not find a campaign section to attach it to.")
-                    
-        except Exception as e:
-            print(f"Error generating coupon: {e}")
+            with open(path, 'rb') as f:
+                raw = f.read()
+            data = loads(raw)
+        except FileNotFoundError:
+            errors[path] = f"{path} not found."
+            continue
+        except ValueError:
+            # json.JSONDecodeError and orjson.JSONDecodeError are both ValueErrors
+            errors[path] = f"Invalid JSON format in {path}."
+            continue
+        plan_id = plan_id_for(path)
+        if plan_id in plans:
+            print(f"Warning: Plan {plan_id} is loaded twice; using {path}.")
+        plans[plan_id] = data
+    return plans, errors
+
+def _sha256(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+def write_build_manifest(page_roots, writer):
+    """
+    Lists every file the pages under page_roots ship (index.html plus the files
+    it references, as packaged, and variants.json) with its sha256 and size,
+    in sorted order, into {OUTPUT_DIR}/build-manifest.json. Leftovers of older
+    builds that no page references are not listed, so identical inputs give an
+    identical manifest.
+    """
+    import glob
+    from packager import page_entries
+
+    files = {}
+    for root in sorted(set(page_roots)):
+        paths = [os.path.join(root, 'variants.json')]
+        for html_path in sorted(glob.glob(os.path.join(root, '**', 'index.html'), recursive=True)):
+            paths.extend(page_entries(os.path.dirname(html_path)).values())
+        for path in paths:
+            if os.path.isfile(path):
+                rel = os.path.relpath(path, OUTPUT_DIR).replace(os.sep, '/')
+                files[rel] = {'sha256': _sha256(path), 'bytes': os.path.getsize(path)}
+
+    manifest = {'source_date_epoch': writer.epoch, 'files': files}
+    path = os.path.join(OUTPUT_DIR, BUILD_MANIFEST)
+    writer.write(path, json.dumps(manifest, ensure_ascii=False, indent=2, sort_keys=True) + '\n')
+    print(f"Build manifest: {len(files)} files in {path}")
+    return path
+
+class Build:
+    """
+    Shared state for rendering many pages from one process: plans parsed once,
+    styles resolved once (environment + compiled templates), and the coupon
+    cache, font subsetter, vendor cache and worker pools reused by every page.
+    Plans are never copied up front; render_site() replaces top-level keys
+    of a shallow copy, and defaults such as 'legal' are shared, not rebuilt.
+
+        with Build(['input/a.json', 'input/b.json'], jobs=4) as build:
+            build.render('a', 'manga')
+
+    reproducible: outputs and synced assets are stamped with SOURCE_DATE_EPOCH
+    (1980-01-01 if unset) instead of build/source times, and close() writes
+    a sorted build manifest; two builds of the same inputs give identical
+    bytes, timestamps and manifest.
+    image_memory_mb: decoded-image memory all image workers may hold at once
+    (default image_memory.MEMORY_BUDGET_MB).
+    """
+
+    def __init__(self, plan_paths=(), font_scope='page', jobs=1, vendor='off', vendor_mirrors=None,
+                 deps_path=DEPS_PATH, reproducible=False, image_memory_mb=None):
+        from task_graph import Executors
+        from image_memory import MEMORY_BUDGET_MB
+        from output_writer import OutputWriter, source_date_epoch
+        from dep_index import DependencyIndex
+
+        self.reproducible = reproducible
+        epoch = None
+        if reproducible:
+            epoch = source_date_epoch()
+            # fontTools (head.modified) and the image workers read the same clock
+            os.environ['SOURCE_DATE_EPOCH'] = str(epoch)
+            print(f"Reproducible build (SOURCE_DATE_EPOCH={epoch})")
+        # Page directories rendered by this build (for the build manifest)
+        self.rendered = []
+
+        if plan_paths:
+            print(f"Loading {len(plan_paths)} plan(s)...")
+        self.plans, self.errors = load_plans(plan_paths)
+        for message in self.errors.values():
+            print(f"Error: {message}")
+
+        self.font_scope = font_scope
+        self.font_subsetter = None
+        if font_scope != 'off':
+            from font_subsetter import FontSubsetter
+            self.font_subsetter = FontSubsetter()
+            if not self.font_subsetter.available():
+                print("Note: Font subsetting skipped (fontTools/brotli not installed or no font files in assets/fonts).")
+
+        self.vendor_cache = None
+        if vendor != 'off':
+            from vendor import VendorCache
+            self.vendor_cache = VendorCache(offline=vendor == 'offline', mirrors=vendor_mirrors)
+
+        self.coupon_cache = {}
+        # Unchanged outputs are not rewritten; counts are reported on close()
+        self.writer = OutputWriter(epoch=epoch)
+        # Templates / section types / plan file behind each page (`generator.py affected`);
+        # deps_path=None for builds outside output/ (previews)
+        self.deps = DependencyIndex(deps_path) if deps_path else None
+        if self.deps is not None:
+            for path in plan_paths:
+                if plan_id_for(path) in self.plans:
+                    self.deps.add_source(plan_id_for(path), path)
+        # Image jobs (coupons, posters, comics) share one decoded-memory budget across workers
+        self.executors = Executors(jobs, image_memory_mb or MEMORY_BUDGET_MB)
+        if any('coupon' in data for data in self.plans.values()):
+            # Overlap the image worker's start-up with template loading and asset sync
+            self.executors.warm_images()
+
+    def style(self, style):
+        """The resolved style (see get_style); raises if it has no index.html."""
+        return get_style(style)
+
+    def add_plan(self, plan_id, data):
+        """Registers an already-parsed plan (e.g. received by a service)."""
+        self.plans[plan_id] = data
+
+    def render_plan(self, data, plan_name, style='standard', target_output_dir=None, sync_static=True):
+        """Renders one plan dict; returns render_site()'s page dict (None on failure)."""
+        if target_output_dir is None:
+            # New Structure: output/{plan_name}/{style_name}/
+            target_output_dir = os.path.join(OUTPUT_DIR, plan_name, style)
+        self.rendered.append(target_output_dir)
+        return render_site(data, plan_name, style, target_output_dir, coupon_cache=self.coupon_cache,
+                           font_subsetter=self.font_subsetter, executors=self.executors,
+                           sync_static=sync_static, vendor_cache=self.vendor_cache, writer=self.writer,
+                           deps=self.deps)
+
+    def render(self, plan_id, style='standard', target_output_dir=None):
+        """
+        Renders a loaded plan. Variant plans expand into every variant
+        (output/{plan}/{variant}/{style}/) and return None; others return the page dict.
+        """
+        data = self.plans[plan_id]
+        if 'variants' in data:
+            # A/B matrix plans expand into many pages sharing one environment and coupon cache
+            self.rendered.append(os.path.join(OUTPUT_DIR, plan_id))
+            generate_variants(data, plan_id, default_style=style, font_subsetter=self.font_subsetter,
+                              font_scope=self.font_scope, executors=self.executors,
+                              vendor_cache=self.vendor_cache, writer=self.writer, deps=self.deps)
+            return None
+        return self.render_plan(data, plan_id, style, target_output_dir)
+
+    def close(self):
+        self.executors.shutdown()
+        if self.executors.image_jobs:
+            print(self.executors.image_report())
+        if self.reproducible and self.rendered:
+            write_build_manifest(self.rendered, self.writer)
+        self.writer.save()
+        print(self.writer.report())
+        if self.deps is not None:
+            self.deps.save()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def generate_site(input_files, style="standard", font_scope='page', jobs=1, vendor='off', vendor_mirrors=None,
+                  reproducible=False, image_memory_mb=None):
+    """
+    Builds one or more plans (a path or a list of paths) in one process.
+    font_scope: 'page' (subset fonts per page), 'campaign' (one subset shared by
+    all variants of the plan) or 'off' (keep the CSS font stack as-is).
+    jobs: worker threads/processes for the per-page task graph (1 = sequential).
+    vendor: 'off', 'online' (fetch/revalidate third-party assets) or 'offline' (cache only).
+    vendor_mirrors: {origin: url} stand-in servers to fetch vendored assets from.
+    reproducible: fixed timestamps and a build manifest (see Build).
+    image_memory_mb: memory budget of the image jobs (see Build).
+    """
+    if isinstance(input_files, str):
+        input_files = [input_files]
+
+    with Build(input_files, font_scope=font_scope, jobs=jobs, vendor=vendor, vendor_mirrors=vendor_mirrors,
+               reproducible=reproducible, image_memory_mb=image_memory_mb) as build:
+        if build.errors and not build.plans:
+            sys.exit(1)
+        for plan_id in build.plans:
+            if len(build.plans) > 1:
+                print(f"=== {plan_id} ===")
+            build.render(plan_id, style)
 
     print("Success! LP generation complete.")
+    if build.errors:
+        sys.exit(1)
+
+# Subcommands: `python generator.py <name> ...` runs <module>.main(argv)
+COMMANDS = {
+    'publish': 'publisher',
+    'audit': 'page_audit',
+    'package': 'packager',
+    'affected': 'dep_index'
+}
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] in COMMANDS:
+        import importlib
+        sys.exit(importlib.import_module(COMMANDS[sys.argv[1]]).main(sys.argv[2:]))
+
     import argparse
     parser = argparse.ArgumentParser(description='LP Generator')
-    parser.add_argument('input_file', nargs='?', default='input/sample_plan.json', help='Path to input JSON plan')
+    parser.add_argument('input_files', nargs='*', default=['input/sample_plan.json'],
+                        help='Path(s) to input JSON plans (several are built in one process)')
     parser.add_argument('--style', default='standard', help='Style to use (standard, manga, etc.)')
+    parser.add_argument('--font-scope', default='page', choices=['page', 'campaign', 'off'],
+                        help='Web-font subsetting scope (campaign = shared across variants)')
+    parser.add_argument('--jobs', type=int, default=1,
+                        help='Parallel build workers: overlaps coupon encoding, asset sync and CSS (1 = sequential)')
+    parser.add_argument('--vendor', default='off', choices=['off', 'online', 'offline'],
+                        help='Self-host third-party assets (offline = use the vendor cache only, no network)')
+    parser.add_argument('--vendor-mirror', action='append', metavar='ORIGIN=URL',
+                        help='Fetch vendored assets of ORIGIN from a stand-in server')
+    parser.add_argument('--reproducible', action='store_true',
+                        help='Fixed timestamps (SOURCE_DATE_EPOCH) and a build manifest; identical inputs give identical output')
+    parser.add_argument('--image-memory', type=int, metavar='MB',
+                        help='Decoded-image memory all image workers may use at once (default 1024)')
     args = parser.parse_args()
-    
-    generate_site(args.input_file, style=args.style)
+
+    from vendor import parse_mirrors
+    try:
+        vendor_mirrors = parse_mirrors(args.vendor_mirror)
+    except ValueError as e:
+        parser.error(f"--vendor-mirror: {e}")
+    generate_site(args.input_files, style=args.style, font_scope=args.font_scope, jobs=args.jobs,
+                  vendor=args.vendor, vendor_mirrors=vendor_mirrors,
+                  reproducible=args.reproducible, image_memory_mb=args.image_memory)
@@ -0,0 +1,192 @@
+import multiprocessing
+import threading
+from contextlib import ExitStack, contextmanager
+
+from PIL import Image
+
+# Decoded-pixel memory all image jobs of a build may hold at once
+MEMORY_BUDGET_MB = 1024
+
+# Sources above this many pixels (4K and up) are shrunk with reduce() and
+# resampled in bands, so no full-size resampling buffer is allocated
+LARGE_PIXELS = 3840 * 2160
+BAND_ROWS = 256
+
+# Modes that resample correctly as-is (anything else is converted first)
+RESAMPLE_MODES = ('L', 'RGB', 'RGBA')
+
+MIB = 1 << 20
+
+
+def image_bytes(size, mode):
+    """Bytes Pillow allocates for an image: 1 byte per pixel for L/P/1, 2 for I;16, else 4."""
+    width, height = size
+    if mode in ('1', 'L', 'P'):
+        return width * height
+    if mode.startswith('I;16'):
+        return width * height * 2
+    return width * height * 4
+
+
+class MemoryBudget:
+    """
+    A byte-counting semaphore shared by the build process and its image
+    workers (pass it to the pool initializer; see task_graph.Executors).
+    A job waits for room before it decodes; nested reservations of a job
+    that already holds memory never wait (no hold-and-wait deadlock), and
+    a single request larger than the whole budget runs once nothing else does.
+    """
+
+    def __init__(self, limit_bytes, ctx=None):
+        ctx = ctx or multiprocessing.get_context('spawn')
+        self.limit = limit_bytes
+        self._cond = ctx.Condition()
+        self._used = ctx.RawValue('q', 0)
+
+    def acquire(self, nbytes, wait=True):
+        with self._cond:
+            if wait:
+                self._cond.wait_for(lambda: self._used.value == 0 or self._used.value + nbytes <= self.limit)
+            self._used.value += nbytes
+
+    def release(self, nbytes):
+        with self._cond:
+            self._used.value -= nbytes
+            self._cond.notify_all()
+
+
+_budget = None
+_job = threading.local()
+
+
+def install(budget):
+    """Makes budget the process-wide one (image pool initializer)."""
+    global _budget
+    _budget = budget
+
+
+def get_budget():
+    global _budget
+    if _budget is None:
+        _budget = MemoryBudget(MEMORY_BUDGET_MB * MIB)
+    return _budget
+
+
+class Reservation:
+    """Budget bytes held by one reserve() block; shrink() hands back what is no longer needed."""
+
+    def __init__(self, budget, job, nbytes):
+        self._budget = budget
+        self._job = job
+        self.nbytes = nbytes
+
+    def shrink(self, nbytes):
+        freed = self.nbytes - nbytes
+        if freed <= 0:
+            return
+        self.nbytes = nbytes
+        self._budget.release(freed)
+        if self._job is not None:
+            self._job['used'] -= freed
+
+
+@contextmanager
+def reserve(nbytes):
+    """Holds nbytes of the budget for the block and counts them toward the current job's peak."""
+    job = getattr(_job, 'state', None)
+    held = job is not None and job['used'] > 0
+    budget = get_budget()
+    budget.acquire(nbytes, wait=not held)
+    if job is not None:
+        job['used'] += nbytes
+        job['peak'] = max(job['peak'], job['used'])
+    reservation = Reservation(budget, job, nbytes)
+    try:
+        yield reservation
+    finally:
+        reservation.shrink(0)
+
+
+def run_tracked(func, *args):
+    """Runs an image job; returns (result, peak reserved bytes). Top-level so workers can run it."""
+    _job.state = {'used': 0, 'peak': 0}
+    try:
+        return func(*args), _job.state['peak']
+    finally:
+        _job.state = None
+
+
+def _reduce_factor(src_size, size):
+    """The reduce() factor _resample applies before resampling (1 = none)."""
+    if src_size[0] * src_size[1] <= LARGE_PIXELS:
+        return 1
+    factor = min(src_size[0] // size[0], src_size[1] // size[1]) // 2
+    return factor if factor >= 2 else 1
+
+
+def _resample(img, size):
+    """LANCZOS resize; large images are reduce()d first and resampled band by band."""
+    if img.width * img.height <= LARGE_PIXELS:
+        return img.resize(size, Image.Resampling.LANCZOS)
+
+    factor = _reduce_factor(img.size, size)
+    if factor >= 2:
+        # Integer box reduction down to ~2x the target; LANCZOS does the rest
+        img = img.reduce(factor)
+
+    out = Image.new(img.mode, size)
+    scale_y = img.height / size[1]
+    for top in range(0, size[1], BAND_ROWS):
+        bottom = min(size[1], top + BAND_ROWS)
+        band = img.resize((size[0], bottom - top), Image.Resampling.LANCZOS,
+                          box=(0, top * scale_y, img.width, bottom * scale_y))
+        out.paste(band, (0, top))
+    return out
+
+
+@contextmanager
+def load_fitted(path, size, mode):
+    """
+    Opens an image at `size` in `mode` within the memory budget:
+
+        with load_fitted(path, size, 'RGBA') as img:
+            canvas.alpha_composite(img)
+
+    The decoding buffers are released once the image is fitted; the image's
+    own bytes stay reserved until the block ends, so use it inside the block.
+    JPEG sources decode at a reduced DCT scale (Image.draft); others are
+    resampled in their own mode before converting, so a full-size RGBA copy
+    of an RGB source is never made.
+    """
+    with ExitStack() as stack:
+        src = stack.enter_context(Image.open(path))
+        if src.format == 'JPEG':
+            src.draft('RGB' if mode in ('RGB', 'RGBA') else mode, size)
+        decoded = image_bytes(src.size, src.mode)
+        out_bytes = image_bytes(size, mode)
+        work_mode = src.mode if src.mode in RESAMPLE_MODES else mode
+        converted = image_bytes(src.size, mode) if src.mode not in RESAMPLE_MODES else 0
+        # The reduce()d copy of a large source lives next to the source while it is resampled
+        factor = _reduce_factor(src.size, size) if src.size != size else 1
+        reduced = (image_bytes((-(-src.size[0] // factor), -(-src.size[1] // factor)), work_mode)
+                   if factor >= 2 else 0)
+        held = stack.enter_context(reserve(decoded + converted + reduced + out_bytes))
+
+        img = src if src.mode in RESAMPLE_MODES else src.convert(mode)
+        if img.size != size:
+            img = _resample(img, size)
+        # convert() also detaches an unresized source from the file being closed
+        if img is src or img.mode != mode:
+            img = img.convert(mode)
+        src.close()
+        held.shrink(out_bytes)
+        yield img
+
+
+def report(jobs, limit):
+    """One-line summary of (name, peak bytes) image jobs."""
+    if not jobs:
+        return None
+    name, peak = max(jobs, key=lambda job: job[1])
+    return (f"Image memory: {len(jobs)} jobs, largest peak {peak / MIB:.1f} MiB ({name}), "
+            f"budget {limit / MIB:.0f} MiB")
@@ -0,0 +1,117 @@
+import base64
+import hashlib
+import io
+import json
+import os
+
+from PIL import Image, ImageFilter, features
+
+CACHE_PATH = '.cache/placeholders.json'
+PLACEHOLDER_WIDTH = 20
+
+
+class PlaceholderCache:
+    """
+    Intrinsic size + tiny blurred preview (LQIP) for local images.
+
+    Entries are keyed by the SHA-1 of the source file, so renamed or copied
+    images reuse their previews; a (size, mtime) index avoids re-hashing
+    unchanged files on every build.
+    """
+
+    def __init__(self, cache_path=CACHE_PATH, width=PLACEHOLDER_WIDTH):
+        self.cache_path = cache_path
+        self.width = width
+        self.entries = {}
+        self.stat_index = {}
+        self._dirty = False
+        self._format = 'WEBP' if features.check('webp') else 'PNG'
+
+        if os.path.exists(cache_path):
+            try:
+                with open(cache_path, 'r', encoding='utf-8') as f:
+                    cached = json.load(f)
+                self.entries = cached.get('entries', {})
+                self.stat_index = cached.get('stat_index', {})
+            except (OSError, json.JSONDecodeError):
+                print(f"Warning: Ignoring unreadable placeholder cache {cache_path}.")
+
+    def _file_hash(self, path):
+        st = os.stat(path)
+        stamp = f"{st.st_size}:{st.st_mtime_ns}"
+        known = self.stat_index.get(path)
+        if known and known[0] == stamp:
+            return known[1]
+
+        h = hashlib.sha1()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                h.update(chunk)
+        digest = h.hexdigest()
+        self.stat_index[path] = [stamp, digest]
+        self._dirty = True
+        return digest
+
+    def _compute(self, path):
+        with Image.open(path) as img:
+            width, height = img.size
+            has_alpha = img.mode in ('RGBA', 'LA', 'PA') or 'transparency' in img.info
+            if has_alpha:
+                alpha = img.convert('RGBA').getchannel('A')
+                has_alpha = alpha.getextrema()[0] < 255
+
+            entry = {'width': width, 'height': height, 'placeholder': None}
+            # A blurred backdrop would show through transparent areas (coupon corners, icons)
+            if has_alpha:
+                return entry
+
+            img.draft('RGB', (self.width * 4, self.width * 4))
+            thumb_h = max(1, round(height * self.width / width))
+            thumb = img.convert('RGB').resize((self.width, thumb_h), Image.Resampling.BILINEAR)
+            thumb = thumb.filter(ImageFilter.GaussianBlur(1))
+
+            buf = io.BytesIO()
+            if self._format == 'WEBP':
+                thumb.save(buf, 'WEBP', quality=40, method=6)
+                mime = 'image/webp'
+            else:
+                thumb.save(buf, 'PNG', optimize=True)
+                mime = 'image/png'
+            entry['placeholder'] = f"data:{mime};base64,{base64.b64encode(buf.getvalue()).decode('ascii')}"
+            return entry
+
+    def get(self, path):
+        """Returns {'width', 'height', 'placeholder'} for a local image file, or None."""
+        if not path or not os.path.isfile(path):
+            return None
+        try:
+            digest = self._file_hash(path)
+            if digest not in self.entries:
+                self.entries[digest] = self._compute(path)
+                self._dirty = True
+            return self.entries[digest]
+        except (OSError, ValueError) as e:
+            print(f"Warning: Could not build placeholder for {path} ({e}).")
+            return None
+
+    def forget(self, directory):
+        """Drops the files under directory, and the previews no remaining file uses."""
+        prefix = os.path.abspath(directory) + os.sep
+        kept = {path: known for path, known in self.stat_index.items()
+                if not os.path.abspath(path).startswith(prefix)}
+        if len(kept) == len(self.stat_index):
+            return
+        self.stat_index = kept
+        used = {digest for _, digest in kept.values()}
+        self.entries = {digest: entry for digest, entry in self.entries.items() if digest in used}
+        self._dirty = True
+
+    def save(self):
+        if not self._dirty:
+            return
+        cache_dir = os.path.dirname(self.cache_path)
+        if cache_dir and not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+        with open(self.cache_path, 'w', encoding='utf-8') as f:
+            json.dump({'entries': self.entries, 'stat_index': self.stat_index}, f)
+        self._dirty = False
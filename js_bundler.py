@@ -0,0 +1,143 @@
+import hashlib
+import os
+import re
+
+from jinja2 import TemplateNotFound
+
+MODULE_DIR = 'static/js/modules'
+
+# Runtime features in load order. 'sections' lists the plan section types that
+# need the module; None means every page gets it (anchors, floating CTA, fade-up
+# are emitted by shared components). 'markup' is (component template, marker):
+# the module is only bundled when the style's template contains the marker.
+JS_MODULES = [
+    {'name': 'smooth_scroll', 'sections': None},
+    {'name': 'fade_up', 'sections': None},
+    {'name': 'floating_cta', 'sections': None},
+    {'name': 'swiper', 'sections': {'slider', 'voice'}},
+    {'name': 'sticky_flow', 'sections': {'flow'},
+     'markup': ('components/flow.html', 'sticky-flow-container')},
+    {'name': 'video_facade', 'sections': {'video'}}
+]
+
+# Bundles up to this size are inlined into index.html instead of costing a request
+JS_INLINE_LIMIT = 1024
+
+CONSOLE_RE = re.compile(r'^\s*console\.(log|debug|info)\(.*\);?\s*$')
+
+
+def _has_markup(env, markup):
+    """Whether the style's component template (as env resolves it) contains the marker."""
+    if env is None or markup is None:
+        return True
+    name, marker = markup
+    try:
+        source = env.loader.get_source(env, name)[0]
+    except TemplateNotFound:
+        return False
+    return marker in source
+
+
+def select_modules(data, env=None):
+    """
+    Returns the module names a plan needs, based on its section types and,
+    given the style's Jinja environment, on the markup its components emit.
+    """
+    if 'sections' not in data:
+        # Legacy Mode renders every component
+        return [m['name'] for m in JS_MODULES if _has_markup(env, m.get('markup'))]
+
+    section_types = {s.get('type') for s in data['sections']}
+    return [m['name'] for m in JS_MODULES
+            if (m['sections'] is None or m['sections'] & section_types)
+            and _has_markup(env, m.get('markup'))]
+
+
+def _strip_comments(source):
+    """Removes // and /* */ comments, leaving string and template literals intact."""
+    out = []
+    i = 0
+    n = len(source)
+    quote = None
+    while i < n:
+        c = source[i]
+        if quote:
+            out.append(c)
+            if c == '\\' and i + 1 < n:
+                out.append(source[i + 1])
+                i += 2
+                continue
+            if c == quote:
+                quote = None
+            i += 1
+        elif c in ('"', "'", '`'):
+            quote = c
+            out.append(c)
+            i += 1
+        elif source.startswith('//', i):
+            end = source.find('\n', i)
+            i = n if end == -1 else end
+        elif source.startswith('/*', i):
+            end = source.find('*/', i + 2)
+            i = n if end == -1 else end + 2
+        else:
+            out.append(c)
+            i += 1
+    return ''.join(out)
+
+
+def minify(source):
+    """
+    Conservative minifier: drops comments, console logging, indentation and
+    blank lines. Line breaks are kept so automatic semicolon insertion still holds.
+    """
+    lines = []
+    for line in _strip_comments(source).splitlines():
+        if CONSOLE_RE.match(line):
+            continue
+        line = line.strip()
+        if line:
+            lines.append(line)
+    return '\n'.join(lines)
+
+
+class JSBundler:
+    """Builds one minified runtime bundle per feature set (cached per process)."""
+
+    def __init__(self, module_dir=MODULE_DIR, inline_limit=JS_INLINE_LIMIT):
+        self.module_dir = module_dir
+        self.inline_limit = inline_limit
+        self._bundles = {}
+
+    def _build(self, modules):
+        parts = []
+        for name in modules:
+            path = os.path.join(self.module_dir, f"{name}.js")
+            with open(path, 'r', encoding='utf-8') as f:
+                # Block scope per module so top-level consts cannot collide
+                parts.append('{\n' + f.read() + '\n}')
+        source = "document.addEventListener('DOMContentLoaded', () => {\n" + '\n'.join(parts) + '\n});'
+        code = minify(source)
+        digest = hashlib.sha1(code.encode('utf-8')).hexdigest()[:10]
+        return {'code': code, 'hash': digest}
+
+    def bundle(self, data, env=None):
+        """
+        Returns {'modules', 'code', 'hash', 'inline', 'filename', 'bytes'} for a plan
+        rendered with env (the style's environment). Pages with the same feature
+        set share one cached bundle.
+        """
+        modules = tuple(select_modules(data, env))
+        if modules not in self._bundles:
+            self._bundles[modules] = self._build(modules)
+        built = self._bundles[modules]
+
+        size = len(built['code'].encode('utf-8'))
+        return {
+            'modules': list(modules),
+            'code': built['code'],
+            'hash': built['hash'],
+            'inline': size <= self.inline_limit,
+            'filename': f"bundle.{built['hash']}.js",
+            'bytes': size
+        }
@@ -0,0 +1,143 @@
+import hashlib
+import json
+import os
+import threading
+
+MANIFEST_PATH = '.cache/outputs.json'
+
+# Timestamp of reproducible builds when SOURCE_DATE_EPOCH is not set (1980-01-01, the ZIP epoch)
+DEFAULT_EPOCH = 315532800
+
+
+def source_date_epoch():
+    """SOURCE_DATE_EPOCH if set (and valid), else DEFAULT_EPOCH."""
+    try:
+        return int(os.environ['SOURCE_DATE_EPOCH'])
+    except (KeyError, ValueError):
+        return DEFAULT_EPOCH
+
+
+def _digest(data):
+    return hashlib.sha1(data).hexdigest()
+
+
+def _file_digest(path):
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class OutputWriter:
+    """
+    Writes build outputs only when their content changes, so unchanged pages
+    keep their mtimes and downstream sync / compression / publish steps see
+    real changes only.
+
+    The manifest remembers (size, mtime_ns, sha1) of every file written or
+    checked; while a file's stat matches, its hash is taken from there
+    instead of re-reading it. Otherwise a size mismatch decides, and only
+    same-size files are hashed. Writes are atomic (temp file + rename).
+
+    epoch: stamp every output (written or unchanged) with this mtime instead
+    of the build time, for reproducible builds.
+    """
+
+    def __init__(self, manifest_path=MANIFEST_PATH, epoch=None):
+        self.manifest_path = manifest_path
+        self.epoch = epoch
+        self.files = {}
+        self.written = 0
+        self.unchanged = 0
+        self._dirty = False
+        self._lock = threading.Lock()
+        if manifest_path and os.path.exists(manifest_path):
+            try:
+                with open(manifest_path, 'r', encoding='utf-8') as f:
+                    self.files = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                print(f"Warning: Ignoring unreadable output manifest {manifest_path}.")
+
+    def _current_digest(self, key, path, size):
+        """Digest of the existing file at path, or None if it is missing or a different size."""
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        known = self.files.get(key)
+        if known and known[0] == st.st_size and known[1] == st.st_mtime_ns:
+            return known[2]
+        if st.st_size != size:
+            return None
+        return _file_digest(path)
+
+    def _record(self, key, path, digest, changed):
+        if self.epoch is not None:
+            os.utime(path, (self.epoch, self.epoch))
+        st = os.stat(path)
+        with self._lock:
+            self.files[key] = [st.st_size, st.st_mtime_ns, digest]
+            self._dirty = True
+            if changed:
+                self.written += 1
+            else:
+                self.unchanged += 1
+
+    def write(self, path, content):
+        """Writes str (UTF-8) or bytes content unless path already holds it. Returns True if written."""
+        data = content.encode('utf-8') if isinstance(content, str) else content
+        digest = _digest(data)
+        key = os.path.abspath(path)
+        if self._current_digest(key, path, len(data)) == digest:
+            self._record(key, path, digest, False)
+            return False
+
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+        self._record(key, path, digest, True)
+        return True
+
+    def replace(self, tmp_path, path):
+        """Moves a finished temp file into place unless path already holds the same bytes (then drops it)."""
+        digest = _file_digest(tmp_path)
+        key = os.path.abspath(path)
+        if self._current_digest(key, path, os.path.getsize(tmp_path)) == digest:
+            os.remove(tmp_path)
+            self._record(key, path, digest, False)
+            return False
+        os.replace(tmp_path, path)
+        self._record(key, path, digest, True)
+        return True
+
+    def copy(self, src, dst):
+        """Copies src to dst unless dst already holds the same bytes."""
+        with open(src, 'rb') as f:
+            return self.write(dst, f.read())
+
+    def forget(self, directory):
+        """Drops the entries of files under directory (e.g. a deleted preview), keeping the manifest bounded."""
+        prefix = os.path.abspath(directory) + os.sep
+        with self._lock:
+            self.files = {key: entry for key, entry in self.files.items() if not key.startswith(prefix)}
+            self._dirty = True
+
+    def save(self):
+        """Persists the manifest (entries of files that no longer exist are dropped)."""
+        if not self._dirty or not self.manifest_path:
+            return
+        with self._lock:
+            files = {path: entry for path, entry in self.files.items() if os.path.exists(path)}
+            self._dirty = False
+        manifest_dir = os.path.dirname(self.manifest_path)
+        if manifest_dir and not os.path.exists(manifest_dir):
+            os.makedirs(manifest_dir)
+        tmp = f"{self.manifest_path}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(files, f, sort_keys=True)
+        os.replace(tmp, self.manifest_path)
+
+    def report(self):
+        return f"Output: {self.written} written, {self.unchanged} unchanged."
@@ -0,0 +1,163 @@
+import hashlib
+import os
+import shutil
+import stat
+import sys
+import tarfile
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+PACKAGE_DIR = 'dist'
+PACKAGE_JOBS = min(8, (os.cpu_count() or 1) * 2)
+FORMATS = ('zip', 'tar.zst')
+ZSTD_LEVEL = 19
+
+# Already-compressed formats: deflating them again costs CPU and saves nothing
+STORED_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.webp', '.gif', '.avif', '.woff2', '.mp4', '.webm', '.zip'}
+
+# ZIP cannot store dates before 1980
+ZIP_EPOCH = 315532800
+
+
+def archive_epoch():
+    """Timestamp written for every entry: SOURCE_DATE_EPOCH if set, else 1980-01-01."""
+    try:
+        return max(ZIP_EPOCH, int(os.environ['SOURCE_DATE_EPOCH']))
+    except (KeyError, ValueError):
+        return ZIP_EPOCH
+
+
+def page_entries(page_dir):
+    """
+    {arcname: path} of one built page: index.html plus the local files it
+    references (stylesheets and their url()s, scripts, images, srcset
+    candidates, posters, videos). Unreferenced files of the synced static/
+    copy are left out.
+    """
+    from page_audit import local_files
+    from extract_images import extract_images
+
+    html_path = os.path.join(page_dir, 'index.html')
+    root = os.path.abspath(page_dir)
+    paths = set(local_files(html_path))
+    for _, url in extract_images(html_path):
+        if '://' in url or url.startswith(('/', '//')):
+            continue
+        path = os.path.normpath(os.path.join(page_dir, url.split('?')[0].split('#')[0]))
+        if os.path.isfile(path):
+            paths.add(path)
+
+    entries = {'index.html': html_path}
+    for path in paths:
+        full = os.path.abspath(path)
+        # References climbing out of the page directory are not shipped
+        if full.startswith(root + os.sep):
+            entries[os.path.relpath(full, root).replace(os.sep, '/')] = path
+    return entries
+
+
+def _write_zip(target, entries, epoch):
+    date_time = time.gmtime(epoch)[:6]
+    with zipfile.ZipFile(target, 'w') as zf:
+        for arcname in sorted(entries):
+            info = zipfile.ZipInfo(arcname, date_time=date_time)
+            info.external_attr = (stat.S_IFREG | 0o644) << 16
+            stored = os.path.splitext(arcname)[1].lower() in STORED_EXTENSIONS
+            info.compress_type = zipfile.ZIP_STORED if stored else zipfile.ZIP_DEFLATED
+            with open(entries[arcname], 'rb') as src, zf.open(info, 'w', force_zip64=True) as dst:
+                shutil.copyfileobj(src, dst, 1 << 20)
+
+
+def _write_tar_zst(target, entries, epoch):
+    try:
+        import zstandard
+    except ImportError:
+        raise RuntimeError("tar.zst packages require zstandard (pip install zstandard).")
+    with open(target, 'wb') as f:
+        compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL, write_checksum=True)
+        with compressor.stream_writer(f, closefd=False) as stream, \
+                tarfile.open(fileobj=stream, mode='w|', format=tarfile.PAX_FORMAT) as tar:
+            for arcname in sorted(entries):
+                path = entries[arcname]
+                info = tarfile.TarInfo(arcname)
+                info.size = os.path.getsize(path)
+                info.mtime = epoch
+                info.mode = 0o644
+                info.uid = info.gid = 0
+                info.uname = info.gname = ''
+                with open(path, 'rb') as src:
+                    tar.addfile(info, src)
+
+
+def _sha256(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def package_page(page_dir, target, fmt='zip'):
+    """
+    Streams one page into target (no staging copy). Entries are sorted and
+    timestamped with archive_epoch(), so unchanged pages give byte-identical
+    archives; an identical existing archive is left untouched.
+    Returns {'target', 'files', 'bytes', 'sha256', 'changed'}.
+    """
+    entries = page_entries(page_dir)
+    tmp = f"{target}.tmp"
+    (_write_zip if fmt == 'zip' else _write_tar_zst)(tmp, entries, archive_epoch())
+    digest = _sha256(tmp)
+    changed = not (os.path.exists(target) and _sha256(target) == digest)
+    if changed:
+        os.replace(tmp, target)
+    else:
+        os.remove(tmp)
+    return {'target': target, 'files': len(entries), 'bytes': os.path.getsize(target),
+            'sha256': digest, 'changed': changed}
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(prog='generator.py package',
+                                     description='Pack built LPs (page + referenced assets) into archives')
+    parser.add_argument('plans', nargs='*', help='Plan names under output/ (default: all)')
+    parser.add_argument('--style', help='Only pages of this style')
+    parser.add_argument('--format', default='zip', choices=FORMATS)
+    parser.add_argument('--out', default=PACKAGE_DIR, help='Archive directory')
+    parser.add_argument('--jobs', type=int, default=PACKAGE_JOBS, help='Pages packaged in parallel')
+    args = parser.parse_args(argv)
+
+    from generator import OUTPUT_DIR
+    from page_audit import find_pages
+    pages = [os.path.dirname(html_path) for _, html_path in find_pages(OUTPUT_DIR, args.plans)
+             if args.style is None or os.path.basename(os.path.dirname(html_path)) == args.style]
+    if not pages:
+        print(f"No built pages found under {OUTPUT_DIR}/.")
+        return 1
+
+    os.makedirs(args.out, exist_ok=True)
+
+    def package(page_dir):
+        # output/{plan}/{style} -> {plan}-{style}, variants: {plan}-{variant}-{style}
+        name = os.path.relpath(page_dir, OUTPUT_DIR).replace(os.sep, '-')
+        return package_page(page_dir, os.path.join(args.out, f"{name}.{args.format}"), args.format)
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+            results = list(pool.map(package, pages))
+    except RuntimeError as e:
+        print(f"Error: {e}")
+        return 1
+
+    for result in results:
+        print(f"{'packed' if result['changed'] else 'unchanged'} {result['target']}: {result['files']} files, "
+              f"{result['bytes'] / 1024:.0f} KiB, sha256 {result['sha256'][:16]}")
+    print(f"Packaged {len(results)} pages into {args.out}/ "
+          f"({sum(r['changed'] for r in results)} changed).")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
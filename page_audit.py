@@ -0,0 +1,388 @@
+import glob
+import gzip
+import json
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from html.parser import HTMLParser
+from urllib.parse import urlparse
+
+BUDGET_DIR = 'budgets'
+
+# Limits applied when a campaign has no budget file (None = report only).
+# budgets/default.json and budgets/{plan}.json override these key by key.
+DEFAULT_BUDGET = {
+    'max_requests': 60,
+    'max_transfer_bytes': 3 * 1024 * 1024,
+    'max_image_bytes': 500 * 1024,
+    'max_js_bytes': 100 * 1024,
+    'max_css_bytes': 100 * 1024,
+    'max_render_blocking': 4,
+    'max_images_without_dimensions': None,
+    'max_oversized_images': None,
+    'allowed_origins': None,
+    # Widest CSS slot an image is shown in, and the device pixel ratio worth serving
+    'slot_width': 800,
+    'max_dpr': 2
+}
+
+TEXT_TYPES = {'document', 'css', 'js'}
+CSS_URL_RE = re.compile(r'url\(\s*([\'"]?)(.*?)\1\s*\)')
+DIMENSION_RE = re.compile(r'(\d+)')
+
+TYPE_BY_EXTENSION = {
+    '.css': 'css', '.js': 'js', '.mjs': 'js',
+    '.png': 'image', '.jpg': 'image', '.jpeg': 'image', '.webp': 'image', '.gif': 'image',
+    '.svg': 'image', '.avif': 'image', '.ico': 'image',
+    '.woff2': 'font', '.woff': 'font', '.ttf': 'font', '.otf': 'font',
+    '.mp4': 'media', '.webm': 'media'
+}
+
+
+def _is_remote(url):
+    return url.startswith(('http://', 'https://', '//'))
+
+
+def _origin(url):
+    parsed = urlparse(url if not url.startswith('//') else 'https:' + url)
+    return f"{parsed.scheme}://{parsed.netloc}"
+
+
+def _guess_type(url, default='other'):
+    ext = os.path.splitext(urlparse(url).path)[1].lower()
+    return TYPE_BY_EXTENSION.get(ext, default)
+
+
+class _PageParser(HTMLParser):
+    """Collects the resources a page requests and the <img> tags, noting what sits in <head>."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.in_head = False
+        self.resources = []   # {'url', 'type', 'blocking', 'deferred'}
+        self.images = []      # {'src', 'width', 'height'}
+        self.origins = set()  # preconnect / dns-prefetch targets
+        self.css_texts = []
+        self._in_style = False
+        self._in_video = False
+        self._video_deferred = False
+
+    def _add(self, url, kind, blocking=False, deferred=False):
+        # deferred: only fetched once the visitor taps play
+        if url and not url.startswith(('data:', '#', 'javascript:', 'mailto:', 'tel:')):
+            self.resources.append({'url': url, 'type': kind, 'blocking': blocking, 'deferred': deferred})
+
+    def handle_starttag(self, tag, attrs):
+        a = dict(attrs)
+        if tag == 'head':
+            self.in_head = True
+        elif tag == 'body':
+            self.in_head = False
+
+        if a.get('style'):
+            self.css_texts.append(a['style'])
+        # Click-to-play facades (templates/common/video_facade.html) create the <video> on interaction
+        self._add(a.get('data-poster'), 'image', deferred=True)
+        self._add(a.get('data-video-src'), 'media', deferred=True)
+
+        if tag == 'link':
+            rel = (a.get('rel') or '').lower().split()
+            href = a.get('href')
+            if 'stylesheet' in rel:
+                blocking = self.in_head and a.get('media', 'all') not in ('print',) and 'disabled' not in a
+                self._add(href, 'css', blocking)
+            elif 'preload' in rel or 'modulepreload' in rel:
+                self._add(href, {'style': 'css', 'script': 'js', 'image': 'image',
+                                 'font': 'font'}.get(a.get('as'), _guess_type(href or '')))
+            elif 'icon' in rel or 'apple-touch-icon' in rel:
+                self._add(href, 'image')
+            elif ('preconnect' in rel or 'dns-prefetch' in rel) and href:
+                self.origins.add(_origin(href))
+        elif tag == 'script' and a.get('src'):
+            blocking = (self.in_head and 'async' not in a and 'defer' not in a
+                        and a.get('type') != 'module')
+            self._add(a['src'], 'js', blocking)
+        elif tag == 'img':
+            self.images.append({'src': a.get('src'), 'width': a.get('width'), 'height': a.get('height')})
+            self._add(a.get('src'), 'image')
+        elif tag == 'video':
+            self._in_video = True
+            self._video_deferred = a.get('preload') == 'none'
+            self._add(a.get('poster'), 'image')
+            self._add(a.get('src'), 'media', deferred=self._video_deferred)
+        elif tag == 'source' and self._in_video:
+            self._add(a.get('src'), 'media', deferred=self._video_deferred)
+        elif tag == 'style':
+            self._in_style = True
+
+    def handle_endtag(self, tag):
+        if tag == 'head':
+            self.in_head = False
+        elif tag == 'style':
+            self._in_style = False
+        elif tag == 'video':
+            self._in_video = False
+
+    def handle_data(self, data):
+        if self._in_style:
+            self.css_texts.append(data)
+
+
+def _css_urls(css):
+    return [m.group(2) for m in CSS_URL_RE.finditer(css) if m.group(2)]
+
+
+def _local_path(page_dir, url):
+    path = os.path.normpath(os.path.join(page_dir, urlparse(url).path))
+    return path if os.path.isfile(path) else None
+
+
+def _transfer_size(path, kind):
+    """On-disk size, or the gzip size for text resources (what a server would send)."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if kind in TEXT_TYPES:
+        return len(data), len(gzip.compress(data, 6))
+    return len(data), len(data)
+
+
+def _image_width(path):
+    try:
+        from PIL import Image
+        with Image.open(path) as img:
+            return img.width
+    except (ImportError, OSError):
+        return None
+
+
+def _parse_page(html_path):
+    """Returns (html, parser, resources): the page's own resources plus url()s of its local stylesheets."""
+    page_dir = os.path.dirname(html_path)
+    with open(html_path, 'r', encoding='utf-8') as f:
+        html = f.read()
+    parser = _PageParser()
+    parser.feed(html)
+
+    resources = list(parser.resources)
+    for css in parser.css_texts:
+        resources.extend({'url': url, 'type': _guess_type(url, 'image'), 'blocking': False}
+                         for url in _css_urls(css))
+    # url() references of local stylesheets (fonts, backgrounds)
+    for res in list(resources):
+        if res['type'] == 'css' and not _is_remote(res['url']):
+            path = _local_path(page_dir, res['url'])
+            if path:
+                with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                    css_dir = os.path.dirname(os.path.relpath(path, page_dir))
+                    for url in _css_urls(f.read()):
+                        if not url.startswith('data:') and not _is_remote(url):
+                            url = os.path.normpath(os.path.join(css_dir, url)).replace(os.sep, '/')
+                        resources.append({'url': url, 'type': _guess_type(url, 'image'), 'blocking': False})
+    return html, parser, resources
+
+
+def local_files(html_path):
+    """Paths of the existing local files a built page loads (stylesheets' url()s included)."""
+    page_dir = os.path.dirname(html_path)
+    _, _, resources = _parse_page(html_path)
+    paths = (_local_path(page_dir, res['url']) for res in resources
+             if not _is_remote(res['url']) and not res['url'].startswith('data:'))
+    return sorted({path for path in paths if path})
+
+
+def analyse_page(html_path, budget):
+    """Returns the audit result of one built page (requests, bytes, findings, violations)."""
+    page_dir = os.path.dirname(html_path)
+    html, parser, resources = _parse_page(html_path)
+
+    doc_raw = len(html.encode('utf-8'))
+    requests = {'document': 1}
+    bytes_by_type = {'document': len(gzip.compress(html.encode('utf-8'), 6))}
+    raw_total = doc_raw
+    heavy_images = []
+    missing = []
+    third_party = set(parser.origins)
+    seen = set()
+    deferred_requests = 0
+    deferred_bytes = 0
+
+    # Resources fetched on load first, so a URL also used by a play-on-tap video counts as loaded
+    for res in sorted(resources, key=lambda r: r['deferred']):
+        url = res['url']
+        if url.startswith('data:') or url in seen:
+            continue
+        seen.add(url)
+        if res['deferred']:
+            deferred_requests += 1
+        else:
+            requests[res['type']] = requests.get(res['type'], 0) + 1
+        if _is_remote(url):
+            third_party.add(_origin(url))
+            continue
+        path = _local_path(page_dir, url)
+        if path is None:
+            missing.append(url)
+            continue
+        raw, sent = _transfer_size(path, res['type'])
+        if res['deferred']:
+            deferred_bytes += sent
+            continue
+        raw_total += raw
+        bytes_by_type[res['type']] = bytes_by_type.get(res['type'], 0) + sent
+        if res['type'] == 'image' and sent > budget['max_image_bytes']:
+            heavy_images.append({'url': url, 'bytes': sent})
+
+    no_dimensions = list(dict.fromkeys(img['src'] for img in parser.images
+                                       if img['src'] and not (img['width'] and img['height'])))
+
+    oversized = []
+    for img in parser.images:
+        src = img['src']
+        if not src or _is_remote(src) or src.startswith('data:'):
+            continue
+        path = _local_path(page_dir, src)
+        width = _image_width(path) if path else None
+        if width is None:
+            continue
+        slot = budget['slot_width']
+        declared = DIMENSION_RE.match(img['width'] or '')
+        if declared and int(declared.group(1)) < width:
+            # width attribute smaller than the file: that is the display size
+            slot = min(slot, int(declared.group(1)))
+        if width > slot * budget['max_dpr']:
+            oversized.append({'url': src, 'width': width, 'slot': slot})
+
+    blocking = sorted({r['url'] for r in parser.resources if r['blocking']})
+    result = {
+        'page': html_path,
+        'requests': sum(requests.values()),
+        'requests_by_type': requests,
+        'transfer_bytes': sum(bytes_by_type.values()),
+        'transfer_by_type': bytes_by_type,
+        'raw_bytes': raw_total,
+        'deferred_media_requests': deferred_requests,
+        'deferred_media_bytes': deferred_bytes,
+        'render_blocking': blocking,
+        'images_without_dimensions': no_dimensions,
+        'oversized_images': oversized,
+        'heavy_images': heavy_images,
+        'third_party_origins': sorted(third_party),
+        'missing_files': sorted(set(missing))
+    }
+    result['violations'] = check_budget(result, budget)
+    return result
+
+
+def check_budget(result, budget):
+    """Returns human-readable budget violations for one page result."""
+    violations = []
+
+    def over(key, value, label):
+        limit = budget.get(key)
+        if limit is not None and value > limit:
+            violations.append(f"{label} {value} > {limit}")
+
+    over('max_requests', result['requests'], 'requests')
+    over('max_transfer_bytes', result['transfer_bytes'], 'transfer bytes')
+    over('max_js_bytes', result['transfer_by_type'].get('js', 0), 'JS bytes')
+    over('max_css_bytes', result['transfer_by_type'].get('css', 0), 'CSS bytes')
+    over('max_render_blocking', len(result['render_blocking']), 'render-blocking resources')
+    over('max_images_without_dimensions', len(result['images_without_dimensions']), 'images without dimensions')
+    over('max_oversized_images', len(result['oversized_images']), 'oversized images')
+    for image in result['heavy_images']:
+        violations.append(f"image {image['url']} {image['bytes']} bytes > {budget['max_image_bytes']}")
+    allowed = budget.get('allowed_origins')
+    if allowed is not None:
+        for origin in result['third_party_origins']:
+            if origin not in allowed:
+                violations.append(f"third-party origin {origin} not allowed")
+    for url in result['missing_files']:
+        violations.append(f"missing file {url}")
+    return violations
+
+
+def load_budget(plan, budget_dir=BUDGET_DIR):
+    """Built-in defaults, overridden by budgets/default.json, then budgets/{plan}.json."""
+    budget = dict(DEFAULT_BUDGET)
+    for name in ('default', plan):
+        path = os.path.join(budget_dir, f"{name}.json")
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                budget.update(json.load(f))
+    return budget
+
+
+def find_pages(output_dir, plans=None):
+    """(plan, index.html path) for every built page, including variant pages."""
+    pages = []
+    for plan in sorted(plans or os.listdir(output_dir)):
+        plan_dir = os.path.join(output_dir, plan)
+        if not os.path.isdir(plan_dir):
+            continue
+        for html_path in sorted(glob.glob(os.path.join(plan_dir, '**', 'index.html'), recursive=True)):
+            pages.append((plan, html_path))
+    return pages
+
+
+def _audit(args):
+    return analyse_page(*args)
+
+
+def audit(pages, budget_dir=BUDGET_DIR, jobs=None):
+    """Audits pages (in parallel when there are many); returns the list of results."""
+    budgets = {}
+    work = []
+    for plan, html_path in pages:
+        if plan not in budgets:
+            budgets[plan] = load_budget(plan, budget_dir)
+        work.append((html_path, budgets[plan]))
+    jobs = jobs or os.cpu_count() or 1
+    if jobs <= 1 or len(work) < 8:
+        return [_audit(item) for item in work]
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        return list(pool.map(_audit, work, chunksize=max(1, len(work) // (jobs * 4))))
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(prog='generator.py audit',
+                                     description='Page-weight and performance-budget audit of built LPs')
+    parser.add_argument('plans', nargs='*', help='Plan names under output/ (default: all)')
+    parser.add_argument('--budget-dir', default=BUDGET_DIR, help='Directory with default.json / {plan}.json budgets')
+    parser.add_argument('--jobs', type=int, help='Worker processes (default: CPU count)')
+    parser.add_argument('--json', dest='json_path', help='Write the full report to this file')
+    args = parser.parse_args(argv)
+
+    from generator import OUTPUT_DIR
+    pages = find_pages(OUTPUT_DIR, args.plans)
+    if not pages:
+        print(f"No built pages found under {OUTPUT_DIR}/.")
+        return 1
+
+    results = audit(pages, args.budget_dir, args.jobs)
+    failed = 0
+    for result in results:
+        status = 'FAIL' if result['violations'] else 'ok'
+        print(f"[{status}] {result['page']}: {result['requests']} requests, "
+              f"{result['transfer_bytes'] / 1024:.0f} KiB (+{result['deferred_media_bytes'] / 1024:.0f} KiB on play), "
+              f"{len(result['render_blocking'])} render-blocking, "
+              f"third-party: {', '.join(result['third_party_origins']) or '-'}")
+        if result['images_without_dimensions']:
+            print(f"    images without dimensions: {', '.join(result['images_without_dimensions'])}")
+        for image in result['oversized_images']:
+            print(f"    oversized image: {image['url']} ({image['width']}px for a {image['slot']}px slot)")
+        for violation in result['violations']:
+            print(f"    budget: {violation}")
+        failed += bool(result['violations'])
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+    print(f"Audited {len(results)} pages: {failed} over budget.")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,267 @@
+import hashlib
+import json
+import mimetypes
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+MANIFEST_NAME = '.publish-manifest.json'
+STAT_CACHE_PATH = '.cache/publish_stat.json'
+PUBLISH_JOBS = 8
+# Non-page files published next to the pages of a plan directory
+PUBLISHED_EXTRAS = ('variants.json',)
+
+
+def _sha256(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def published_files(root):
+    """
+    {rel_path: path} of what goes live: every page under root (a directory
+    holding index.html) with the local files it references, plus the
+    variants.json manifest of a variant plan. Leftovers of earlier builds
+    (superseded bundles, fonts, removed static files) are not published.
+    """
+    from packager import page_entries
+
+    files = {}
+    for dirpath, dirs, names in os.walk(root):
+        dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+        if 'index.html' not in names:
+            continue
+        # Page directories hold assets, not further pages
+        dirs[:] = []
+        page_rel = os.path.relpath(dirpath, root).replace(os.sep, '/')
+        for arcname, path in page_entries(dirpath).items():
+            files[arcname if page_rel == '.' else f"{page_rel}/{arcname}"] = path
+    for name in PUBLISHED_EXTRAS:
+        if os.path.isfile(os.path.join(root, name)):
+            files[name] = os.path.join(root, name)
+    return files
+
+
+def local_manifest(root, stat_cache_path=STAT_CACHE_PATH):
+    """
+    {rel_path: sha256} of the files published from root (see published_files).
+    Hashes are reused while a file's size and mtime are unchanged.
+    """
+    cache = {}
+    if os.path.exists(stat_cache_path):
+        try:
+            with open(stat_cache_path, 'r', encoding='utf-8') as f:
+                cache = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            cache = {}
+
+    manifest = {}
+    dirty = False
+    for rel, path in sorted(published_files(root).items()):
+        st = os.stat(path)
+        stamp = f"{st.st_size}:{st.st_mtime_ns}"
+        key = os.path.abspath(path)
+        known = cache.get(key)
+        if known and known[0] == stamp:
+            digest = known[1]
+        else:
+            digest = _sha256(path)
+            cache[key] = [stamp, digest]
+            dirty = True
+        manifest[rel] = digest
+
+    if dirty:
+        cache_dir = os.path.dirname(stat_cache_path)
+        if cache_dir and not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+        with open(stat_cache_path, 'w', encoding='utf-8') as f:
+            json.dump(cache, f)
+    return manifest
+
+
+def _content_type(rel):
+    content_type = mimetypes.guess_type(rel)[0] or 'application/octet-stream'
+    if content_type.startswith('text/') or content_type in ('application/javascript', 'image/svg+xml'):
+        content_type += '; charset=utf-8'
+    return content_type
+
+
+class LocalBackend:
+    """Publishes into a directory (a mounted host, or a stand-in for testing)."""
+
+    # Failures besides OSError that publish() may raise for this backend
+    errors = ()
+
+    def __init__(self, root):
+        self.root = root
+
+    def __str__(self):
+        return f"dir:{self.root}"
+
+    def read_manifest(self):
+        path = os.path.join(self.root, MANIFEST_NAME)
+        if not os.path.exists(path):
+            return {}
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def write_manifest(self, manifest):
+        os.makedirs(self.root, exist_ok=True)
+        path = os.path.join(self.root, MANIFEST_NAME)
+        with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=1, sort_keys=True)
+        os.replace(f"{path}.tmp", path)
+
+    def upload(self, local_path, rel, content_type):
+        from asset_sync import copy_file
+        target = os.path.join(self.root, rel)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        copy_file(local_path, target)
+
+    def delete(self, rel):
+        target = os.path.join(self.root, rel)
+        try:
+            os.remove(target)
+        except FileNotFoundError:
+            return
+        parent = os.path.dirname(target)
+        while os.path.abspath(parent) != os.path.abspath(self.root):
+            try:
+                os.rmdir(parent)
+            except OSError:
+                break
+            parent = os.path.dirname(parent)
+
+
+class S3Backend:
+    """S3-compatible object storage (AWS, MinIO, R2...). Requires boto3."""
+
+    def __init__(self, bucket, prefix='', endpoint_url=None):
+        try:
+            import boto3
+            from botocore.exceptions import BotoCoreError, ClientError
+        except ImportError:
+            raise RuntimeError("S3 publishing requires boto3 (pip install boto3).")
+        self.errors = (BotoCoreError, ClientError)
+        self.client = boto3.client('s3', endpoint_url=endpoint_url)
+        self.bucket = bucket
+        self.prefix = prefix.strip('/')
+
+    def __str__(self):
+        return f"s3://{self.bucket}/{self.prefix}"
+
+    def _key(self, rel):
+        return f"{self.prefix}/{rel}" if self.prefix else rel
+
+    def read_manifest(self):
+        try:
+            obj = self.client.get_object(Bucket=self.bucket, Key=self._key(MANIFEST_NAME))
+        except self.client.exceptions.NoSuchKey:
+            return {}
+        return json.loads(obj['Body'].read())
+
+    def write_manifest(self, manifest):
+        body = json.dumps(manifest, indent=1, sort_keys=True).encode('utf-8')
+        self.client.put_object(Bucket=self.bucket, Key=self._key(MANIFEST_NAME), Body=body,
+                               ContentType='application/json', CacheControl='no-cache')
+
+    def upload(self, local_path, rel, content_type):
+        extra = {'ContentType': content_type}
+        if rel.endswith('.html'):
+            # Pages must revalidate; their assets are content-addressed or versioned by the manifest
+            extra['CacheControl'] = 'no-cache'
+        self.client.upload_file(local_path, self.bucket, self._key(rel), ExtraArgs=extra)
+
+    def delete(self, rel):
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(rel))
+
+
+def make_backend(target, endpoint_url=None):
+    """'s3://bucket/prefix' -> S3Backend, anything else (optionally 'file://') -> LocalBackend."""
+    if target.startswith('s3://'):
+        bucket, _, prefix = target[5:].partition('/')
+        return S3Backend(bucket, prefix, endpoint_url=endpoint_url)
+    if target.startswith('file://'):
+        target = target[7:]
+    return LocalBackend(target)
+
+
+def plan_publish(local, remote):
+    """Returns {'upload_assets', 'upload_pages', 'delete', 'unchanged'} (sorted rel paths)."""
+    changed = [rel for rel, digest in local.items() if remote.get(rel) != digest]
+    return {
+        'upload_assets': sorted(rel for rel in changed if not rel.endswith('.html')),
+        'upload_pages': sorted(rel for rel in changed if rel.endswith('.html')),
+        'delete': sorted(rel for rel in remote if rel not in local),
+        'unchanged': sorted(rel for rel in local if remote.get(rel) == local[rel])
+    }
+
+
+def publish(source_dir, backend, jobs=PUBLISH_JOBS, dry_run=False):
+    """
+    Uploads the new/changed files of source_dir to the backend.
+    Order: assets, then HTML pages (so a page never references a missing
+    file), then orphan deletions, then the new remote manifest.
+    """
+    local = local_manifest(source_dir)
+    remote = backend.read_manifest()
+    actions = plan_publish(local, remote)
+
+    print(f"Publish {source_dir} -> {backend}: {len(actions['upload_assets'])} assets and "
+          f"{len(actions['upload_pages'])} pages to upload, {len(actions['delete'])} to delete, "
+          f"{len(actions['unchanged'])} unchanged.")
+    if dry_run:
+        for mark, key in (('+', 'upload_assets'), ('+', 'upload_pages'), ('-', 'delete')):
+            for rel in actions[key]:
+                print(f"  {mark} {rel}")
+        return actions
+
+    def upload(rel):
+        backend.upload(os.path.join(source_dir, rel), rel, _content_type(rel))
+
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        # list() re-raises the first transfer error before the next phase starts
+        list(pool.map(upload, actions['upload_assets']))
+        list(pool.map(upload, actions['upload_pages']))
+        list(pool.map(backend.delete, actions['delete']))
+
+    backend.write_manifest(local)
+    print("Publish complete.")
+    return actions
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(prog='generator.py publish',
+                                     description='Upload only the changed files of a built LP')
+    parser.add_argument('plan', help='Plan name (output/{plan}) or a path to a built directory')
+    parser.add_argument('--style', help='Publish output/{plan}/{style} only (default: every style/variant)')
+    parser.add_argument('--to', required=True, dest='target',
+                        help="Destination: a directory, file:///path or s3://bucket/prefix")
+    parser.add_argument('--endpoint-url', help='S3-compatible endpoint (MinIO, R2, ...)')
+    parser.add_argument('--jobs', type=int, default=PUBLISH_JOBS, help='Concurrent transfers')
+    parser.add_argument('--dry-run', action='store_true', help='Only print what would change')
+    args = parser.parse_args(argv)
+
+    from generator import OUTPUT_DIR
+    source_dir = args.plan if os.path.isdir(args.plan) else os.path.join(OUTPUT_DIR, args.plan)
+    if args.style:
+        source_dir = os.path.join(source_dir, args.style)
+    if not os.path.isdir(source_dir):
+        print(f"Error: {source_dir} not found. Build the plan first.")
+        return 1
+
+    try:
+        backend = make_backend(args.target, endpoint_url=args.endpoint_url)
+    except RuntimeError as e:
+        print(f"Error: {e}")
+        return 1
+    try:
+        publish(source_dir, backend, jobs=args.jobs, dry_run=args.dry_run)
+    except (OSError, ValueError, *backend.errors) as e:
+        # The remote manifest is only written after every transfer, so a rerun retries the rest
+        print(f"Error: Publishing to {backend} failed ({e}).")
+        return 1
+    return 0
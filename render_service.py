@@ -0,0 +1,315 @@
+"""
+Long-lived LP render service for previews.
+
+Keeps the per-style Jinja environments (with compiled templates), the coupon
+renderer (fonts, decoded backgrounds), the font subsetter and the JS bundler
+warm across requests, and caches rendered pages by plan hash in a bounded LRU.
+
+    python render_service.py --port 8800
+
+    POST /render?style=manga[&name=preview][&assets=1][&base=1]   body: plan JSON
+        -> text/html (or application/zip of the page with assets=1)
+    GET  /pages/{key}/{style}/...   static files of a cached page (for previews)
+    GET  /health                    cache statistics
+    POST /flush                     drop every cached page
+"""
+import hashlib
+import io
+import json
+import os
+import re
+import shutil
+import threading
+import time
+import traceback
+import zipfile
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import generator
+from packager import STORED_EXTENSIONS
+
+WORK_DIR = '.cache/service'
+CACHE_SIZE = 64
+MAX_BODY_BYTES = 8 * 1024 * 1024
+# Page names become path components (images/generated/{name}) and download file names
+NAME_RE = re.compile(r'^[A-Za-z0-9_-]+$')
+
+CONTENT_TYPES = {
+    '.html': 'text/html; charset=utf-8',
+    '.css': 'text/css; charset=utf-8',
+    '.js': 'text/javascript; charset=utf-8',
+    '.png': 'image/png',
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.webp': 'image/webp',
+    '.gif': 'image/gif',
+    '.svg': 'image/svg+xml',
+    '.woff2': 'font/woff2',
+    '.mp4': 'video/mp4'
+}
+
+
+def available_styles():
+    """Style names: every template directory except the shared one."""
+    return sorted(d for d in os.listdir(generator.TEMPLATE_DIR)
+                  if d != 'common' and os.path.isdir(os.path.join(generator.TEMPLATE_DIR, d)))
+
+
+def plan_hash(plan, style, name):
+    payload = json.dumps([plan, style, name], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]
+
+
+class RenderService:
+    """Renders plans with warm process-wide state; thread-safe (renders are serialized)."""
+
+    def __init__(self, work_dir=WORK_DIR, cache_size=CACHE_SIZE, font_scope='page', jobs=1):
+        self.work_dir = work_dir
+        self.cache_size = max(1, cache_size)
+        self.pages = OrderedDict()  # key -> {'html', 'dir', 'style', 'ms'}
+        self.hits = 0
+        self.misses = 0
+        # Plans arrive per request; the build holds the warm styles, caches and pools
+        self.build = generator.Build(font_scope=font_scope, jobs=jobs, deps_path=None)
+        self._lock = threading.Lock()
+
+    def warm(self, styles=None):
+        """Compiles every style's templates and loads the coupon fonts and backgrounds up front."""
+        started = time.perf_counter()
+        for style in styles or available_styles():
+            try:
+                resolved = self.build.style(style)
+            except Exception as e:
+                print(f"Warning: Could not precompile {style}/index.html ({e}).")
+                continue
+            if resolved['css_error'] is not None:
+                print(f"Warning: Could not precompile {style}/css/style.css ({resolved['css_error']}).")
+
+        renderer = generator.get_coupon_renderer()
+        for template_id in renderer.palettes:
+            template_id, bg_path = renderer.resolve_template({'template': template_id})
+            if bg_path:
+                renderer.load_background(bg_path)
+        for element_type in ('amount', 'title', 'target', 'text'):
+            renderer.text.font(renderer.auto_style('gold', element_type)['size'])
+
+        generator.get_js_bundler()
+        generator.get_placeholder_cache()
+        print(f"Render service warm in {(time.perf_counter() - started) * 1000:.0f}ms")
+
+    def _evict(self):
+        while len(self.pages) > self.cache_size:
+            key, page = self.pages.popitem(last=False)
+            page_root = os.path.join(self.work_dir, key)
+            # Coupons cached from this page would point at deleted files
+            prefix = os.path.abspath(page_root) + os.sep
+            self.build.coupon_cache = {k: v for k, v in self.build.coupon_cache.items()
+                                       if not (isinstance(v, str) and os.path.abspath(v).startswith(prefix))}
+            self.build.writer.forget(page_root)
+            generator.get_placeholder_cache().forget(page_root)
+            shutil.rmtree(page_root, ignore_errors=True)
+        generator.get_placeholder_cache().save()
+
+    def render(self, plan, style='standard', name='preview'):
+        """Returns (key, page dict, cache hit?). Raises ValueError for unusable plans."""
+        if not isinstance(plan, dict):
+            raise ValueError("The plan must be a JSON object.")
+        if 'variants' in plan:
+            raise ValueError("Variant plans are not supported; send one expanded variant per request.")
+        if style not in available_styles():
+            raise ValueError(f"Unknown style: {style}")
+        if not NAME_RE.match(name or ''):
+            raise ValueError(f"Invalid name: {name!r} (letters, digits, '-' and '_' only)")
+
+        key = plan_hash(plan, style, name)
+        with self._lock:
+            if key in self.pages:
+                self.pages.move_to_end(key)
+                self.hits += 1
+                return key, self.pages[key], True
+
+            self.misses += 1
+            started = time.perf_counter()
+            target_dir = os.path.join(self.work_dir, key, style)
+            # static/ is served from the project instead of being copied per page
+            try:
+                page = self.build.render_plan(plan, name, style, target_dir, sync_static=False)
+            finally:
+                # Per-build bookkeeping would otherwise grow with every request
+                self.build.rendered.clear()
+                self.build.executors.image_jobs.clear()
+            if page is None:
+                raise ValueError(f"Rendering failed for style {style}.")
+            with open(page['html_path'], 'rb') as f:
+                html = f.read()
+            self.pages[key] = {'html': html, 'dir': target_dir, 'style': style,
+                               'ms': round((time.perf_counter() - started) * 1000, 1)}
+            self._evict()
+            return key, self.pages[key], False
+
+    def flush(self):
+        with self._lock:
+            self.pages.clear()
+            self.build.coupon_cache.clear()
+            self.build.writer.forget(self.work_dir)
+            generator.get_placeholder_cache().forget(self.work_dir)
+            generator.get_placeholder_cache().save()
+            shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def page_file(self, key, style, rel_path):
+        """
+        Resolves a file of a cached page: generated files from the page directory,
+        everything else from the project's static/. Paths escaping either are refused.
+        """
+        page = self.pages.get(key)
+        if page is None or page['style'] != style:
+            return None
+        candidates = [(page['dir'], rel_path)]
+        prefix = generator.STATIC_DIR + '/'
+        if rel_path.startswith(prefix):
+            candidates.append((generator.STATIC_DIR, rel_path[len(prefix):]))
+        for root, rel in candidates:
+            root = os.path.abspath(root)
+            path = os.path.abspath(os.path.join(root, rel))
+            if path.startswith(root + os.sep) and os.path.isfile(path):
+                return path
+        return None
+
+    def zip_page(self, page):
+        """The page as a zip: its generated files plus the project's static/ (page files win)."""
+        entries = {}
+        for base, top in ((generator.STATIC_DIR, generator.STATIC_DIR), (page['dir'], '')):
+            for root, dirs, files in os.walk(base):
+                rel_root = os.path.relpath(root, base).replace(os.sep, '/')
+                if top:
+                    # Source-only subtrees are bundled, not shipped
+                    dirs[:] = [d for d in dirs
+                               if os.path.normpath(os.path.join(rel_root, d)).replace(os.sep, '/')
+                               not in generator.SYNC_EXCLUDE]
+                for filename in files:
+                    path = os.path.join(root, filename)
+                    arcname = os.path.relpath(path, base).replace(os.sep, '/')
+                    entries[f"{top}/{arcname}" if top else arcname] = path
+
+        buf = io.BytesIO()
+        with zipfile.ZipFile(buf, 'w') as zf:
+            for arcname in sorted(entries):
+                ext = os.path.splitext(arcname)[1].lower()
+                compress = zipfile.ZIP_STORED if ext in STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+                zf.write(entries[arcname], arcname, compress_type=compress)
+        return buf.getvalue()
+
+    def stats(self):
+        return {'pages': len(self.pages), 'capacity': self.cache_size,
+                'hits': self.hits, 'misses': self.misses}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    service = None
+
+    def _send(self, status, body, content_type='application/json; charset=utf-8', headers=None):
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        elif isinstance(body, str):
+            body = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == '/health':
+            self._send(200, self.service.stats())
+            return
+        parts = url.path.lstrip('/').split('/', 3)
+        if len(parts) == 4 and parts[0] == 'pages':
+            path = self.service.page_file(parts[1], parts[2], parts[3])
+            if path:
+                with open(path, 'rb') as f:
+                    data = f.read()
+                ext = os.path.splitext(path)[1].lower()
+                self._send(200, data, CONTENT_TYPES.get(ext, 'application/octet-stream'))
+                return
+        self._send(404, {'error': 'not found'})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path == '/flush':
+            self.service.flush()
+            self._send(200, self.service.stats())
+            return
+        if url.path != '/render':
+            self._send(404, {'error': 'not found'})
+            return
+
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > MAX_BODY_BYTES:
+            self._send(413, {'error': 'plan too large'})
+            return
+        query = parse_qs(url.query)
+        style = query.get('style', ['standard'])[0]
+        name = query.get('name', ['preview'])[0]
+        try:
+            plan = json.loads(self.rfile.read(length) or b'null')
+            key, page, hit = self.service.render(plan, style, name)
+        except json.JSONDecodeError as e:
+            self._send(400, {'error': f"invalid JSON: {e}"})
+            return
+        except ValueError as e:
+            self._send(400, {'error': str(e)})
+            return
+        except Exception as e:
+            # Malformed plans can fail deep in rendering; answer instead of dropping the connection
+            print(f"Error: Rendering {name}/{style} failed:")
+            traceback.print_exc()
+            self._send(500, {'error': f"rendering failed: {type(e).__name__}: {e}"})
+            return
+
+        headers = {'X-Cache': 'hit' if hit else 'miss', 'X-Plan-Hash': key,
+                   'X-Render-Ms': str(page['ms']), 'X-Page-Base': f"/pages/{key}/{style}/"}
+        if query.get('assets', ['0'])[0] == '1':
+            headers['Content-Disposition'] = f'attachment; filename="{name}-{style}.zip"'
+            self._send(200, self.service.zip_page(page), 'application/zip', headers)
+            return
+        html = page['html']
+        if query.get('base', ['0'])[0] == '1':
+            # Lets a browser preview load the page's assets from /pages/...
+            html = generator.inject_head(html.decode('utf-8'), f'<base href="/pages/{key}/{style}/">')
+        self._send(200, html, 'text/html; charset=utf-8', headers)
+
+
+def serve(host='127.0.0.1', port=8800, cache_size=CACHE_SIZE, font_scope='page', jobs=1, warm=True):
+    service = RenderService(cache_size=cache_size, font_scope=font_scope, jobs=jobs)
+    if warm:
+        service.warm()
+    handler = type('Handler', (_Handler,), {'service': service})
+    server = ThreadingHTTPServer((host, port), handler)
+    print(f"Render service listening on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.build.close()
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description='LP render service')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8800)
+    parser.add_argument('--cache-size', type=int, default=CACHE_SIZE, help='Rendered pages kept in the LRU')
+    parser.add_argument('--font-scope', default='page', choices=['page', 'off'],
+                        help='Web-font subsetting for rendered pages')
+    parser.add_argument('--jobs', type=int, default=1, help='Parallel build workers per render')
+    parser.add_argument('--no-warm', action='store_true', help='Skip precompiling templates at start-up')
+    args = parser.parse_args()
+
+    serve(args.host, args.port, args.cache_size, args.font_scope, args.jobs, warm=not args.no_warm)
@@ -0,0 +1,18 @@
+// Scroll Animation (Fade-up)
+const observerOptions = {
+    root: null,
+    rootMargin: '0px',
+    threshold: 0.1
+};
+
+const observer = new IntersectionObserver((entries, observer) => {
+    entries.forEach(entry => {
+        if (entry.isIntersecting) {
+            entry.target.classList.add('visible');
+            observer.unobserve(entry.target); // Run once
+        }
+    });
+}, observerOptions);
+
+const animatedElements = document.querySelectorAll('.fade-up');
+animatedElements.forEach(el => observer.observe(el));
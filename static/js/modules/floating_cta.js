@@ -0,0 +1,38 @@
+// Floating CTA visibility
+// Shown once the page is scrolled past 500px. An IntersectionObserver watches a
+// 500px sentinel at the top of the document, so nothing runs on scroll.
+const floatingCta = document.getElementById('floating-cta');
+if (floatingCta) {
+    const threshold = 500;
+    let visible = null;
+    const setVisible = (state) => {
+        if (state !== visible) {
+            visible = state;
+            floatingCta.classList.toggle('visible', state);
+        }
+    };
+
+    if ('IntersectionObserver' in window) {
+        const sentinel = document.createElement('div');
+        sentinel.setAttribute('aria-hidden', 'true');
+        sentinel.style.cssText = `position:absolute;top:0;left:0;width:1px;height:${threshold}px;pointer-events:none;visibility:hidden;`;
+        document.body.prepend(sentinel);
+
+        const ctaObserver = new IntersectionObserver(entries => {
+            entries.forEach(entry => setVisible(!entry.isIntersecting));
+        });
+        ctaObserver.observe(sentinel);
+    } else {
+        // Fallback: rAF-throttled passive listener, class only touched on change
+        let ticking = false;
+        window.addEventListener('scroll', () => {
+            if (ticking) return;
+            ticking = true;
+            requestAnimationFrame(() => {
+                ticking = false;
+                setVisible(window.scrollY > threshold);
+            });
+        }, { passive: true });
+        setVisible(window.scrollY > threshold);
+    }
+}
@@ -0,0 +1,69 @@
+// Sticky Horizontal Scroll (Apple Style)
+// Geometry is read once (and again on resize/load), never during scroll.
+// Scroll events only schedule a single rAF that writes the transform, and the
+// active step is tracked by an IntersectionObserver instead of per-step rects.
+const stickyContainer = document.querySelector('.sticky-flow-container');
+const stickyTrack = document.querySelector('.sticky-flow-track');
+
+if (stickyContainer && stickyTrack) {
+    let start = 0;
+    let distance = 1;
+    let maxTranslate = 0;
+    let ticking = false;
+    let measurePending = false;
+
+    // Reads only: container position/height, track overflow
+    const measure = () => {
+        const rect = stickyContainer.getBoundingClientRect();
+        start = rect.top + window.scrollY;
+        distance = Math.max(stickyContainer.offsetHeight - window.innerHeight, 1);
+
+        // With padding-left: 50vw, the first item starts at center and the
+        // last item ends at center after scrolling this far.
+        maxTranslate = Math.max(stickyTrack.scrollWidth - window.innerWidth, 0);
+    };
+
+    // Writes only: progress comes from cached geometry + scrollY
+    const render = () => {
+        ticking = false;
+        let progress = (window.scrollY - start) / distance;
+        progress = Math.min(Math.max(progress, 0), 1); // Clamp between 0 and 1
+        stickyTrack.style.transform = `translate3d(-${progress * maxTranslate}px, 0, 0)`;
+    };
+
+    const onScroll = () => {
+        if (!ticking) {
+            ticking = true;
+            requestAnimationFrame(render);
+        }
+    };
+
+    const onResize = () => {
+        if (measurePending) return;
+        measurePending = true;
+        requestAnimationFrame(() => {
+            measurePending = false;
+            measure();
+            render();
+        });
+    };
+
+    // Active State: a step is active while it crosses the central 20% of the viewport
+    if ('IntersectionObserver' in window) {
+        const stepObserver = new IntersectionObserver(entries => {
+            entries.forEach(entry => {
+                entry.target.classList.toggle('is-active', entry.isIntersecting);
+            });
+        }, { rootMargin: '0px -40% 0px -40%' });
+        stickyTrack.querySelectorAll('.flow-step').forEach(step => stepObserver.observe(step));
+    }
+
+    window.addEventListener('scroll', onScroll, { passive: true });
+    window.addEventListener('resize', onResize, { passive: true });
+    // Images above the flow can shift its offset once they finish loading
+    window.addEventListener('load', onResize);
+
+    // Initial call
+    measure();
+    render();
+}
@@ -0,0 +1,22 @@
+// Video facade: swap the poster placeholder for the real <video> on first click
+document.querySelectorAll('.video-facade').forEach(facade => {
+    const play = () => {
+        const video = document.createElement('video');
+        video.controls = true;
+        video.autoplay = true;
+        video.playsInline = true;
+        video.preload = facade.dataset.preload || 'none';
+        if (facade.dataset.poster) {
+            video.poster = facade.dataset.poster;
+        }
+
+        const source = document.createElement('source');
+        source.src = facade.dataset.videoSrc;
+        source.type = 'video/mp4';
+        video.appendChild(source);
+
+        facade.replaceWith(video);
+        video.play().catch(() => {});
+    };
+    facade.addEventListener('click', play, { once: true });
+});
@@ -0,0 +1,198 @@
+import multiprocessing
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import image_memory
+
+
+def _warm_worker():
+    import PIL.Image  # noqa: F401
+
+
+class Executors:
+    """
+    Worker pools shared by every page of a build: threads for I/O-bound and
+    GIL-releasing tasks, processes for Pillow encoding. jobs=1 runs everything
+    inline in the calling thread (the old sequential behaviour).
+
+    image_memory_mb: decoded-image memory all image jobs may hold at once
+    (image_memory.MemoryBudget, shared with the worker processes). The peak
+    each job reserved is printed and collected in image_jobs.
+    """
+
+    def __init__(self, jobs=1, image_memory_mb=image_memory.MEMORY_BUDGET_MB):
+        self.jobs = max(1, jobs)
+        self._threads = None
+        self._processes = None
+        self.memory = image_memory.MemoryBudget(image_memory_mb * image_memory.MIB)
+        image_memory.install(self.memory)
+        self.image_jobs = []  # (job name, peak bytes)
+
+    def threads(self):
+        if self._threads is None:
+            self._threads = ThreadPoolExecutor(max_workers=self.jobs, thread_name_prefix='build')
+        return self._threads
+
+    def _image_pool(self):
+        if self._processes is None:
+            # spawn: forking a process that already runs threads is unsafe
+            self._processes = ProcessPoolExecutor(max_workers=self.jobs,
+                                                  mp_context=multiprocessing.get_context('spawn'),
+                                                  initializer=image_memory.install, initargs=(self.memory,))
+        return self._processes
+
+    def warm_images(self):
+        """Starts an image worker (and its Pillow import) in the background, ahead of the first image job."""
+        if self.jobs > 1:
+            self._image_pool().submit(_warm_worker)
+
+    def run_image(self, func, *args):
+        """
+        Runs an image job (a picklable top-level function) in the process pool
+        and waits for its result. Falls back to running it in-process.
+        """
+        if self.jobs <= 1:
+            result, peak = image_memory.run_tracked(func, *args)
+        else:
+            try:
+                result, peak = self._image_pool().submit(image_memory.run_tracked, func, *args).result()
+            except BrokenProcessPool as e:
+                print(f"Warning: Image worker pool failed ({e}); running in-process.")
+                self._processes = None
+                self.jobs = 1
+                result, peak = image_memory.run_tracked(func, *args)
+        self.image_jobs.append((func.__name__, peak))
+        print(f"Image job {func.__name__}: peak {peak / image_memory.MIB:.1f} MiB")
+        return result
+
+    def image_report(self):
+        """Summary of the image jobs run so far (None if there were none)."""
+        return image_memory.report(self.image_jobs, self.memory.limit)
+
+    def shutdown(self):
+        if self._threads is not None:
+            self._threads.shutdown()
+            self._threads = None
+        if self._processes is not None:
+            self._processes.shutdown()
+            self._processes = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+
+
+class Task:
+    """A build step. func receives the values of its inputs (in order) and returns its output(s)."""
+
+    def __init__(self, name, func, inputs=(), outputs=()):
+        self.name = name
+        self.func = func
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+        self.start = None
+        self.end = None
+
+    @property
+    def seconds(self):
+        return (self.end - self.start) if self.end is not None else 0.0
+
+
+class TaskGraph:
+    """
+    Tasks with declared inputs and outputs (artifact names), run as soon as
+    every input has been produced. Independent chains overlap on the thread
+    pool; the report shows which chain bounded the wall time.
+    """
+
+    def __init__(self, name=''):
+        self.name = name
+        self.tasks = []
+        self._producers = {}
+        self.wall = 0.0
+
+    def add(self, name, func, inputs=(), outputs=()):
+        task = Task(name, func, inputs, outputs)
+        for artifact in task.outputs:
+            if artifact in self._producers:
+                raise ValueError(f"Artifact {artifact!r} is produced by both {self._producers[artifact].name} and {name}")
+            self._producers[artifact] = task
+        self.tasks.append(task)
+        return task
+
+    def _deps(self, task):
+        deps = []
+        for artifact in task.inputs:
+            if artifact not in self._producers:
+                raise ValueError(f"Task {task.name} needs {artifact!r}, which no task produces")
+            deps.append(self._producers[artifact])
+        return deps
+
+    def _execute(self, task, values):
+        task.start = time.perf_counter()
+        try:
+            result = task.func(*(values[a] for a in task.inputs))
+        finally:
+            task.end = time.perf_counter()
+        if len(task.outputs) == 1:
+            return {task.outputs[0]: result}
+        if not task.outputs:
+            return {}
+        return dict(zip(task.outputs, result))
+
+    def run(self, executors=None):
+        """Runs every task; returns the produced artifacts. The first task error is re-raised."""
+        values = {}
+        pending = {task: set(self._deps(task)) for task in self.tasks}
+        started = time.perf_counter()
+
+        if executors is None or executors.jobs <= 1:
+            # Sequential: declaration order, which must already respect dependencies
+            for task in self.tasks:
+                if any(dep.end is None for dep in pending[task]):
+                    raise ValueError(f"Task {task.name} is declared before its inputs")
+                values.update(self._execute(task, values))
+        else:
+            pool = executors.threads()
+            done = set()
+            running = {}
+            try:
+                while pending or running:
+                    for task in [t for t, deps in pending.items() if deps <= done]:
+                        del pending[task]
+                        running[pool.submit(self._execute, task, dict(values))] = task
+                    if not running:
+                        raise ValueError(f"Dependency cycle among: {', '.join(t.name for t in pending)}")
+                    finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        task = running.pop(future)
+                        values.update(future.result())
+                        done.add(task)
+            except BaseException:
+                for future in running:
+                    future.cancel()
+                wait(running)
+                raise
+
+        self.wall = time.perf_counter() - started
+        return values
+
+    def critical_path(self):
+        """Returns the chain of tasks with the longest summed duration (ends at the last task to matter)."""
+        best = {}
+        for task in self.tasks:  # declaration order is a topological order
+            prev = max((best[dep] for dep in self._deps(task)), key=lambda chain: chain[0], default=(0.0, []))
+            best[task] = (prev[0] + task.seconds, prev[1] + [task])
+        return max(best.values(), key=lambda chain: chain[0], default=(0.0, []))[1]
+
+    def report(self):
+        """One-line critical-path summary: path, its length, wall time and total task time."""
+        path = self.critical_path()
+        length = sum(t.seconds for t in path)
+        work = sum(t.seconds for t in self.tasks)
+        chain = ' -> '.join(f"{t.name} {t.seconds * 1000:.0f}ms" for t in path)
+        return (f"Critical path{f' ({self.name})' if self.name else ''}: {chain} = {length * 1000:.0f}ms "
+                f"(wall {self.wall * 1000:.0f}ms, total work {work * 1000:.0f}ms)")
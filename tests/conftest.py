@@ -0,0 +1,11 @@
+import os
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(autouse=True)
+def repo_cwd(monkeypatch):
+    """The generator resolves templates/, static/ and assets/ relative to the working directory."""
+    monkeypatch.chdir(ROOT)
@@ -0,0 +1,40 @@
+from asset_sync import AssetSync
+
+GENERATED = ['js/bundle.*.js', 'images/generated/*']
+
+
+def _write(root, rel, text='x'):
+    path = root / rel
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+
+
+def _files(root):
+    return sorted(str(p.relative_to(root)) for p in root.rglob('*') if p.is_file())
+
+
+def test_first_sync_removes_leftovers_but_keeps_generated_files(tmp_path):
+    src, dst = tmp_path / 'src', tmp_path / 'dst'
+    _write(src, 'css/destyle.css')
+    for rel in ('css/destyle.css', 'js/main.js', 'js/bundle.0123456789.js', 'images/generated/plan/coupon.png'):
+        _write(dst, rel)
+
+    actions = AssetSync(str(src), str(dst), manifest_dir=str(tmp_path / 'manifests'), generated=GENERATED).run()
+
+    assert actions['remove'] == ['js/main.js']
+    assert _files(dst) == ['css/destyle.css', 'images/generated/plan/coupon.png', 'js/bundle.0123456789.js']
+
+
+def test_later_syncs_remove_only_files_they_synced(tmp_path):
+    src, dst = tmp_path / 'src', tmp_path / 'dst'
+    _write(src, 'css/destyle.css')
+    _write(src, 'js/old.js')
+    sync = AssetSync(str(src), str(dst), manifest_dir=str(tmp_path / 'manifests'), generated=GENERATED)
+    sync.run()
+
+    (src / 'js' / 'old.js').unlink()
+    _write(dst, 'js/bundle.0123456789.js')
+    actions = sync.run()
+
+    assert actions['remove'] == ['js/old.js']
+    assert _files(dst) == ['css/destyle.css', 'js/bundle.0123456789.js']
@@ -0,0 +1,41 @@
+import os
+
+import pytest
+from PIL import Image
+
+from comic_baker import bake_comic
+
+DEJAVU = '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+
+
+def _comic(tmp_path, text):
+    frame = tmp_path / 'frame.png'
+    Image.new('RGB', (320, 240), 'white').save(frame)
+    return {
+        'bake': 'frames',
+        'frames': [{'image_url': str(frame), 'bubbles': [{'text': text, 'x': 0.5, 'y': 0.3}]}]
+    }
+
+
+def test_missing_font_keeps_html_bubbles(tmp_path):
+    out = tmp_path / 'out'
+    baked = bake_comic(_comic(tmp_path, 'こんにちは'), str(out), 'static/images/generated/t',
+                       font_path=str(tmp_path / 'missing.otf'))
+    assert baked is None
+    assert not out.exists()
+
+
+@pytest.mark.skipif(not os.path.isfile(DEJAVU), reason='DejaVu Sans not installed')
+def test_font_without_the_glyphs_keeps_html_bubbles(tmp_path):
+    baked = bake_comic(_comic(tmp_path, 'こんにちは'), str(tmp_path / 'out'), 'static/images/generated/t',
+                       font_path=DEJAVU)
+    assert baked is None
+
+
+@pytest.mark.skipif(not os.path.isfile(DEJAVU), reason='DejaVu Sans not installed')
+def test_font_with_the_glyphs_bakes(tmp_path):
+    out = tmp_path / 'out'
+    baked = bake_comic(_comic(tmp_path, 'Hello'), str(out), 'static/images/generated/t', font_path=DEJAVU)
+    assert baked['mode'] == 'frames'
+    assert len(baked['frames']) == 1
+    assert os.path.isfile(out / os.path.basename(baked['frames'][0]))
@@ -0,0 +1,69 @@
+import os
+import re
+
+from PIL import Image
+
+import generator
+
+
+def _plan(icon_path):
+    coupon = {
+        'mode': 'svg',
+        'template': 'pink',
+        'shape': 'ticket',
+        'elements': {
+            'amount': {'text': '3,000', 'y': 0.45},
+            'icon': {'type': 'image', 'path': icon_path, 'width': 40, 'height': 40, 'y': 10}
+        }
+    }
+    return {
+        'coupon': coupon,
+        'campaign': {'title': 'top'},
+        'sections': [{'type': 'campaign_box', 'data': {'title': 'box'}}]
+    }
+
+
+def _icon(tmp_path):
+    path = tmp_path / 'icon_time.png'
+    Image.new('RGBA', (8, 8), (255, 0, 0, 255)).save(path)
+    return str(path)
+
+
+def test_cache_hit_copies_overlays_into_every_page(tmp_path):
+    icon = _icon(tmp_path)
+    cache = {}
+    dirs = [tmp_path / 'a' / 'static', tmp_path / 'b' / 'static']
+    for static_dir in dirs:
+        generator.generate_coupon_svg(_plan(icon), str(static_dir), cache)
+
+    assert len(cache) == 1
+    listings = [sorted(os.listdir(static_dir / 'images' / 'coupon')) for static_dir in dirs]
+    assert listings[0] == listings[1]
+    overlays = [name for name in listings[1] if name.startswith('icon_time.')]
+    assert len(overlays) == 1
+    assert re.fullmatch(r'icon_time\.[0-9a-f]{10}\.png', overlays[0])
+
+
+def test_overlays_with_the_same_name_do_not_collide(tmp_path):
+    cache = {}
+    static_dir = tmp_path / 'page' / 'static'
+    for color, sub in (((255, 0, 0, 255), 'red'), ((0, 0, 255, 255), 'blue')):
+        os.makedirs(tmp_path / sub)
+        path = tmp_path / sub / 'icon_time.png'
+        Image.new('RGBA', (8, 8), color).save(path)
+        generator.generate_coupon_svg(_plan(str(path)), str(static_dir), cache)
+
+    names = [name for name in os.listdir(static_dir / 'images' / 'coupon') if name.startswith('icon_time.')]
+    assert len(names) == 2
+
+
+def test_inlined_copies_get_unique_mask_ids(tmp_path):
+    data = _plan(_icon(tmp_path))
+    generator.generate_coupon_svg(data, str(tmp_path / 'static'), {})
+
+    copies = [str(data['campaign']['coupon_svg']), str(data['sections'][0]['data']['coupon_svg'])]
+    ids = [set(re.findall(r'id="([^"]+)"', svg)) for svg in copies]
+    assert all(ids)
+    assert not ids[0] & ids[1]
+    for svg, own in zip(copies, ids):
+        assert set(re.findall(r'url\(#([^)]+)\)', svg)) <= own
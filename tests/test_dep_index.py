@@ -0,0 +1,27 @@
+import os
+
+from dep_index import DependencyIndex, affected, load_index
+
+
+def test_source_assets_map_back_to_their_pages(tmp_path):
+    pages = {}
+    for name in ('slider', 'plain'):
+        page = tmp_path / name / 'index.html'
+        page.parent.mkdir()
+        page.write_text('<html></html>', encoding='utf-8')
+        pages[name] = str(page)
+
+    index = DependencyIndex(str(tmp_path / 'deps.json'))
+    index.record(pages['slider'], 'a', 'manga', {'index.html': 'templates/manga/index.html'}, ['slider'],
+                 ['static/js/modules/swiper.js', 'static/css/destyle.css', 'assets/templates/coupon/pink.png'])
+    index.record(pages['plain'], 'b', 'standard', {'index.html': 'templates/standard/index.html'}, ['hero'],
+                 ['static/css/destyle.css'])
+    index.save()
+    saved = load_index(str(tmp_path / 'deps.json'))
+
+    slider, plain = os.path.relpath(pages['slider']), os.path.relpath(pages['plain'])
+    assert affected(saved, 'static/js/modules/swiper.js') == [slider]
+    assert affected(saved, 'assets/templates/coupon/pink.png') == [slider]
+    assert affected(saved, 'static/css/destyle.css') == sorted([slider, plain])
+    assert affected(saved, 'static/js/modules/fade_up.js') == []
+    assert affected(saved, 'templates/standard/index.html') == [plain]
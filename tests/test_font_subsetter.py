@@ -0,0 +1,20 @@
+from font_subsetter import FontSubsetter
+
+
+def _face(tmp_path, name, weight):
+    path = tmp_path / name
+    path.write_bytes(b'')
+    return {'family': 'Noto Sans JP', 'path': str(path), 'weight': weight, 'style': 'normal'}
+
+
+def test_bold_only_family_is_not_self_hosted(tmp_path, capsys):
+    subsetter = FontSubsetter(fonts=[_face(tmp_path, 'Bold.otf', 700)], cache_dir=str(tmp_path / 'cache'))
+    assert subsetter.fonts == []
+    assert not subsetter.available()
+    assert 'No regular face of Noto Sans JP' in capsys.readouterr().out
+
+
+def test_family_with_a_regular_face_keeps_every_face(tmp_path):
+    faces = [_face(tmp_path, 'Regular.otf', 400), _face(tmp_path, 'Bold.otf', 700)]
+    subsetter = FontSubsetter(fonts=faces, cache_dir=str(tmp_path / 'cache'))
+    assert subsetter.fonts == faces
@@ -0,0 +1,41 @@
+import pytest
+from PIL import Image
+
+import image_memory
+from image_memory import MIB, MemoryBudget, image_bytes, load_fitted, run_tracked
+
+
+@pytest.fixture
+def budget(monkeypatch):
+    budget = MemoryBudget(1024 * MIB)
+    monkeypatch.setattr(image_memory, '_budget', budget)
+    return budget
+
+
+def _fit_and_measure(path, size, seen):
+    with load_fitted(path, size, 'RGB') as img:
+        seen.append((img.size, image_memory.get_budget()._used.value))
+    return image_memory.get_budget()._used.value
+
+
+def test_fitted_image_stays_reserved_until_the_block_ends(budget, tmp_path):
+    path = tmp_path / 'big.png'
+    Image.new('RGB', (6000, 4000), 'red').save(path)
+    seen = []
+
+    after, peak = run_tracked(_fit_and_measure, str(path), (800, 533), seen)
+
+    assert seen == [((800, 533), image_bytes((800, 533), 'RGB'))]
+    assert after == 0
+    # Source, its reduce(3) copy and the output were reserved while fitting
+    assert peak == (image_bytes((6000, 4000), 'RGB') + image_bytes((2000, 1334), 'RGB')
+                    + image_bytes((800, 533), 'RGB'))
+
+
+def test_reservations_are_returned_on_errors(budget, tmp_path):
+    path = tmp_path / 'small.png'
+    Image.new('RGB', (64, 64)).save(path)
+    with pytest.raises(RuntimeError):
+        with load_fitted(str(path), (32, 32), 'RGBA'):
+            raise RuntimeError
+    assert budget._used.value == 0
@@ -0,0 +1,101 @@
+import os
+
+import output_writer
+from output_writer import OutputWriter
+
+
+def _writer(tmp_path, **kwargs):
+    return OutputWriter(manifest_path=str(tmp_path / 'outputs.json'), **kwargs)
+
+
+def _age(path, seconds=100):
+    # Back-date the file so a rewrite would show up as a newer mtime
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns - seconds * 10 ** 9))
+    return os.stat(path).st_mtime_ns
+
+
+def test_unchanged_content_is_not_rewritten(tmp_path):
+    path = str(tmp_path / 'index.html')
+    writer = _writer(tmp_path)
+    assert writer.write(path, '<html>あ</html>')
+    mtime = _age(path)
+
+    assert not writer.write(path, '<html>あ</html>')
+    assert not writer.write(path, '<html>あ</html>'.encode('utf-8'))
+    assert os.stat(path).st_mtime_ns == mtime
+    assert (writer.written, writer.unchanged) == (1, 2)
+    assert writer.report() == 'Output: 1 written, 2 unchanged.'
+
+
+def test_same_size_changes_are_written(tmp_path):
+    path = str(tmp_path / 'style.css')
+    writer = _writer(tmp_path)
+    writer.write(path, 'a{color:red}')
+    assert writer.write(path, 'a{color:tan}')
+    with open(path, encoding='utf-8') as f:
+        assert f.read() == 'a{color:tan}'
+    assert not [name for name in os.listdir(tmp_path) if name.endswith('.tmp')]
+
+
+def test_the_saved_manifest_spares_rereading_unchanged_files(tmp_path, monkeypatch):
+    path = str(tmp_path / 'index.html')
+    first = _writer(tmp_path)
+    first.write(path, 'page')
+    first.save()
+
+    def unexpected_read(path):
+        raise AssertionError(f"{path} was re-read")
+
+    monkeypatch.setattr(output_writer, '_file_digest', unexpected_read)
+    assert not _writer(tmp_path).write(path, 'page')
+
+
+def test_files_edited_behind_the_manifest_are_rehashed(tmp_path):
+    path = str(tmp_path / 'index.html')
+    writer = _writer(tmp_path)
+    writer.write(path, 'page')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('edit')
+    _age(path)
+
+    assert writer.write(path, 'page')
+    with open(path, encoding='utf-8') as f:
+        assert f.read() == 'page'
+
+
+def test_replace_drops_identical_temp_files(tmp_path):
+    path = str(tmp_path / 'coupon.png')
+    writer = _writer(tmp_path)
+    writer.write(path, b'\x89PNG data')
+    mtime = _age(path)
+
+    tmp = str(tmp_path / '.coupon.tmp.png')
+    with open(tmp, 'wb') as f:
+        f.write(b'\x89PNG data')
+    assert not writer.replace(tmp, path)
+    assert not os.path.exists(tmp)
+    assert os.stat(path).st_mtime_ns == mtime
+
+
+def test_epoch_stamps_written_and_unchanged_files(tmp_path):
+    path = str(tmp_path / 'index.html')
+    writer = _writer(tmp_path, epoch=315532800)
+    writer.write(path, 'page')
+    assert os.stat(path).st_mtime == 315532800
+    os.utime(path, (1000000000, 1000000000))
+    assert not writer.write(path, 'page')
+    assert os.stat(path).st_mtime == 315532800
+
+
+def test_forgotten_and_deleted_files_leave_the_manifest(tmp_path):
+    writer = _writer(tmp_path)
+    kept, preview, deleted = (str(tmp_path / name) for name in ('kept.html', 'preview/index.html', 'gone.html'))
+    os.makedirs(tmp_path / 'preview')
+    for path in (kept, preview, deleted):
+        writer.write(path, 'page')
+    writer.forget(str(tmp_path / 'preview'))
+    os.remove(deleted)
+    writer.save()
+
+    assert list(_writer(tmp_path).files) == [os.path.abspath(kept)]
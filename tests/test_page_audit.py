@@ -0,0 +1,37 @@
+import page_audit
+
+
+def _page(tmp_path, body):
+    (tmp_path / 'static').mkdir(parents=True)
+    (tmp_path / 'static' / 'poster.jpg').write_bytes(b'p' * 2000)
+    (tmp_path / 'static' / 'clip.mp4').write_bytes(b'v' * 50000)
+    (tmp_path / 'static' / 'loop.mp4').write_bytes(b'l' * 30000)
+    page = tmp_path / 'index.html'
+    page.write_text(f"<html><head></head><body>{body}</body></html>", encoding='utf-8')
+    return str(page)
+
+
+def test_play_on_tap_video_is_reported_as_deferred_media(tmp_path):
+    page = _page(tmp_path, """
+        <div class="video-facade" data-poster="static/poster.jpg" data-video-src="static/clip.mp4">
+          <img src="static/poster.jpg" width="640" height="360">
+        </div>
+        <video preload="none"><source src="static/loop.mp4" type="video/mp4"></video>""")
+    result = page_audit.analyse_page(page, dict(page_audit.DEFAULT_BUDGET, max_transfer_bytes=40000))
+
+    assert result['requests_by_type'] == {'document': 1, 'image': 1}
+    assert 'media' not in result['transfer_by_type']
+    assert result['deferred_media_requests'] == 2
+    assert result['deferred_media_bytes'] == 80000
+    assert result['violations'] == []
+
+
+def test_preloaded_video_counts_toward_the_transfer(tmp_path):
+    page = _page(tmp_path, '<video autoplay muted><source src="static/loop.mp4"></video>')
+    result = page_audit.analyse_page(page, page_audit.DEFAULT_BUDGET)
+
+    assert result['transfer_by_type']['media'] == 30000
+    assert result['deferred_media_bytes'] == 0
+    # The packager still ships deferred files
+    facade = _page(tmp_path / 'facade', '<div data-video-src="static/clip.mp4"></div>')
+    assert page_audit.local_files(facade) == [str(tmp_path / 'facade' / 'static' / 'clip.mp4')]
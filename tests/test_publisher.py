@@ -0,0 +1,62 @@
+import json
+
+import publisher
+from publisher import LocalBackend, publish
+
+
+def _write(root, rel, text='x'):
+    path = root / rel
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+
+
+def _page(root):
+    _write(root, 'index.html', '<html><head><link rel="stylesheet" href="static/css/style.css"></head>'
+                               '<body><script src="static/js/bundle.new.js" defer></script></body></html>')
+    _write(root, 'static/css/style.css', 'body{}')
+    _write(root, 'static/js/bundle.new.js', 'new')
+    # Leftovers of earlier builds: never referenced by the page
+    _write(root, 'static/js/main.js', 'old')
+    _write(root, 'static/js/bundle.old.js', 'old')
+
+
+def test_only_referenced_files_are_published(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    page, remote = tmp_path / 'page', tmp_path / 'remote'
+    _page(page)
+    _write(remote, 'static/js/main.js', 'old')
+    _write(remote, publisher.MANIFEST_NAME, json.dumps({'static/js/main.js': 'stale'}))
+
+    actions = publish(str(page), LocalBackend(str(remote)))
+
+    assert actions['upload_assets'] == ['static/css/style.css', 'static/js/bundle.new.js']
+    assert actions['upload_pages'] == ['index.html']
+    assert actions['delete'] == ['static/js/main.js']
+    assert not (remote / 'static' / 'js' / 'main.js').exists()
+    assert not (remote / 'static' / 'js' / 'bundle.old.js').exists()
+
+
+def test_plan_directories_publish_every_page_and_the_variant_manifest(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    plan = tmp_path / 'plan'
+    _page(plan / 'v1' / 'standard')
+    _page(plan / 'v2' / 'manga')
+    _write(plan, 'variants.json', '{}')
+
+    files = publisher.published_files(str(plan))
+
+    assert 'variants.json' in files
+    assert 'v1/standard/index.html' in files and 'v2/manga/static/js/bundle.new.js' in files
+    assert not any(rel.endswith('main.js') for rel in files)
+
+
+def test_backend_failures_are_reported(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    _page(tmp_path / 'page')
+    # A file where the destination directory should be
+    (tmp_path / 'blocked').write_text('')
+
+    code = publisher.main([str(tmp_path / 'page'), '--to', str(tmp_path / 'blocked' / 'site')])
+
+    assert code == 1
+    assert 'Error: Publishing to' in capsys.readouterr().out
@@ -0,0 +1,79 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+import render_service
+
+
+@pytest.fixture
+def service(tmp_path):
+    service = render_service.RenderService(work_dir=str(tmp_path / 'service'))
+    handler = type('Handler', (render_service._Handler,), {'service': service})
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    service.url = f"http://127.0.0.1:{server.server_port}"
+    yield service
+    server.shutdown()
+    server.server_close()
+    service.build.close()
+
+
+def _post(url, body):
+    request = urllib.request.Request(url, data=body, method='POST')
+    try:
+        with urllib.request.urlopen(request, timeout=30) as response:
+            return response.status, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read()
+
+
+def test_render_errors_answer_with_json_500(service, monkeypatch):
+    def broken(*args, **kwargs):
+        service.build.rendered.append('partial')
+        raise TypeError('boom')
+
+    monkeypatch.setattr(service.build, 'render_plan', broken)
+    status, body = _post(f"{service.url}/render?style=standard", json.dumps({'sections': []}).encode())
+
+    assert status == 500
+    assert json.loads(body) == {'error': 'rendering failed: TypeError: boom'}
+    # Per-request bookkeeping is dropped even when rendering fails
+    assert service.build.rendered == []
+    with urllib.request.urlopen(f"{service.url}/health", timeout=30) as response:
+        assert json.loads(response.read())['misses'] == 1
+
+
+def test_invalid_json_is_a_client_error(service):
+    status, body = _post(f"{service.url}/render", b'{not json')
+    assert status == 400
+    assert json.loads(body)['error'].startswith('invalid JSON')
+
+
+def test_names_that_are_not_plain_identifiers_are_refused(service, tmp_path):
+    name = '../../../../../../../../../../tmp/evil'
+    status, body = _post(f"{service.url}/render?style=standard&name={name}", json.dumps({'sections': []}).encode())
+    assert status == 400
+    assert 'Invalid name' in json.loads(body)['error']
+    assert service.build.rendered == []
+
+
+def test_evicted_pages_leave_the_placeholder_cache(tmp_path):
+    from PIL import Image
+    from image_placeholders import PlaceholderCache
+
+    cache = PlaceholderCache(cache_path=str(tmp_path / 'placeholders.json'))
+    kept, dropped = tmp_path / 'kept.png', tmp_path / 'page' / 'coupon.png'
+    dropped.parent.mkdir()
+    Image.new('RGB', (40, 20), 'red').save(kept)
+    Image.new('RGB', (40, 20), 'blue').save(dropped)
+    cache.get(str(kept))
+    cache.get(str(dropped))
+
+    cache.forget(str(tmp_path / 'page'))
+    assert list(cache.stat_index) == [str(kept)]
+    assert len(cache.entries) == 1
@@ -0,0 +1,99 @@
+import threading
+
+import pytest
+
+from task_graph import Executors, TaskGraph
+
+
+@pytest.fixture
+def executors():
+    with Executors(jobs=4) as executors:
+        yield executors
+
+
+def _diamond(log):
+    def step(name, result):
+        def run(*inputs):
+            log.append(name)
+            return result(*inputs)
+        return run
+
+    graph = TaskGraph('diamond')
+    graph.add('load', step('load', lambda: 2), outputs=['n'])
+    graph.add('double', step('double', lambda n: n * 2), inputs=['n'], outputs=['doubled'])
+    graph.add('square', step('square', lambda n: n * n), inputs=['n'], outputs=['squared'])
+    graph.add('sum', step('sum', lambda a, b: a + b), inputs=['doubled', 'squared'], outputs=['total'])
+    return graph
+
+
+@pytest.mark.parametrize('parallel', [False, True])
+def test_tasks_run_after_their_inputs(parallel, executors):
+    log = []
+    graph = _diamond(log)
+    values = graph.run(executors if parallel else None)
+
+    assert values == {'n': 2, 'doubled': 4, 'squared': 4, 'total': 8}
+    assert log[0] == 'load' and log[-1] == 'sum'
+    tasks = {task.name: task for task in graph.tasks}
+    for task in graph.tasks:
+        for dep in graph._deps(task):
+            assert dep.end <= task.start, (dep.name, task.name)
+    assert [t.name for t in graph.critical_path()][0] == 'load'
+    assert tasks['sum'] in graph.critical_path()
+
+
+def test_independent_tasks_overlap(executors):
+    both_running = threading.Barrier(2, timeout=10)
+    graph = TaskGraph()
+    # Each waits for the other: only passes when the two run at the same time
+    graph.add('css', both_running.wait, outputs=['css'])
+    graph.add('sync', both_running.wait, outputs=['synced'])
+    graph.add('write', lambda css, synced: 'done', inputs=['css', 'synced'], outputs=['written'])
+    assert graph.run(executors)['written'] == 'done'
+
+
+def test_multiple_outputs_are_unpacked():
+    graph = TaskGraph()
+    graph.add('fonts', lambda: ('<html>', {65}), outputs=['html', 'codepoints'])
+    graph.add('write', lambda html: None, inputs=['html'])
+    assert graph.run() == {'html': '<html>', 'codepoints': {65}}
+
+
+def _cycle():
+    graph = TaskGraph()
+    graph.add('start', lambda: 1, outputs=['seed'])
+    graph.add('a', lambda seed, b: 1, inputs=['seed', 'b'], outputs=['a'])
+    graph.add('b', lambda a: 1, inputs=['a'], outputs=['b'])
+    return graph
+
+
+def test_cycles_are_reported(executors):
+    with pytest.raises(ValueError, match='Dependency cycle among: a, b'):
+        _cycle().run(executors)
+    # Sequential runs need declaration order, which a cycle cannot have
+    with pytest.raises(ValueError, match='declared before its inputs'):
+        _cycle().run()
+
+
+def test_graph_errors_are_raised_up_front():
+    graph = TaskGraph()
+    graph.add('coupon', lambda: None, outputs=['coupon'])
+    with pytest.raises(ValueError, match='produced by both'):
+        graph.add('other', lambda: None, outputs=['coupon'])
+    graph.add('videos', lambda coupon, comics: None, inputs=['coupon', 'comics'])
+    with pytest.raises(ValueError, match="needs 'comics'"):
+        graph.run()
+
+
+def test_the_first_error_stops_dependent_tasks(executors):
+    ran = []
+    graph = TaskGraph()
+
+    def broken():
+        raise RuntimeError('render failed')
+
+    graph.add('render', broken, outputs=['html'])
+    graph.add('write', lambda html: ran.append(html), inputs=['html'])
+    with pytest.raises(RuntimeError, match='render failed'):
+        graph.run(executors)
+    assert ran == []
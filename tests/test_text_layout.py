@@ -0,0 +1,67 @@
+import os
+
+import pytest
+from PIL import Image, ImageDraw, ImageFont
+
+from text_layout import GlyphMetrics, TextMeasurer
+
+DEJAVU = '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+
+KERNING = ['AV', 'To', 'WAVE', 'Yo. LT', 'P.A.', '3,000円OFF']
+COMBINING = ['e\u0301', 'Cafe\u0301', 'n\u0303o\u0308', 'A\u030aV']
+
+
+def _textbbox(text, font):
+    return tuple(ImageDraw.Draw(Image.new('RGBA', (1, 1))).textbbox((0, 0), text, font=font))
+
+
+def _basic(size):
+    return ImageFont.truetype(DEJAVU, size, layout_engine=ImageFont.Layout.BASIC)
+
+
+pytestmark = pytest.mark.skipif(not os.path.isfile(DEJAVU), reason='DejaVu Sans not installed')
+
+
+def test_the_font_has_kerning_pairs():
+    # Otherwise the kerning cases below would not exercise GlyphMetrics.kern
+    assert GlyphMetrics(_basic(40)).kern('A', 'V') < 0
+
+
+@pytest.mark.parametrize('text', KERNING)
+@pytest.mark.parametrize('size', [11, 24, 40, 72])
+def test_kerning_pairs_match_textbbox(text, size):
+    font = _basic(size)
+    assert TextMeasurer(DEJAVU).bbox(text, font) == _textbbox(text, font)
+
+
+def test_half_pixel_edges_match_textbbox():
+    # Quarter-point sizes move glyph edges across pixel boundaries, some onto exact halves
+    measurer = TextMeasurer(DEJAVU)
+    half_pixel = 0
+    for quarters in range(600, 800):
+        font = _basic(quarters / 4)
+        metrics = GlyphMetrics(font)
+        for text in ('To', 'AV', 'Wo'):
+            half_pixel += metrics.text_bbox(text) is None
+            assert measurer.bbox(text, font) == _textbbox(text, font), (text, quarters / 4)
+    assert half_pixel
+
+
+@pytest.mark.parametrize('text', COMBINING)
+def test_combining_marks_match_textbbox(text):
+    font = _basic(32)
+    assert TextMeasurer(DEJAVU).bbox(text, font) == _textbbox(text, font)
+
+
+def test_default_font_fallback_matches_textbbox(tmp_path):
+    measurer = TextMeasurer(str(tmp_path / 'missing.otf'))
+    font = measurer.font(20)
+    for text in KERNING + COMBINING:
+        assert measurer.bbox(text, font) == _textbbox(text, font)
+
+
+def test_memoized_results_are_per_font():
+    measurer = TextMeasurer(DEJAVU)
+    small, large = _basic(12), _basic(48)
+    assert measurer.bbox('AV', small) == _textbbox('AV', small)
+    assert measurer.bbox('AV', large) == _textbbox('AV', large)
@@ -0,0 +1,83 @@
+import os
+
+import pytest
+
+import generator
+from generator import apply_overrides, iter_variants
+
+
+def _plan():
+    return {
+        'hero': {'title': 'base'},
+        'sections': [
+            {'type': 'hero', 'data': {'title': 'first'}},
+            {'type': 'faq', 'data': {'items': ['q1']}}
+        ]
+    }
+
+
+def test_apply_overrides_copies_only_the_overridden_path():
+    base = _plan()
+    result = apply_overrides(base, {'/sections/0/data/title': 'changed', '/sections/1/data/items/-': 'q2'})
+
+    assert base == _plan()
+    assert result['sections'][0]['data']['title'] == 'changed'
+    assert result['sections'][1]['data']['items'] == ['q1', 'q2']
+    assert result['sections'] is not base['sections']
+    assert result['sections'][0] is not base['sections'][0]
+    # Untouched containers stay shared with the base plan
+    assert result['hero'] is base['hero']
+
+
+def test_apply_overrides_shares_everything_off_the_path():
+    base = _plan()
+    result = apply_overrides(base, {'/hero/title': 'changed'})
+
+    assert base['hero']['title'] == 'base'
+    assert result['sections'] is base['sections']
+
+
+def test_apply_overrides_rejects_bad_pointers():
+    with pytest.raises(ValueError):
+        apply_overrides(_plan(), {'hero/title': 'x'})
+    with pytest.raises(ValueError):
+        apply_overrides(_plan(), {'': {}})
+
+
+def test_matrix_expands_to_the_cartesian_product():
+    variants = {'matrix': {'/hero/title': ['A', 'B'], 'style': ['standard', 'manga']}}
+    expanded = list(iter_variants(variants, 'standard'))
+
+    assert [(vid, style) for vid, style, _ in expanded] == [
+        ('v1', 'standard'), ('v2', 'manga'), ('v3', 'standard'), ('v4', 'manga')]
+    assert [overrides for _, _, overrides in expanded] == [
+        {'/hero/title': 'A'}, {'/hero/title': 'A'}, {'/hero/title': 'B'}, {'/hero/title': 'B'}]
+
+
+def test_matrix_ids_are_zero_padded_and_items_follow():
+    variants = {'matrix': {'/hero/title': [str(i) for i in range(10)]},
+                'items': [{'id': 'spring', 'style': 'manga'}, {}]}
+    ids = [vid for vid, _, _ in iter_variants(variants, 'standard')]
+    assert ids[:2] == ['v01', 'v02']
+    assert ids[-3:] == ['v10', 'spring', 'item2']
+
+
+@pytest.mark.parametrize('items', [
+    [{'id': 'spring'}, {'id': 'spring'}],
+    [{'id': 'v1'}],
+    [{'id': '../escape'}],
+    [{'id': 'item2'}, {}],
+    [{'id': 7}]
+])
+def test_unusable_item_ids_are_refused(items):
+    with pytest.raises(ValueError):
+        iter_variants({'matrix': {'/hero/title': ['A']}, 'items': items}, 'standard')
+
+
+def test_generate_variants_builds_nothing_for_unusable_ids(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(generator, 'OUTPUT_DIR', str(tmp_path))
+    plan = dict(_plan(), variants={'items': [{'id': '../../outside'}]})
+    generator.generate_variants(plan, 'plan')
+
+    assert 'Invalid variant id' in capsys.readouterr().out
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,174 @@
+import unicodedata
+
+from PIL import Image, ImageDraw, ImageFont
+
+# Strings up to this length are memoized whole (coupon amounts, units, badges)
+SHORT_TEXT_LIMIT = 32
+MEMO_LIMIT = 4096
+
+
+class GlyphMetrics:
+    """
+    Per-font glyph tables: advance width, ink box and pair kerning, each
+    measured once per character (pair) and reused for every string.
+    Only valid for Pillow's basic layout, where a line is the sum of its
+    glyphs plus 'kern' table adjustments (no shaping or ligatures).
+    """
+
+    def __init__(self, font):
+        self.font = font
+        self._advance = {}
+        self._bbox = {}
+        self._kern = {}
+
+    def advance(self, char):
+        if char not in self._advance:
+            self._advance[char] = self.font.getlength(char)
+        return self._advance[char]
+
+    def bbox(self, char):
+        if char not in self._bbox:
+            self._bbox[char] = self.font.getbbox(char)
+        return self._bbox[char]
+
+    def kern(self, left, right):
+        pair = left + right
+        if pair not in self._kern:
+            self._kern[pair] = self.font.getlength(pair) - self.advance(left) - self.advance(right)
+        return self._kern[pair]
+
+    def text_bbox(self, text):
+        """
+        Ink box of a single line drawn at the origin, composed from the glyph
+        tables. Returns None when the composed box is ambiguous after rounding.
+        """
+        pen = 0.0
+        left = top = right = bottom = None
+        prev = None
+        for char in text:
+            if prev is not None:
+                pen += self.kern(prev, char)
+            l, t, r, b = self.bbox(char)
+            if left is None:
+                left, top, right, bottom = l + pen, t, r + pen, b
+            else:
+                left = min(left, l + pen)
+                top = min(top, t)
+                right = max(right, r + pen)
+                bottom = max(bottom, b)
+            pen += self.advance(char)
+            prev = char
+        # FreeType rounds the summed 26.6 positions; a half-pixel edge can go
+        # either way, so leave those to the caller's exact measurement
+        if abs(left % 1 - 0.5) < 0.02 or abs(right % 1 - 0.5) < 0.02:
+            return None
+        return (round(left), round(top), round(right), round(bottom))
+
+
+class TextMeasurer:
+    """
+    Cached fonts and text measurement for one font file.
+
+    Replaces a draw.textbbox() call per element: fonts are opened once per
+    size, glyph metrics are tabulated per font, and short strings are memoized.
+    Results match ImageDraw.textbbox((0, 0), text, font=font).
+    """
+
+    def __init__(self, font_path):
+        self.font_path = font_path
+        self._fonts = {}
+        self._metrics = {}
+        self._memo = {}
+        self._draw = None
+
+    def font(self, size):
+        """Returns the font at the given size (Pillow's default font if the file is missing)."""
+        if size not in self._fonts:
+            try:
+                self._fonts[size] = ImageFont.truetype(self.font_path, size)
+            except OSError:
+                # Fallback to default if font not found
+                self._fonts[size] = ImageFont.load_default()
+        return self._fonts[size]
+
+    def _composable(self, font, text):
+        if not text or '\n' in text:
+            return False
+        if not isinstance(font, ImageFont.FreeTypeFont) or font.layout_engine != ImageFont.Layout.BASIC:
+            return False
+        # Combining marks attach to the previous glyph instead of advancing the pen
+        return not any(unicodedata.combining(c) for c in text)
+
+    def _textbbox(self, text, font):
+        if self._draw is None:
+            # Scratch canvas: measurement never draws on a real image
+            self._draw = ImageDraw.Draw(Image.new("RGBA", (1, 1)))
+        return tuple(self._draw.textbbox((0, 0), text, font=font))
+
+    def bbox(self, text, font):
+        """Returns the text bbox (left, top, right, bottom) when drawn at the origin."""
+        short = len(text) <= SHORT_TEXT_LIMIT
+        key = (font, text)
+        if short and key in self._memo:
+            return self._memo[key]
+
+        box = None
+        if self._composable(font, text):
+            metrics = self._metrics.get(font)
+            if metrics is None:
+                metrics = self._metrics[font] = GlyphMetrics(font)
+            box = metrics.text_bbox(text)
+        if box is None:
+            box = self._textbbox(text, font)
+
+        if short:
+            if len(self._memo) >= MEMO_LIMIT:
+                self._memo.clear()
+            self._memo[key] = box
+        return box
+
+    def size_bbox(self, text, size):
+        """bbox() for the font file at a given size."""
+        return self.bbox(text, self.font(size))
+
+
+def missing_glyphs(font_path, text):
+    """
+    Characters of text (whitespace aside) the font file has no glyph for;
+    every character if the file cannot be opened. Uses the cmap when
+    fontTools is installed, else compares each glyph with the font's
+    .notdef rendering.
+    """
+    chars = {c for c in text if not c.isspace()}
+    try:
+        from fontTools.ttLib import TTFont
+        with TTFont(font_path, fontNumber=0, lazy=True) as tt:
+            cmap = tt.getBestCmap() or {}
+        return {c for c in chars if ord(c) not in cmap}
+    except ImportError:
+        pass
+    except Exception:
+        return chars
+
+    try:
+        font = ImageFont.truetype(font_path, 32)
+    except OSError:
+        return chars
+    notdef = font.getmask('\U0010ffff')
+    notdef = (notdef.size, bytes(notdef))
+    missing = set()
+    for c in chars:
+        mask = font.getmask(c)
+        if (mask.size, bytes(mask)) == notdef:
+            missing.add(c)
+    return missing
+
+
+# One measurer per font file, shared by every renderer in the process
+_MEASURERS = {}
+
+
+def get_measurer(font_path):
+    if font_path not in _MEASURERS:
+        _MEASURERS[font_path] = TextMeasurer(font_path)
+    return _MEASURERS[font_path]
@@ -0,0 +1,356 @@
+"""
+Self-hosting of third-party page assets (logo on bihadado.tokyo, Swiper on jsDelivr, ...).
+
+Remote files are fetched once into a content-addressed cache
+(.cache/vendor/objects/{sha256}) and revalidated with ETag / Last-Modified
+at most once per build. Pages get hashed copies under static/vendor/ and
+their HTML is rewritten to point at them. Offline mode only uses the cache.
+
+    python vendor.py scan            # third-party asset URLs in templates/ and input/
+    python vendor.py fetch           # warm the cache (e.g. before an --offline build)
+"""
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import shutil
+import sys
+import threading
+import urllib.error
+import urllib.request
+from urllib.parse import urljoin, urlparse
+
+CACHE_DIR = '.cache/vendor'
+VENDOR_SUBDIR = 'vendor'
+FETCH_TIMEOUT = 15
+USER_AGENT = 'lp-generator-vendor/1.0'
+
+# Web fonts are self-hosted by font_subsetter (Google Fonts CSS varies per browser)
+EXCLUDE_HOSTS = {'fonts.googleapis.com', 'fonts.gstatic.com'}
+ASSET_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.webp', '.gif', '.svg', '.avif', '.ico',
+                    '.css', '.js', '.mjs', '.woff2', '.woff', '.ttf', '.mp4', '.webm'}
+
+TAG_RE = re.compile(r'<(img|script|link|source|video)\b[^>]*>', re.IGNORECASE)
+ATTR_RE = re.compile(r'\b(src|href|poster|srcset|imagesrcset)(\s*=\s*)(["\'])(.*?)\3', re.IGNORECASE | re.DOTALL)
+STYLE_ATTR_RE = re.compile(r'\bstyle(\s*=\s*)(["\'])(.*?)\2', re.IGNORECASE | re.DOTALL)
+REL_RE = re.compile(r'\brel\s*=\s*(["\'])(.*?)\1', re.IGNORECASE)
+CSS_URL_RE = re.compile(r'url\(\s*([\'"]?)(.*?)\1\s*\)')
+SRCSET_RE = re.compile(r'(^|,)(\s*)([^\s,]+)')
+
+# <link> relations whose href is fetched as a page resource (not navigation links)
+RESOURCE_RELS = {'stylesheet', 'preload', 'modulepreload', 'icon', 'apple-touch-icon'}
+
+
+def is_third_party(url):
+    if not isinstance(url, str) or not url.startswith(('http://', 'https://', '//')):
+        return False
+    host = urlparse(url if not url.startswith('//') else 'https:' + url).hostname or ''
+    return host not in EXCLUDE_HOSTS
+
+
+def _absolute(url):
+    return 'https:' + url if url.startswith('//') else url
+
+
+def _rewrite_tag(tag_html, replace):
+    """Applies replace(url) -> url to the resource attributes of one tag."""
+    name = tag_html[1:].split(None, 1)[0].rstrip('>/').lower()
+    if name == 'link':
+        rel = REL_RE.search(tag_html)
+        if not rel or not set(rel.group(2).lower().split()) & RESOURCE_RELS:
+            return tag_html
+
+    def attr(m):
+        key, value = m.group(1).lower(), m.group(4)
+        if key in ('srcset', 'imagesrcset'):
+            value = SRCSET_RE.sub(lambda c: c.group(1) + c.group(2) + replace(c.group(3)), value)
+        elif key != 'href' or name == 'link':
+            value = replace(value)
+        return f"{m.group(1)}{m.group(2)}{m.group(3)}{value}{m.group(3)}"
+
+    return ATTR_RE.sub(attr, tag_html)
+
+
+def rewrite_html(html, replace):
+    """
+    Rewrites resource URLs (src/srcset/poster, resource <link> hrefs, url() in
+    style attributes) with replace(url). Anchors and meta tags are untouched.
+    """
+    html = TAG_RE.sub(lambda m: _rewrite_tag(m.group(0), replace), html)
+
+    def style(m):
+        css = CSS_URL_RE.sub(lambda u: f"url({u.group(1)}{replace(u.group(2))}{u.group(1)})", m.group(3))
+        return f"style{m.group(1)}{m.group(2)}{css}{m.group(2)}"
+
+    return STYLE_ATTR_RE.sub(style, html)
+
+
+class VendorCache:
+    """Content-addressed store of remote files with HTTP revalidation."""
+
+    def __init__(self, cache_dir=CACHE_DIR, offline=False, mirrors=None, timeout=FETCH_TIMEOUT):
+        self.cache_dir = cache_dir
+        self.offline = offline
+        # {'https://cdn.jsdelivr.net': 'http://127.0.0.1:8000/jsdelivr'}: fetch from a stand-in
+        self.mirrors = dict(mirrors or {})
+        self.timeout = timeout
+        self.index_path = os.path.join(cache_dir, 'index.json')
+        self.index = {}
+        self._validated = set()
+        self._pending = {}  # url -> Event of the fetch in flight
+        self._lock = threading.Lock()
+        if os.path.exists(self.index_path):
+            try:
+                with open(self.index_path, 'r', encoding='utf-8') as f:
+                    self.index = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                print(f"Warning: Ignoring unreadable vendor index {self.index_path}.")
+
+    def object_path(self, digest):
+        return os.path.join(self.cache_dir, 'objects', digest[:2], digest)
+
+    def _save_index(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp = f"{self.index_path}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.index, f, indent=1, sort_keys=True)
+        os.replace(tmp, self.index_path)
+
+    def _source_url(self, url):
+        for origin, mirror in self.mirrors.items():
+            if url.startswith(origin):
+                return mirror.rstrip('/') + url[len(origin):]
+        return url
+
+    def _store(self, url, body, headers):
+        """Writes the object (outside the lock: objects are content-addressed) and returns its entry."""
+        digest = hashlib.sha256(body).hexdigest()
+        path = self.object_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, 'wb') as f:
+                f.write(body)
+            os.replace(tmp, path)
+        return {
+            'sha256': digest,
+            'etag': headers.get('ETag'),
+            'last_modified': headers.get('Last-Modified'),
+            'content_type': (headers.get('Content-Type') or '').split(';')[0].strip() or None
+        }
+
+    def _cached(self, url):
+        entry = self.index.get(url)
+        return entry if entry is not None and os.path.exists(self.object_path(entry['sha256'])) else None
+
+    def fetch(self, url):
+        """
+        Returns the cache entry ({'sha256', 'content_type', ...}) for url, or None
+        if it is neither cached nor fetchable. Revalidates once per process.
+        The lock only guards the index; requests run unlocked, and threads
+        asking for a URL that is being fetched wait for that fetch.
+        """
+        url = _absolute(url)
+        with self._lock:
+            cached = self._cached(url)
+            pending = self._pending.get(url)
+            if pending is None:
+                if self.offline or url in self._validated:
+                    return cached
+                # Failures are not retried within the same build either
+                self._validated.add(url)
+                done = self._pending[url] = threading.Event()
+        if pending is not None:
+            pending.wait()
+            with self._lock:
+                return self._cached(url)
+
+        request = urllib.request.Request(self._source_url(url), headers={'User-Agent': USER_AGENT})
+        if cached and cached.get('etag'):
+            request.add_header('If-None-Match', cached['etag'])
+        if cached and cached.get('last_modified'):
+            request.add_header('If-Modified-Since', cached['last_modified'])
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                entry = self._store(url, response.read(), response.headers)
+            with self._lock:
+                self.index[url] = entry
+                self._save_index()
+            print(f"Vendored {url}")
+        except urllib.error.HTTPError as e:
+            if e.code != 304:
+                print(f"Warning: Could not fetch {url} (HTTP {e.code}); "
+                      f"{'using the cached copy' if cached else 'keeping the remote URL'}.")
+        except (urllib.error.URLError, OSError) as e:
+            print(f"Warning: Could not fetch {url} ({e}); "
+                  f"{'using the cached copy' if cached else 'keeping the remote URL'}.")
+        finally:
+            with self._lock:
+                del self._pending[url]
+            done.set()
+        with self._lock:
+            return self._cached(url)
+
+    def read(self, entry):
+        with open(self.object_path(entry['sha256']), 'rb') as f:
+            return f.read()
+
+
+class PageVendor:
+    """Rewrites one page's third-party URLs to hashed copies under {static_dir}/vendor/."""
+
+    def __init__(self, cache, static_dir, url_prefix='static'):
+        self.cache = cache
+        self.static_dir = static_dir
+        self.url_prefix = url_prefix
+        self.localized = {}
+
+    def _filename(self, url, entry, body):
+        path = urlparse(url).path
+        stem, ext = os.path.splitext(os.path.basename(path))
+        if not ext and entry.get('content_type'):
+            ext = mimetypes.guess_extension(entry['content_type']) or ''
+        stem = re.sub(r'[^A-Za-z0-9._-]', '_', stem) or 'asset'
+        return f"{stem}.{hashlib.sha256(body).hexdigest()[:10]}{ext}"
+
+    def _write(self, name, body):
+        target_dir = os.path.join(self.static_dir, VENDOR_SUBDIR)
+        os.makedirs(target_dir, exist_ok=True)
+        path = os.path.join(target_dir, name)
+        if not os.path.exists(path):
+            with open(f"{path}.tmp", 'wb') as f:
+                f.write(body)
+            os.replace(f"{path}.tmp", path)
+
+    def localize(self, url, depth=0):
+        """Returns the vendored file name for url (under static/vendor/), or None."""
+        url = _absolute(url)
+        if url in self.localized:
+            return self.localized[url]
+        entry = self.cache.fetch(url)
+        if entry is None:
+            self.localized[url] = None
+            return None
+        body = self.cache.read(entry)
+
+        is_css = entry.get('content_type') == 'text/css' or urlparse(url).path.endswith('.css')
+        if is_css and depth < 2:
+            # Relative url()s (Swiper's fonts/images) are relative to the CDN, not to our copy
+            def css_url(m):
+                ref = m.group(2)
+                if ref.startswith(('data:', '#')):
+                    return m.group(0)
+                name = self.localize(urljoin(url, ref), depth + 1)
+                return f"url({m.group(1)}{name or urljoin(url, ref)}{m.group(1)})"
+            body = CSS_URL_RE.sub(css_url, body.decode('utf-8')).encode('utf-8')
+
+        name = self._filename(url, entry, body)
+        self._write(name, body)
+        self.localized[url] = name
+        return name
+
+    def replace(self, url):
+        if not is_third_party(url):
+            return url
+        name = self.localize(url)
+        return f"{self.url_prefix}/{VENDOR_SUBDIR}/{name}" if name else url
+
+    def rewrite(self, html):
+        return rewrite_html(html, self.replace)
+
+
+def vendor_page(html, static_dir, cache):
+    """Vendors every third-party resource of a rendered page; returns (html, number of vendored URLs)."""
+    vendor = PageVendor(cache, static_dir)
+    html = vendor.rewrite(html)
+    return html, sum(1 for name in vendor.localized.values() if name)
+
+
+def _plan_urls(node):
+    if isinstance(node, dict):
+        for value in node.values():
+            yield from _plan_urls(value)
+    elif isinstance(node, list):
+        for value in node:
+            yield from _plan_urls(value)
+    elif is_third_party(node) and os.path.splitext(urlparse(_absolute(node)).path)[1].lower() in ASSET_EXTENSIONS:
+        yield node
+
+
+def scan(template_dir='templates', input_dir='input'):
+    """{url: [files]} of third-party asset URLs in template sources and plan JSON files."""
+    found = {}
+    for root, _, files in os.walk(template_dir):
+        for name in sorted(files):
+            if not name.endswith('.html'):
+                continue
+            path = os.path.join(root, name)
+            with open(path, 'r', encoding='utf-8') as f:
+                text = f.read()
+
+            def record(url, path=path):
+                if is_third_party(url) and '{{' not in url:
+                    found.setdefault(_absolute(url), []).append(path)
+                return url
+            rewrite_html(text, record)
+
+    for name in sorted(os.listdir(input_dir)) if os.path.isdir(input_dir) else []:
+        if not name.endswith('.json'):
+            continue
+        path = os.path.join(input_dir, name)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                plan = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            continue
+        for url in _plan_urls(plan):
+            found.setdefault(_absolute(url), []).append(path)
+    return {url: sorted(set(files)) for url, files in sorted(found.items())}
+
+
+def parse_mirrors(values):
+    """{origin: mirror URL} from ORIGIN=URL strings; raises ValueError for malformed ones."""
+    mirrors = {}
+    for value in values or []:
+        origin, sep, target = value.partition('=')
+        origin = origin.strip().rstrip('/')
+        target = target.strip()
+        if not sep or not origin or not target:
+            raise ValueError(f"expected ORIGIN=URL, got {value!r}")
+        for url in (origin, target):
+            parsed = urlparse(url)
+            if parsed.scheme not in ('http', 'https') or not parsed.netloc:
+                raise ValueError(f"not an http(s) URL: {url!r} (in {value!r})")
+        mirrors[origin] = target
+    return mirrors
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description='Third-party asset vendoring')
+    parser.add_argument('command', choices=['scan', 'fetch'])
+    parser.add_argument('--mirror', action='append', help='ORIGIN=URL: fetch ORIGIN from a stand-in server')
+    args = parser.parse_args(argv)
+    try:
+        mirrors = parse_mirrors(args.mirror)
+    except ValueError as e:
+        parser.error(f"--mirror: {e}")
+
+    found = scan()
+    if args.command == 'scan':
+        for url, files in found.items():
+            print(f"{url}\n    {', '.join(files)}")
+        print(f"{len(found)} third-party asset URLs.")
+        return 0
+
+    cache = VendorCache(mirrors=mirrors)
+    vendor = PageVendor(cache, os.path.join(CACHE_DIR, 'prefetch'))
+    failed = [url for url in found if vendor.localize(url) is None]
+    shutil.rmtree(os.path.join(CACHE_DIR, 'prefetch'), ignore_errors=True)
+    print(f"Cached {len(found) - len(failed)}/{len(found)} URLs in {CACHE_DIR}.")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+import hashlib
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+from collections import OrderedDict
+
+from PIL import Image, features
+
+from image_memory import image_bytes, load_fitted, reserve
+
+POSTER_MAX_WIDTH = 1280
+POSTER_QUALITY = 75
+FRAME_OFFSET_SECONDS = 1.0
+
+
+def _is_local(url):
+    return isinstance(url, str) and bool(url) and '://' not in url and not url.startswith(('data:', '//'))
+
+
+def extract_frame(video_path, output_path, offset=FRAME_OFFSET_SECONDS):
+    """Grabs one frame of a local video with ffmpeg. Returns False if ffmpeg is unavailable or fails."""
+    ffmpeg = shutil.which('ffmpeg')
+    if not ffmpeg:
+        print("Warning: ffmpeg not found; cannot extract a poster frame from the video.")
+        return False
+    cmd = [ffmpeg, '-y', '-loglevel', 'error', '-ss', str(offset), '-i', video_path,
+           '-frames:v', '1', output_path]
+    try:
+        subprocess.run(cmd, check=True, timeout=60)
+    except (subprocess.SubprocessError, OSError) as e:
+        print(f"Warning: Could not extract poster frame from {video_path} ({e}).")
+        return False
+    return os.path.exists(output_path)
+
+
+def optimize_poster(source_path, output_dir, max_width=POSTER_MAX_WIDTH):
+    """
+    Re-encodes a poster image at display size (WebP, JPEG fallback) into output_dir.
+    Returns the written filename; the name is content-hashed so it can be cached forever.
+    """
+    with Image.open(source_path) as src:
+        size = src.size
+    if size[0] > max_width:
+        size = (max_width, round(size[1] * max_width / size[0]))
+    with load_fitted(source_path, size, 'RGB') as img, reserve(image_bytes(size, 'RGB')):
+        # Encoder buffers are about one more copy of the poster
+        if features.check('webp'):
+            ext, fmt, params = 'webp', 'WEBP', {'quality': POSTER_QUALITY, 'method': 6}
+        else:
+            ext, fmt, params = 'jpg', 'JPEG', {'quality': POSTER_QUALITY, 'optimize': True, 'progressive': True}
+
+        # Per process and thread: image workers may encode posters into the same directory
+        tmp_path = os.path.join(output_dir, f".poster.{os.getpid()}.{threading.get_ident()}.tmp.{ext}")
+        img.save(tmp_path, fmt, **params)
+
+    with open(tmp_path, 'rb') as f:
+        digest = hashlib.sha1(f.read()).hexdigest()[:10]
+    filename = f"video_poster.{digest}.{ext}"
+    os.replace(tmp_path, os.path.join(output_dir, filename))
+    return filename
+
+
+# (source path, size, mtime) -> (filename, bytes); shared by all pages of one build.
+# Least recently used posters are dropped beyond POSTER_CACHE_SIZE (long-lived services).
+POSTER_CACHE_SIZE = 32
+_POSTER_CACHE = OrderedDict()
+_POSTER_LOCK = threading.Lock()
+
+
+def _cached_poster(source_path, output_img_dir):
+    st = os.stat(source_path)
+    key = (os.path.abspath(source_path), st.st_size, st.st_mtime_ns)
+    with _POSTER_LOCK:
+        cached = _POSTER_CACHE.get(key)
+        if cached is not None:
+            _POSTER_CACHE.move_to_end(key)
+    if cached is None:
+        filename = optimize_poster(source_path, output_img_dir)
+        with open(os.path.join(output_img_dir, filename), 'rb') as f:
+            data = f.read()
+        with _POSTER_LOCK:
+            _POSTER_CACHE[key] = (filename, data)
+            while len(_POSTER_CACHE) > POSTER_CACHE_SIZE:
+                _POSTER_CACHE.popitem(last=False)
+        return filename
+
+    filename, data = cached
+    target = os.path.join(output_img_dir, filename)
+    if not os.path.exists(target):
+        with open(target, 'wb') as f:
+            f.write(data)
+    return filename
+
+
+def build_poster(video_data, output_img_dir, rel_img_dir):
+    """
+    Produces an optimized poster for a video section.
+    Uses poster_url when it is a local image, otherwise a frame of a local video_url.
+    Returns the page-relative poster URL, or None to keep the plan's poster as-is.
+    """
+    poster_url = video_data.get('poster_url')
+    video_url = video_data.get('video_url')
+    from_poster = _is_local(poster_url) and os.path.isfile(poster_url)
+    from_video = not poster_url and _is_local(video_url) and os.path.isfile(video_url)
+    if not (from_poster or from_video):
+        return None
+
+    os.makedirs(output_img_dir, exist_ok=True)
+
+    try:
+        if from_poster:
+            filename = _cached_poster(poster_url, output_img_dir)
+        else:
+            with tempfile.TemporaryDirectory() as tmp:
+                frame_path = os.path.join(tmp, 'frame.png')
+                if not extract_frame(video_url, frame_path):
+                    return None
+                filename = optimize_poster(frame_path, output_img_dir)
+    except OSError as e:
+        print(f"Warning: Could not build video poster ({e}).")
+        return None
+
+    return f"{rel_img_dir}/{filename}"